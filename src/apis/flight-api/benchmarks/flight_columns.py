@@ -0,0 +1,125 @@
+# Filtered and sorted flight queries over the FlightColumns snapshot against a scan of the Flight models.
+#
+#   python -m benchmarks.flight_columns --flights 1000000 --queries 200
+#
+# The scan side validates the schedule into Flight models once, then filters and
+# sorts the list in Python the way a route would without the snapshot. The memory
+# of the models is measured on --sample flights with tracemalloc and extrapolated.
+
+from services import FlightColumns, FlightIndex
+from models import Flight
+from benchmarks.synthetic import generate_flights, load_airports
+from datetime import datetime, timedelta, timezone
+import argparse
+import asyncio
+import logging
+import random
+import statistics
+import time
+import tracemalloc
+
+class _ScheduleTable:
+    def __init__(self, flights):
+        self.flights = flights
+
+    async def _entities(self):
+        for flight in self.flights:
+            yield flight
+
+    def query_entities(self, query_filter, **kwargs):
+        return self._entities()
+
+def _report(name: str, samples: list) -> None:
+    samples = sorted(samples)
+    p50 = samples[len(samples) // 2] * 1e3
+    p99 = samples[int(len(samples) * 0.99)] * 1e3
+    print(f"  {name:<34} mean={statistics.fmean(samples) * 1e3:9.3f}ms p50={p50:9.3f}ms p99={p99:9.3f}ms")
+
+def _models_bytes(flights: list) -> int:
+    tracemalloc.start()
+    models = [Flight(**flight) for flight in flights]
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del models
+    return size
+
+def _queries(rng: random.Random, countries: list, airports: list, count: int) -> list:
+    start = datetime(2024, 7, 1, tzinfo=timezone.utc)
+    queries = []
+    for _ in range(count):
+        after = start + timedelta(days=rng.randrange(0, 55))
+        queries.append(("country, max duration, by price", dict(countries=[rng.choice(countries)], max_duration=480, min_seats=1)))
+        queries.append(("airports, price range, by departure", dict(from_airports=[rng.choice(airports)], to_airports=[rng.choice(airports)],
+                                                                    max_price=1500, min_seats=1, sort="departure")))
+        queries.append(("country, 3 day window, by duration", dict(countries=[rng.choice(countries)], min_seats=1, sort="duration",
+                                                                   departure_after=after.timestamp(),
+                                                                   departure_before=(after + timedelta(days=3)).timestamp())))
+        queries.append(("all, direct under 300, by seats", dict(max_price=300, direct=True, sort="seats", descending=True)))
+    return queries
+
+def _scan(models: list, query: dict) -> list:
+    # The same filters applied to the models, sorted in Python
+    countries, from_airports, to_airports = query.get("countries"), query.get("from_airports"), query.get("to_airports")
+    after, before = query.get("departure_after"), query.get("departure_before")
+    found = [flight for flight in models
+             if (not countries or flight.PartitionKey in countries)
+             and (not from_airports or flight.FromAirport in from_airports)
+             and (not to_airports or flight.ToAirport in to_airports)
+             and (query.get("max_price") is None or flight.Price <= query["max_price"])
+             and (query.get("max_duration") is None or (flight.ArrivalTime - flight.DepartureTime).total_seconds() // 60 <= query["max_duration"])
+             and (query.get("min_seats") is None or flight.SeatsAvailable >= query["min_seats"])
+             and (query.get("direct") is None or flight.DirectFlight == query["direct"])
+             and (after is None or flight.DepartureTime.timestamp() >= after)
+             and (before is None or flight.DepartureTime.timestamp() < before)]
+    key = {"price": lambda flight: flight.Price,
+           "seats": lambda flight: flight.SeatsAvailable,
+           "departure": lambda flight: flight.DepartureTime,
+           "duration": lambda flight: flight.ArrivalTime - flight.DepartureTime}[query.get("sort", "price")]
+    return sorted(found, key=key, reverse=query.get("descending", False))[:20]
+
+async def run(args) -> None:
+    logger = logging.getLogger('benchmark')
+    flights = list(generate_flights(args.flights))
+    index = FlightIndex(_ScheduleTable(flights), 0, logger)
+    columns = FlightColumns(index, logger)
+    index.add_listener(columns.schedule_changed)
+
+    start = time.perf_counter()
+    await index.load()
+    print(f"flights={args.flights} index and columns build={time.perf_counter() - start:.2f}s")
+
+    sample = flights[:args.sample]
+    models_bytes = _models_bytes(sample) * len(flights) / len(sample)
+    print(f"columns={columns.nbytes / 1e6:.1f} MB, Flight models={models_bytes / 1e6:.1f} MB (extrapolated from {len(sample)})")
+
+    rng = random.Random(7)
+    airports = load_airports()
+    queries = _queries(rng, sorted({airport['PartitionKey'] for airport in airports}), [airport['RowKey'] for airport in airports], args.queries)
+
+    samples = {}
+    for name, query in queries:
+        started = time.perf_counter()
+        columns.query(**query)
+        samples.setdefault(name, []).append(time.perf_counter() - started)
+    print("columns")
+    for name, values in samples.items():
+        _report(name, values)
+
+    if args.scan:
+        models = [Flight(**flight) for flight in flights]
+        samples = {}
+        for name, query in queries[:args.scan]:
+            started = time.perf_counter()
+            _scan(models, query)
+            samples.setdefault(name, []).append(time.perf_counter() - started)
+        print("scan of the Flight models")
+        for name, values in samples.items():
+            _report(name, values)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Columnar flight query benchmark")
+    parser.add_argument('--flights', type=int, default=1_000_000)
+    parser.add_argument('--queries', type=int, default=200, help="Queries of each shape")
+    parser.add_argument('--sample', type=int, default=20_000, help="Flights measured for the memory of the models")
+    parser.add_argument('--scan', type=int, default=20, help="Queries run on the model scan, 0 to skip it")
+    asyncio.run(run(parser.parse_args()))
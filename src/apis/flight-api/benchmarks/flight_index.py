@@ -0,0 +1,71 @@
+# Compares destination/origin lookups through a partition scan against the FlightIndex.
+#
+#   python -m benchmarks.flight_index --flights 100000 --lookups 2000
+#
+# The scan side filters the country partition in memory the way Table Storage
+# evaluates `PartitionKey eq @country and ToAirport eq @code`, so the numbers only
+# show how the work grows with the schedule, not real network latency.
+
+from services import FlightIndex
+from benchmarks.synthetic import generate_flights, load_airports
+from collections import defaultdict
+import argparse
+import asyncio
+import logging
+import random
+import statistics
+import time
+
+class _ScanTable:
+    def __init__(self, flights):
+        self.flights = flights
+
+    async def _entities(self):
+        for flight in self.flights:
+            yield flight
+
+    def query_entities(self, query_filter, **kwargs):
+        return self._entities()
+
+def _report(name: str, samples: list) -> None:
+    samples = sorted(samples)
+    p50 = samples[len(samples) // 2] * 1e6
+    p99 = samples[int(len(samples) * 0.99)] * 1e6
+    print(f"{name:<12} mean={statistics.fmean(samples) * 1e6:10.1f}us p50={p50:10.1f}us p99={p99:10.1f}us")
+
+async def run(args) -> None:
+    flights = list(generate_flights(args.flights))
+    partitions = defaultdict(list)
+    for flight in flights:
+        partitions[flight['PartitionKey']].append(flight)
+
+    start = time.perf_counter()
+    index = FlightIndex(_ScanTable(flights), 0, logging.getLogger('benchmark'))
+    await index.load()
+    print(f"flights={args.flights} index build={time.perf_counter() - start:.2f}s")
+
+    rng = random.Random(7)
+    airports = load_airports()
+    lookups = [(rng.choice(list(partitions)), rng.choice(airports)['RowKey']) for _ in range(args.lookups)]
+
+    scan, indexed = [], []
+    for country, code in lookups:
+        start = time.perf_counter()
+        expected = [flight for flight in partitions[country] if flight['ToAirport'] == code]
+        scan.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        found = index.by_destination(country, code)
+        indexed.append(time.perf_counter() - start)
+
+        assert len(found) == len(expected)
+
+    _report("scan", scan)
+    _report("index", indexed)
+    print(f"speedup={statistics.fmean(scan) / statistics.fmean(indexed):.0f}x")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Flight secondary index benchmark")
+    parser.add_argument('--flights', type=int, default=100_000)
+    parser.add_argument('--lookups', type=int, default=2000)
+    asyncio.run(run(parser.parse_args()))
@@ -0,0 +1,262 @@
+# Mixed read/book/cancel workload driving every route of the API on the in-memory storage.
+#
+#   python -m benchmarks.load --flights 1000 100000 1000000 --requests 2000 --concurrency 32
+#   python -m benchmarks.load --flights 1000 100000 --save-baseline benchmarks/baseline.json
+#   python -m benchmarks.load --flights 1000 100000 --baseline benchmarks/baseline.json
+#
+# Requests go through the ASGI app in process (httpx ASGITransport), so the numbers
+# are the API's own overhead, without network or Azure latency. Each schedule size
+# runs in its own process so its peak RSS is not inflated by the previous one.
+
+from benchmarks.synthetic import generate_flights, load_airports
+from benchmarks.report import summarize, peak_rss_mb, print_table, load_baseline, save_baseline, compare
+from collections import defaultdict
+from typing import Dict, List, Tuple
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+# Share of each operation in the workload
+WORKLOAD = {
+    "airports": 8,
+    "country": 4,
+    "country_stream": 4,
+    "destination": 20,
+    "origin": 10,
+    "book": 14,
+    "book_batch": 4,
+    "cancel": 10,
+    "bookings": 14,
+    "booking": 12
+}
+
+BATCH_SIZE = 5
+# Flight keys kept to pick the flights to book
+SAMPLE_SIZE = 10000
+
+class VirtualUser:
+    """One authenticated client with the bookings it made"""
+
+    def __init__(self, client, name: str, rng: random.Random, data: dict, samples: Dict[str, List[float]], errors: Dict[str, int]):
+        self.client = client
+        self.headers = {"X-MS-CLIENT-PRINCIPAL-NAME": name}
+        self.rng = rng
+        self.data = data
+        self.samples = samples
+        self.errors = errors
+        self.booked: List[dict] = []
+
+    async def run(self, operation: str) -> None:
+        # Cancel and booking lookups need a booking of this user first
+        if operation == "cancel" and not self.booked:
+            operation = "book"
+        if operation == "booking" and not self.booked:
+            operation = "bookings"
+
+        start = time.perf_counter()
+        response = await getattr(self, operation)()
+        self.samples[operation].append(time.perf_counter() - start)
+        if response.status_code >= 500:
+            self.errors[operation] += 1
+
+    async def airports(self):
+        return await self.client.get("/api/airport/", headers=self.headers)
+
+    async def country(self):
+        return await self.client.get(f"/api/flight/country/{self._country()}", headers=self.headers)
+
+    async def country_stream(self):
+        return await self.client.get(f"/api/flight/country/{self._country()}",
+                                     params={"stream": "true", "$select": "flight_code,price,seats_available"},
+                                     headers=self.headers)
+
+    async def destination(self):
+        return await self.client.get(f"/api/flight/{self._country()}/{self._airport()}", headers=self.headers)
+
+    async def origin(self):
+        return await self.client.get(f"/api/flight/origin/{self._country()}/{self._airport()}", headers=self.headers)
+
+    async def book(self):
+        country, flight_code = self.rng.choice(self.data["flights"])
+        response = await self.client.post("/api/flight/book", json={"country": country, "flightCode": flight_code}, headers=self.headers)
+        if response.status_code == 202:
+            self.booked.append(response.json())
+        return response
+
+    async def book_batch(self):
+        flights = self.rng.sample(self.data["flights"], BATCH_SIZE)
+        response = await self.client.post("/api/flight/book/batch",
+                                          json=[{"country": country, "flightCode": flight_code} for country, flight_code in flights],
+                                          headers=self.headers)
+        if response.status_code == 202:
+            self.booked.extend(result for result in response.json() if result["status"] == "booked")
+        return response
+
+    async def cancel(self):
+        booking = self.booked.pop(self.rng.randrange(len(self.booked)))
+        return await self.client.request("DELETE", "/api/flight/cancel",
+                                         json={"bookingId": booking["bookingId"], "country": booking["country"], "flightCode": booking["flightCode"]},
+                                         headers=self.headers)
+
+    async def bookings(self):
+        return await self.client.get("/api/booking/all", params={"limit": 50}, headers=self.headers)
+
+    async def booking(self):
+        return await self.client.get(f"/api/booking/{self.rng.choice(self.booked)['bookingId']}", headers=self.headers)
+
+    def _country(self) -> str:
+        return self.rng.choice(self.data["countries"])
+
+    def _airport(self) -> str:
+        return self.rng.choice(self.data["airports"])
+
+def _write_data(path: str, flights: int, seed: int) -> List[Tuple[str, str]]:
+    """Write the airports and a synthetic schedule for the in-memory storage, return a sample of flight keys"""
+    with open(os.path.join(path, "airport.json"), "w", encoding="utf-8") as f:
+        json.dump(load_airports(), f)
+
+    rng = random.Random(seed)
+    sample: List[Tuple[str, str]] = []
+    with open(os.path.join(path, "flights.json"), "w", encoding="utf-8") as f:
+        f.write("[")
+        for i, flight in enumerate(generate_flights(flights, seed)):
+            f.write(("," if i else "") + json.dumps(flight))
+            # Reservoir sampling keeps the sample uniform without holding every key
+            key = (flight["PartitionKey"], flight["RowKey"])
+            if len(sample) < SAMPLE_SIZE:
+                sample.append(key)
+            elif (j := rng.randrange(i + 1)) < SAMPLE_SIZE:
+                sample[j] = key
+        f.write("]")
+    return sample
+
+def _current_rss_mb() -> float:
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return round(int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024), 1)
+    except OSError:
+        return peak_rss_mb()
+
+async def run_scale(flights: int, requests: int, concurrency: int, seed: int) -> dict:
+    import httpx
+
+    with tempfile.TemporaryDirectory() as data_path:
+        sample = _write_data(data_path, flights, seed)
+
+        # Imported late, the settings are read once when the app is imported
+        os.environ.update({"STORAGE_BACKEND": "memory",
+                           "STORAGE_DATA_PATH": data_path,
+                           "IS_DEVELOPMENT": "false",
+                           "AIRPORT_CACHE_TTL_SECONDS": "0",
+                           "FLIGHT_INDEX_TTL_SECONDS": "0"})
+        from main import app
+        logging.getLogger('flightapi').setLevel(logging.WARNING)
+
+        start = time.perf_counter()
+        async with app.router.lifespan_context(app):
+            startup = time.perf_counter() - start
+            rss_startup = _current_rss_mb()
+
+            airports = load_airports()
+            data = {"flights": sample,
+                    "countries": sorted({airport["PartitionKey"] for airport in airports}),
+                    "airports": [airport["RowKey"] for airport in airports]}
+
+            rng = random.Random(seed)
+            operations = rng.choices(list(WORKLOAD), weights=list(WORKLOAD.values()), k=requests)
+            samples: Dict[str, List[float]] = defaultdict(list)
+            errors: Dict[str, int] = defaultdict(int)
+            queue = iter(operations)
+
+            async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://benchmark") as client:
+                async def worker(user: VirtualUser) -> None:
+                    for operation in queue:
+                        await user.run(operation)
+
+                users = [VirtualUser(client, f"user{i}@example.com", random.Random(seed + i), data, samples, errors)
+                         for i in range(concurrency)]
+                start = time.perf_counter()
+                await asyncio.gather(*[worker(user) for user in users])
+                elapsed = time.perf_counter() - start
+
+    all_samples = [sample for values in samples.values() for sample in values]
+    return {
+        "flights": flights,
+        "requests": requests,
+        "concurrency": concurrency,
+        "startup_s": round(startup, 2),
+        "elapsed_s": round(elapsed, 2),
+        "errors": sum(errors.values()),
+        "rss_startup_mb": rss_startup,
+        "peak_rss_mb": peak_rss_mb(),
+        "total": summarize(all_samples, elapsed),
+        "operations": {operation: summarize(samples[operation], elapsed) for operation in WORKLOAD}
+    }
+
+def _run_isolated(args, flights: int) -> dict:
+    with tempfile.NamedTemporaryFile(suffix=".json", delete=False) as f:
+        output = f.name
+    try:
+        subprocess.run([sys.executable, "-m", "benchmarks.load",
+                        "--flights", str(flights),
+                        "--requests", str(args.requests),
+                        "--concurrency", str(args.concurrency),
+                        "--seed", str(args.seed),
+                        "--output", output], check=True)
+        with open(output, "r", encoding="utf-8") as f:
+            return json.load(f)
+    finally:
+        os.remove(output)
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Mixed workload benchmark of the flight API on the in-memory storage")
+    parser.add_argument("--flights", type=int, nargs="+", default=[1000, 100000], help="Schedule sizes, e.g. 1000 100000 1000000")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--baseline", help="Compare with a baseline JSON file, exits with 1 on regression")
+    parser.add_argument("--save-baseline", help="Write the results to this baseline JSON file")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed regression ratio against the baseline")
+    parser.add_argument("--output", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.output:
+        # Child process of a multi scale run
+        save_baseline(args.output, asyncio.run(run_scale(args.flights[0], args.requests, args.concurrency, args.seed)))
+        return
+
+    results = {}
+    for flights in args.flights:
+        if len(args.flights) == 1:
+            result = asyncio.run(run_scale(flights, args.requests, args.concurrency, args.seed))
+        else:
+            result = _run_isolated(args, flights)
+        results[f"flights_{flights}"] = result
+
+        print(f"flights={flights} requests={result['requests']} concurrency={result['concurrency']} "
+              f"startup={result['startup_s']}s elapsed={result['elapsed_s']}s errors={result['errors']} "
+              f"rss_startup={result['rss_startup_mb']}MB peak_rss={result['peak_rss_mb']}MB")
+        print_table(f"  throughput={result['total']['throughput']} req/s p50={result['total']['p50_ms']}ms "
+                    f"p95={result['total']['p95_ms']}ms p99={result['total']['p99_ms']}ms", result["operations"])
+
+    if args.save_baseline:
+        save_baseline(args.save_baseline, results)
+        print(f"Baseline saved to {args.save_baseline}")
+
+    if args.baseline:
+        regressions = compare(load_baseline(args.baseline), results, args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+        print("No regression against the baseline")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+# Latency summaries, memory readings and baseline comparison shared by the benchmarks.
+
+from typing import Dict, List
+import json
+import resource
+import sys
+
+def summarize(samples: List[float], elapsed: float) -> Dict[str, float]:
+    """Count, throughput and latency percentiles in milliseconds"""
+    samples = sorted(samples)
+    if not samples:
+        return {"count": 0}
+    return {
+        "count": len(samples),
+        "throughput": round(len(samples) / elapsed, 1) if elapsed > 0 else 0.0,
+        "p50_ms": round(_percentile(samples, 0.50) * 1000, 3),
+        "p95_ms": round(_percentile(samples, 0.95) * 1000, 3),
+        "p99_ms": round(_percentile(samples, 0.99) * 1000, 3),
+        "max_ms": round(samples[-1] * 1000, 3)
+    }
+
+def _percentile(samples: List[float], q: float) -> float:
+    return samples[min(len(samples) - 1, int(len(samples) * q))]
+
+def peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+def print_table(title: str, results: Dict[str, Dict[str, float]]) -> None:
+    print(title)
+    print(f"  {'operation':<22}{'count':>8}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for name, stats in results.items():
+        if stats.get("count"):
+            print(f"  {name:<22}{stats['count']:>8}{stats['throughput']:>10.1f}"
+                  f"{stats['p50_ms']:>10.2f}{stats['p95_ms']:>10.2f}{stats['p99_ms']:>10.2f}")
+
+def load_baseline(path: str) -> dict:
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def save_baseline(path: str, results: dict) -> None:
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+def compare(baseline: dict, results: dict, tolerance: float) -> List[str]:
+    """Regressions of p95 latency, throughput or peak RSS above `tolerance` (0.2 is 20%)"""
+    regressions = []
+    for scenario, current in results.items():
+        previous = baseline.get(scenario)
+        if previous is None:
+            continue
+
+        for operation, stats in current.get("operations", {}).items():
+            before = previous.get("operations", {}).get(operation)
+            if not before or not stats.get("count") or not before.get("count"):
+                continue
+            if stats["p95_ms"] > before["p95_ms"] * (1 + tolerance):
+                regressions.append(f"{scenario} {operation}: p95 {before['p95_ms']:.2f}ms -> {stats['p95_ms']:.2f}ms")
+            if stats["throughput"] < before["throughput"] * (1 - tolerance):
+                regressions.append(f"{scenario} {operation}: throughput {before['throughput']:.1f} -> {stats['throughput']:.1f} req/s")
+
+        if "peak_rss_mb" in previous and current["peak_rss_mb"] > previous["peak_rss_mb"] * (1 + tolerance):
+            regressions.append(f"{scenario}: peak RSS {previous['peak_rss_mb']:.1f}MB -> {current['peak_rss_mb']:.1f}MB")
+    return regressions
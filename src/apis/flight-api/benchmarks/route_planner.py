@@ -0,0 +1,84 @@
+# Itinerary search latency of the RoutePlanner and cost of its incremental refresh.
+#
+#   python -m benchmarks.route_planner --flights 100000 --searches 500 --changes 1000
+#
+# The graph is built from the first load of a FlightIndex over a synthetic schedule.
+# The index is then reloaded with --changes flights moved to other times, so the
+# refresh only patches those legs, and the searches run for 0, 1 and 2 stops.
+
+from services import AirportCatalog, FlightIndex, RoutePlanner
+from benchmarks.synthetic import generate_flights, load_airports
+from datetime import date, datetime, timedelta
+import argparse
+import asyncio
+import logging
+import random
+import statistics
+import time
+
+class _ScheduleTable:
+    def __init__(self, flights):
+        self.flights = flights
+
+    async def _entities(self):
+        for flight in self.flights:
+            yield dict(flight)
+
+    def query_entities(self, query_filter, **kwargs):
+        return self._entities()
+
+def _report(name: str, samples: list, results: list) -> None:
+    samples = sorted(samples)
+    p50 = samples[len(samples) // 2] * 1e3
+    p99 = samples[int(len(samples) * 0.99)] * 1e3
+    print(f"{name:<10} mean={statistics.fmean(samples) * 1e3:8.2f}ms p50={p50:8.2f}ms p99={p99:8.2f}ms "
+          f"itineraries={statistics.fmean(results):6.1f}")
+
+def _move(flight: dict, minutes: int) -> None:
+    for field in ('DepartureTime', 'ArrivalTime'):
+        moved = datetime.strptime(flight[field], "%Y-%m-%dT%H:%M:%SZ") + timedelta(minutes=minutes)
+        flight[field] = moved.strftime("%Y-%m-%dT%H:%M:%SZ")
+
+async def run(args) -> None:
+    logger = logging.getLogger('benchmark')
+    flights = list(generate_flights(args.flights))
+    airports = load_airports()
+    table = _ScheduleTable(flights)
+
+    catalog = AirportCatalog(None, 0, logger)
+    catalog.countries = {airport['RowKey']: airport['PartitionKey'] for airport in airports}
+    index = FlightIndex(table, 0, logger)
+    planner = RoutePlanner(index, catalog, 45, 90, 720)
+    index.add_listener(planner.schedule_changed)
+    changes = []
+    index.add_listener(lambda changed, removed: changes.append(len(changed) + len(removed)))
+
+    start = time.perf_counter()
+    await index.load()
+    print(f"flights={args.flights} index and graph build={time.perf_counter() - start:.2f}s")
+
+    rng = random.Random(7)
+    for flight in rng.sample(flights, min(args.changes, len(flights))):
+        _move(flight, rng.choice([-30, 15, 60]))
+    start = time.perf_counter()
+    await index.load()
+    print(f"reload with {changes[-1]} changed flights={time.perf_counter() - start:.2f}s")
+
+    codes = [airport['RowKey'] for airport in airports]
+    days = [date(2024, 7, 1) + timedelta(days=rng.randrange(0, 58)) for _ in range(args.searches)]
+    pairs = [rng.sample(codes, 2) for _ in range(args.searches)]
+    for max_stops in (0, 1, 2):
+        samples, results = [], []
+        for (origin, destination), day in zip(pairs, days):
+            start = time.perf_counter()
+            routes = planner.search(origin, destination, day, max_stops)
+            samples.append(time.perf_counter() - start)
+            results.append(len(routes))
+        _report(f"stops<={max_stops}", samples, results)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Itinerary search benchmark")
+    parser.add_argument('--flights', type=int, default=100_000)
+    parser.add_argument('--searches', type=int, default=500)
+    parser.add_argument('--changes', type=int, default=1000)
+    asyncio.run(run(parser.parse_args()))
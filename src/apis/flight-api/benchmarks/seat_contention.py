@@ -0,0 +1,89 @@
+# Fires N parallel bookings at a single flight and checks that the final seat count is exact.
+#
+#   python -m benchmarks.seat_contention --bookings 500 --capacity 300 --instances 4
+#   python -m benchmarks.seat_contention --connection-string "<azurite connection string>"
+#
+# Each instance is its own SeatInventory (its own per-flight lock), which simulates
+# several API replicas racing on the same Table entity.
+
+from azure.core.exceptions import ResourceExistsError
+from azure.data.tables.aio import TableClient
+from services import SeatInventory, NoSeatsAvailableError, SeatConflictError
+from storage import MemoryTableClient
+import argparse
+import asyncio
+import logging
+import time
+
+COUNTRY = "Benchmark"
+FLIGHT_CODE = "Contention001"
+
+def _flight(capacity: int) -> dict:
+    return {
+        "PartitionKey": COUNTRY,
+        "RowKey": FLIGHT_CODE,
+        "Airline": "Benchmark Air",
+        "FromAirport": "YUL",
+        "ToAirport": "CDG",
+        "Price": 100,
+        "SeatsAvailable": capacity,
+        "MaxSeatCapacity": capacity,
+        "Duration": "7h 15m",
+        "DirectFlight": True,
+        "DepartureTime": "2024-07-01T18:30:00Z",
+        "ArrivalTime": "2024-07-02T01:45:00Z"
+    }
+
+async def _book(inventory: SeatInventory, results: dict) -> None:
+    try:
+        await inventory.reserve(COUNTRY, FLIGHT_CODE)
+        results['booked'] += 1
+    except NoSeatsAvailableError:
+        results['sold_out'] += 1
+    except SeatConflictError:
+        results['conflict'] += 1
+
+async def run(args) -> None:
+    logger = logging.getLogger('benchmark')
+
+    if args.connection_string:
+        table_client = TableClient.from_connection_string(args.connection_string, table_name=args.table)
+        try:
+            await table_client.create_table()
+        except ResourceExistsError:
+            pass
+        await table_client.upsert_entity(_flight(args.capacity))
+    else:
+        table_client = MemoryTableClient(latency=args.latency)
+        table_client.seed(_flight(args.capacity))
+
+    instances = [SeatInventory(table_client, logger, args.max_retries) for _ in range(args.instances)]
+    results = {'booked': 0, 'sold_out': 0, 'conflict': 0}
+
+    start = time.perf_counter()
+    await asyncio.gather(*[_book(instances[i % args.instances], results) for i in range(args.bookings)])
+    elapsed = time.perf_counter() - start
+
+    flight = await table_client.get_entity(partition_key=COUNTRY, row_key=FLIGHT_CODE)
+    seats_left = flight['SeatsAvailable']
+
+    print(f"bookings={args.bookings} capacity={args.capacity} instances={args.instances}")
+    print(f"booked={results['booked']} sold_out={results['sold_out']} conflict={results['conflict']}")
+    print(f"seats_left={seats_left} elapsed={elapsed:.3f}s throughput={args.bookings / elapsed:.1f} bookings/s")
+
+    assert results['booked'] <= args.capacity, "Flight oversold"
+    assert seats_left == args.capacity - results['booked'], "Seat count drifted from successful bookings"
+
+    if args.connection_string:
+        await table_client.close()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Seat inventory contention benchmark")
+    parser.add_argument('--bookings', type=int, default=500)
+    parser.add_argument('--capacity', type=int, default=300)
+    parser.add_argument('--instances', type=int, default=4)
+    parser.add_argument('--max-retries', type=int, default=10)
+    parser.add_argument('--latency', type=float, default=0.002, help="Simulated round-trip of the in-memory table (seconds)")
+    parser.add_argument('--connection-string', default=None, help="Run against Azurite or a storage account instead of memory")
+    parser.add_argument('--table', default='benchmarkflight')
+    asyncio.run(run(parser.parse_args()))
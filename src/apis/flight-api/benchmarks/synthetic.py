@@ -0,0 +1,47 @@
+# Synthetic flight schedules shaped like data/flights.json, for benchmarks only.
+
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterator, List
+import random
+import json
+import os
+
+_DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data")
+
+AIRLINES = ["Air Canada", "WestJet", "Delta", "United", "American Airlines", "Aeromexico", "Volaris",
+            "Air France", "EasyJet", "ITA Airways", "Contoso Air", "Fabrikam Airlines", "Adventure Air"]
+
+def load_airports() -> List[Dict]:
+    with open(os.path.join(_DATA_DIR, "airport.json"), "r") as f:
+        return json.load(f)
+
+def generate_flights(count: int, seed: int = 42) -> Iterator[Dict]:
+    """Yield `count` flight entities, deterministic for a given seed"""
+    rng = random.Random(seed)
+    airports = load_airports()
+    countries = sorted({airport["PartitionKey"] for airport in airports})
+    codes = [airport["RowKey"] for airport in airports]
+    start = datetime(2024, 7, 1, tzinfo=timezone.utc)
+
+    for i in range(count):
+        from_airport, to_airport = rng.sample(codes, 2)
+        minutes = rng.randrange(60, 14 * 60, 5)
+        departure = start + timedelta(minutes=rng.randrange(0, 60 * 24 * 60, 5))
+        arrival = departure + timedelta(minutes=minutes)
+        capacity = rng.choice([42, 90, 150, 180, 220, 300])
+        airline = rng.choice(AIRLINES)
+
+        yield {
+            "PartitionKey": rng.choice(countries),
+            "RowKey": f"{airline.split()[0]}{i:07d}",
+            "Airline": airline,
+            "FromAirport": from_airport,
+            "ToAirport": to_airport,
+            "Price": rng.randrange(80, 2500),
+            "SeatsAvailable": rng.randrange(0, capacity + 1),
+            "MaxSeatCapacity": capacity,
+            "Duration": f"{minutes // 60}h {minutes % 60}m",
+            "DirectFlight": rng.random() < 0.7,
+            "DepartureTime": departure.strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "ArrivalTime": arrival.strftime("%Y-%m-%dT%H:%M:%SZ")
+        }
@@ -0,0 +1,173 @@
+# Throughput of the API served by gunicorn with 1, 2, 4... workers on the in-memory storage.
+#
+#   python -m benchmarks.workers --workers 1 2 4 8 --flights 100000 --duration 20
+#
+# Unlike benchmarks.load the requests go over HTTP to a real gunicorn server, sent by
+# --clients processes so the load generator does not saturate before the server.
+# The workload only reads: with the in-memory storage every worker holds its own copy
+# of the data, so bookings made by one worker would not be seen by the others.
+# Throughput can only grow while workers and clients have free cores, run it on a
+# machine with more cores than --workers + --clients.
+
+from benchmarks.synthetic import generate_flights, load_airports
+from benchmarks.report import summarize
+from typing import Dict, List
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+# Share of each read in the workload
+WORKLOAD = {
+    "airports": 20,
+    "country": 10,
+    "destination": 45,
+    "origin": 25
+}
+
+def _write_data(path: str, flights: int, seed: int) -> None:
+    with open(os.path.join(path, "airport.json"), "w", encoding="utf-8") as f:
+        json.dump(load_airports(), f)
+    with open(os.path.join(path, "flights.json"), "w", encoding="utf-8") as f:
+        json.dump(list(generate_flights(flights, seed)), f)
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def _path(operation: str, rng: random.Random, countries: List[str], airports: List[str]) -> str:
+    if operation == "airports":
+        return "/api/airport/"
+    if operation == "country":
+        return f"/api/flight/country/{rng.choice(countries)}"
+    prefix = "/api/flight/origin" if operation == "origin" else "/api/flight"
+    return f"{prefix}/{rng.choice(countries)}/{rng.choice(airports)}"
+
+async def run_client(base_url: str, duration: float, concurrency: int, seed: int) -> dict:
+    import httpx
+
+    airports = load_airports()
+    countries = sorted({airport["PartitionKey"] for airport in airports})
+    codes = [airport["RowKey"] for airport in airports]
+    samples: List[float] = []
+    errors = 0
+
+    async with httpx.AsyncClient(base_url=base_url, headers={"X-MS-CLIENT-PRINCIPAL-NAME": "benchmark@example.com"},
+                                 limits=httpx.Limits(max_connections=concurrency), timeout=30) as client:
+        deadline = time.perf_counter() + duration
+
+        async def user(rng: random.Random) -> None:
+            nonlocal errors
+            while time.perf_counter() < deadline:
+                operation = rng.choices(list(WORKLOAD), weights=list(WORKLOAD.values()))[0]
+                started = time.perf_counter()
+                response = await client.get(_path(operation, rng, countries, codes))
+                samples.append(time.perf_counter() - started)
+                if response.status_code != 200:
+                    errors += 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*[user(random.Random(seed + i)) for i in range(concurrency)])
+        elapsed = time.perf_counter() - start
+
+    return {"samples": samples, "elapsed": elapsed, "errors": errors}
+
+def _wait_ready(base_url: str, server: subprocess.Popen, timeout: float) -> None:
+    import httpx
+
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"gunicorn exited with code {server.returncode}")
+        try:
+            if httpx.get(f"{base_url}/api/airport/", headers={"X-MS-CLIENT-PRINCIPAL-NAME": "benchmark@example.com"}).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        time.sleep(0.2)
+    raise TimeoutError(f"gunicorn not ready after {timeout}s")
+
+def run_workers(args, workers: int, data_path: str) -> dict:
+    port = _free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    environment = dict(os.environ, STORAGE_BACKEND="memory", STORAGE_DATA_PATH=data_path, IS_DEVELOPMENT="false",
+                       WEB_CONCURRENCY=str(workers), BIND=f"127.0.0.1:{port}")
+    server = subprocess.Popen([sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "--log-level", "warning", "main:app"],
+                              env=environment, stdout=subprocess.DEVNULL)
+    try:
+        # Every worker loads the flight index before it accepts requests
+        _wait_ready(base_url, server, args.startup_timeout)
+        time.sleep(args.warmup)
+
+        outputs = []
+        clients = []
+        for i in range(args.clients):
+            with tempfile.NamedTemporaryFile(suffix=".json", delete=False) as f:
+                outputs.append(f.name)
+            clients.append(subprocess.Popen([sys.executable, "-m", "benchmarks.workers",
+                                             "--client", base_url,
+                                             "--duration", str(args.duration),
+                                             "--concurrency", str(args.concurrency),
+                                             "--seed", str(args.seed + i * 1000),
+                                             "--output", outputs[-1]]))
+        for client in clients:
+            client.wait()
+
+        samples: List[float] = []
+        elapsed = errors = 0
+        for output in outputs:
+            with open(output, "r", encoding="utf-8") as f:
+                result = json.load(f)
+            os.remove(output)
+            samples.extend(result["samples"])
+            elapsed = max(elapsed, result["elapsed"])
+            errors += result["errors"]
+    finally:
+        server.terminate()
+        server.wait(timeout=60)
+
+    return {"workers": workers, "errors": errors, "total": summarize(samples, elapsed)}
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Throughput of the flight API against the number of gunicorn workers")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--flights", type=int, default=100000)
+    parser.add_argument("--clients", type=int, default=2, help="Load generator processes")
+    parser.add_argument("--concurrency", type=int, default=32, help="Concurrent requests per client process")
+    parser.add_argument("--duration", type=float, default=20, help="Seconds of load per worker count")
+    parser.add_argument("--warmup", type=float, default=1)
+    parser.add_argument("--startup-timeout", type=float, default=120)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--client", help=argparse.SUPPRESS)
+    parser.add_argument("--output", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.client:
+        # Load generator process
+        result = asyncio.run(run_client(args.client, args.duration, args.concurrency, args.seed))
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f)
+        return
+
+    results: Dict[int, dict] = {}
+    with tempfile.TemporaryDirectory() as data_path:
+        _write_data(data_path, args.flights, args.seed)
+        print(f"flights={args.flights} clients={args.clients}x{args.concurrency} duration={args.duration}s cores={os.cpu_count()}")
+        print(f"  {'workers':>8}{'req/s':>10}{'speedup':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errors':>8}")
+        for workers in args.workers:
+            result = run_workers(args, workers, data_path)
+            results[workers] = result
+            total = result["total"]
+            speedup = total["throughput"] / results[args.workers[0]]["total"]["throughput"]
+            print(f"  {workers:>8}{total['throughput']:>10.1f}{speedup:>10.2f}"
+                  f"{total['p50_ms']:>10.2f}{total['p95_ms']:>10.2f}{total['p99_ms']:>10.2f}{result['errors']:>8}")
+
+if __name__ == "__main__":
+    main()
@@ -1,43 +1,178 @@
 from contextlib import asynccontextmanager
-from azure.data.tables.aio import TableClient, TableServiceClient
-from azure.identity.aio import DefaultAzureCredential
-from azure.cosmos.aio import CosmosClient
 from repository.flight_repository import FlightRepository
+from storage import create_storage
+from services import AirportCatalog, SeatInventory, FlightIndex, QueryCoalescer, FlightLookup, BookingReconciler, OccupancyView, MemoryIdempotencyStore, TableIdempotencyStore, BookingQueue, InvalidationBus, Warmup, RoutePlanner, FlightColumns
+from monitoring import MetricsRegistry, MetricsMiddleware, InstrumentedTableClient, InstrumentedContainer
+from dependencies import get_logger, get_config
 from fastapi import FastAPI
-from config import Config
-
-config = Config()
+from fastapi.responses import PlainTextResponse
+from responses import FastJSONResponse
+import asyncio
 
 @asynccontextmanager
 async def lifespan_event(app: FastAPI):
     
-    table_service_client = TableServiceClient(endpoint=config.storage_endpoint,credential=DefaultAzureCredential())
-    app.state.table_client_airport = table_service_client.get_table_client(table_name=config.airport_table)
-    app.state.table_client_flight = table_service_client.get_table_client(table_name=config.flight_table)
-
-    # Create cosmosdb repository
-    credential = DefaultAzureCredential()
-    cosmos_client = CosmosClient(url=config.cosmos_endpoint,
-                                 credential=credential)
-    
-    container = cosmos_client.get_database_client(config.cosmos_database).get_container_client(config.cosmos_container)
+    metrics: MetricsRegistry = app.state.metrics
+    config = await get_config()
+
+    logger = await get_logger()
+
+    # Azure clients, or the in-memory engine loaded from data/*.json
+    storage = create_storage(config, logger)
+    app.state.table_client_airport = InstrumentedTableClient(storage.table_client_airport, "table_airport", metrics)
+    app.state.table_client_flight = InstrumentedTableClient(storage.table_client_flight, "table_flight", metrics)
+    container = InstrumentedContainer(storage.container, "cosmos", metrics)
+
+    app.state.repository = FlightRepository(container, logger)
+
+    seat_inventory = SeatInventory(app.state.table_client_flight, logger, config.seat_update_max_retries)
+    app.state.seat_inventory = seat_inventory
+
+    # Identical concurrent flight queries share one Table query, dropped on seat changes
+    query_coalescer = QueryCoalescer(config.flight_query_cache_ttl)
+    seat_inventory.add_listener(query_coalescer.flight_updated)
+    app.state.query_coalescer = query_coalescer
+
+    # Booking documents written behind the response from a durable local queue, synchronous without a queue path
+    booking_queue = None
+    if config.booking_queue_path:
+        booking_queue = BookingQueue(config.booking_queue_path, app.state.repository, seat_inventory, logger,
+                                     config.booking_queue_workers, config.booking_queue_batch_size,
+                                     config.booking_queue_max_attempts, config.booking_queue_retention)
+        booking_queue.start()
+    app.state.booking_queue = booking_queue
+
+    # Responses of the write requests replayed for retries carrying the same Idempotency-Key
+    if config.idempotency_store == 'table':
+        if storage.table_client_idempotency is None:
+            raise ValueError("IDEMPOTENCY_STORE=table needs AZURE_STORAGE_IDEMPOTENCY_TABLE")
+        app.state.idempotency_store = TableIdempotencyStore(InstrumentedTableClient(storage.table_client_idempotency, "table_idempotency", metrics),
+                                                            config.idempotency_ttl)
+        await app.state.idempotency_store.create_table()
+    else:
+        app.state.idempotency_store = MemoryIdempotencyStore(config.idempotency_ttl, config.idempotency_max_entries)
+
+    # Flight reads of the legacy bookings, bounded filters run with a limited fan-out
+    app.state.flight_lookup = FlightLookup(app.state.table_client_flight, config.flight_lookup_chunk_size, config.flight_lookup_concurrency)
+
+    # Airport catalog and flight index served from memory, refreshed in the background
+    airport_catalog = AirportCatalog(app.state.table_client_airport, config.airport_cache_ttl, logger)
+    flight_index = FlightIndex(app.state.table_client_flight, config.flight_index_ttl, logger)
+    seat_inventory.add_listener(flight_index.flight_updated)
+
+    # Connecting itineraries searched over the schedule of the index, patched after each of its loads
+    route_planner = RoutePlanner(flight_index, airport_catalog, config.route_min_connection,
+                                 config.route_min_connection_international, config.route_max_connection)
+    flight_index.add_listener(route_planner.schedule_changed)
 
-    app.state.repository = FlightRepository(container)
+    # Columnar copy of the schedule for the filtered, sorted flight queries
+    flight_columns = FlightColumns(flight_index, logger)
+    flight_index.add_listener(flight_columns.schedule_changed)
+    seat_inventory.add_listener(flight_columns.flight_updated)
+
+    # Bookings per flight maintained from the change feed of the booking container
+    occupancy_view = OccupancyView(container, config.occupancy_view_poll_interval, config.occupancy_view_rebuild_interval,
+                                   logger, config.occupancy_view_checkpoint_path)
+    app.state.repository.add_delete_listener(occupancy_view.booking_deleted)
+
+    # Tokens fetched and connections opened before the first request, the instance
+    # reports ready once they are and the catalog and the index are loaded
+    warmup_steps = {"table": lambda: _prime_table(app.state.table_client_flight),
+                    "cosmos": container.read}
+    if storage.credential is not None:
+        warmup_steps["credential"] = lambda: asyncio.gather(*[storage.credential.get_token(scope) for scope in storage.token_scopes])
+    warmup = Warmup(warmup_steps,
+                    {"airport_catalog": lambda: airport_catalog.is_loaded, "flight_index": lambda: flight_index.is_loaded},
+                    config.warmup_retry_interval, config.warmup_timeout, logger)
+    await warmup.load()
+    warmup.start()
+    app.state.warmup = warmup
+
+    async def initial_load(snapshot) -> None:
+        try:
+            await snapshot.load()
+        except Exception as e:
+            logger.error(f"{type(snapshot).__name__} initial load failed, will retry in background: {e}")
+        snapshot.start()
+
+    snapshots = [airport_catalog, flight_index, occupancy_view]
+    await asyncio.gather(*[initial_load(snapshot) for snapshot in snapshots])
+
+    # Seat changes, cancellations and airport catalog changes shared with the other workers of the host
+    invalidation_bus = None
+    if config.invalidation_bus_path:
+        invalidation_bus = InvalidationBus(config.invalidation_bus_path, logger)
+        await invalidation_bus.start()
+        seat_inventory.add_listener(lambda entity: invalidation_bus.publish("flight", {"PartitionKey": entity['PartitionKey'],
+                                                                                        "RowKey": entity['RowKey'],
+                                                                                        "SeatsAvailable": entity['SeatsAvailable']}))
+        invalidation_bus.subscribe("flight", query_coalescer.flight_updated)
+        invalidation_bus.subscribe("flight", flight_index.flight_updated)
+        invalidation_bus.subscribe("flight", flight_columns.flight_updated)
+        app.state.repository.add_delete_listener(lambda id: invalidation_bus.publish("booking_deleted", {"id": id}))
+        invalidation_bus.subscribe("booking_deleted", lambda data: occupancy_view.booking_deleted(data['id']))
+        airport_catalog.add_listener(lambda etag: invalidation_bus.publish("airports", {"etag": etag}))
+        invalidation_bus.subscribe("airports", lambda data: airport_catalog.catalog_changed(data['etag']))
+    app.state.invalidation_bus = invalidation_bus
+
+    app.state.airport_catalog = airport_catalog
+    app.state.flight_index = flight_index
+    app.state.route_planner = route_planner
+    app.state.flight_columns = flight_columns
+    app.state.occupancy_view = occupancy_view
+
+    # Refreshes the flight snapshot of the booking documents, the first pass runs after one interval
+    booking_reconciler = BookingReconciler(app.state.repository, flight_index, config.booking_reconcile_interval,
+                                           config.booking_batch_concurrency, logger)
+    booking_reconciler.start()
 
     yield
 
+    await booking_reconciler.stop()
+    if booking_queue is not None:
+        await booking_queue.stop()
+    for snapshot in snapshots:
+        await snapshot.stop()
+    await warmup.stop()
+    if invalidation_bus is not None:
+        await invalidation_bus.stop()
+
+    await storage.close()
+
+async def _prime_table(table_client) -> None:
+    # One entity read opens the connection of the table service
+    async for _ in table_client.list_entities(results_per_page=1, select=["RowKey"]):
+        break
+
 class Boostrapper:
 
     def run(self) -> FastAPI:
 
         app = FastAPI(lifespan=lifespan_event,
+                      default_response_class=FastJSONResponse,
                       title="Flight Booking API",
                       description="API for managing flights bookings",
                       version="1.0.0")
      
         self._configure_monitoring(app)
+        self._configure_readiness(app)
         
         return app
      
     def _configure_monitoring(self, app: FastAPI):
-        ...
\ No newline at end of file
+        # Latency histograms per route and per dependency, no external collector needed
+        metrics = MetricsRegistry()
+        app.state.metrics = metrics
+        app.add_middleware(MetricsMiddleware, registry=metrics)
+
+        @app.get('/metrics', include_in_schema=False)
+        async def get_metrics() -> PlainTextResponse:
+            return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+    def _configure_readiness(self, app: FastAPI):
+        # Green once the warm-up passed, for the readiness probe of the load balancer
+        @app.get('/ready', include_in_schema=False)
+        async def get_ready() -> FastJSONResponse:
+            warmup = getattr(app.state, 'warmup', None)
+            status = warmup.status() if warmup is not None else {"ready": False, "checks": {}}
+            return FastJSONResponse(status, status_code=200 if status["ready"] else 503)
@@ -1,47 +1,184 @@
 from dotenv import load_dotenv
+from functools import cached_property
 import os
 
 load_dotenv(override=True)
 
 class Config:
+    """Settings of the API, read from the environment when the instance is created.
 
-    @property
+    Every setting is parsed once in the constructor, so a malformed value fails the
+    startup instead of a request, and the instance is read only afterwards.
+    """
+
+    def __init__(self):
+        for name, value in vars(Config).items():
+            if isinstance(value, cached_property):
+                getattr(self, name)
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"Config is read only, {name} cannot be set")
+
+    def __delattr__(self, name):
+        raise AttributeError(f"Config is read only, {name} cannot be deleted")
+
+    @cached_property
     def storage_endpoint(self) -> str:
         return os.getenv('AZURE_STORAGE_ENDPOINT')
     
-    @property
+    @cached_property
     def airport_table(self) -> str:
         return os.getenv('AZURE_STORAGE_AIRPORT_TABLE')
     
-    @property
+    @cached_property
     def flight_table(self) -> str:
         return os.getenv('AZURE_STORAGE_FLIGHT_TABLE')
 
-    @property
+    @cached_property
     def is_development(self) -> bool:
         value = os.getenv('IS_DEVELOPMENT', 'false').lower()
         return value in ['true', '1', 'yes']    
     
-    @property
+    @cached_property
     def storage_access_key(self) -> str:
         return os.getenv('STORAGE_ACCESS_KEY')
     
-    @property
+    @cached_property
     def storage_connection_string(self) -> str:
         return os.getenv('AZURE_STORAGE_CONNECTION_STRING')
 
-    @property
+    @cached_property
     def cosmos_endpoint(self) -> str:
         return os.getenv('AZURE_COSMOSDB_ENDPOINT')
     
-    @property
+    @cached_property
     def cosmos_database(self) -> str:
         return os.getenv('COSMOS_DATABASE')
     
-    @property
+    @cached_property
     def cosmos_container(self) -> str:
         return os.getenv('COSMOS_CONTAINER')
     
-    @property
+    @cached_property
     def user_principal_name(self) -> str:
-        return os.getenv('USER_PRINCIPAL_NAME')
\ No newline at end of file
+        return os.getenv('USER_PRINCIPAL_NAME')
+    
+    @cached_property
+    def airport_cache_ttl(self) -> int:
+        return int(os.getenv('AIRPORT_CACHE_TTL_SECONDS', '300'))
+    
+    @cached_property
+    def seat_update_max_retries(self) -> int:
+        return int(os.getenv('SEAT_UPDATE_MAX_RETRIES', '5'))
+    
+    @cached_property
+    def booking_batch_max_size(self) -> int:
+        return int(os.getenv('BOOKING_BATCH_MAX_SIZE', '100'))
+    
+    @cached_property
+    def booking_batch_concurrency(self) -> int:
+        return int(os.getenv('BOOKING_BATCH_CONCURRENCY', '10'))
+    
+    @cached_property
+    def flight_index_ttl(self) -> int:
+        return int(os.getenv('FLIGHT_INDEX_TTL_SECONDS', '300'))
+    
+    @cached_property
+    def flight_query_cache_ttl(self) -> float:
+        return float(os.getenv('FLIGHT_QUERY_CACHE_TTL_SECONDS', '2'))
+    
+    @cached_property
+    def flight_lookup_chunk_size(self) -> int:
+        return int(os.getenv('FLIGHT_LOOKUP_CHUNK_SIZE', '14'))
+    
+    @cached_property
+    def flight_lookup_concurrency(self) -> int:
+        return int(os.getenv('FLIGHT_LOOKUP_CONCURRENCY', '8'))
+    
+    @cached_property
+    def booking_reconcile_interval(self) -> int:
+        return int(os.getenv('BOOKING_RECONCILE_INTERVAL_SECONDS', '3600'))
+    
+    @cached_property
+    def occupancy_view_poll_interval(self) -> int:
+        return int(os.getenv('OCCUPANCY_VIEW_POLL_SECONDS', '5'))
+    
+    @cached_property
+    def occupancy_view_rebuild_interval(self) -> int:
+        return int(os.getenv('OCCUPANCY_VIEW_REBUILD_SECONDS', '3600'))
+    
+    @cached_property
+    def occupancy_view_checkpoint_path(self) -> str:
+        return os.getenv('OCCUPANCY_VIEW_CHECKPOINT_PATH')
+    
+    @cached_property
+    def idempotency_store(self) -> str:
+        return os.getenv('IDEMPOTENCY_STORE', 'memory').lower()
+    
+    @cached_property
+    def idempotency_table(self) -> str:
+        return os.getenv('AZURE_STORAGE_IDEMPOTENCY_TABLE')
+    
+    @cached_property
+    def idempotency_ttl(self) -> int:
+        return int(os.getenv('IDEMPOTENCY_TTL_SECONDS', '86400'))
+    
+    @cached_property
+    def idempotency_max_entries(self) -> int:
+        return int(os.getenv('IDEMPOTENCY_MAX_ENTRIES', '10000'))
+    
+    @cached_property
+    def booking_queue_path(self) -> str:
+        return os.getenv('BOOKING_QUEUE_PATH')
+    
+    @cached_property
+    def booking_queue_workers(self) -> int:
+        return int(os.getenv('BOOKING_QUEUE_WORKERS', '4'))
+    
+    @cached_property
+    def booking_queue_batch_size(self) -> int:
+        return int(os.getenv('BOOKING_QUEUE_BATCH_SIZE', '10'))
+    
+    @cached_property
+    def booking_queue_max_attempts(self) -> int:
+        return int(os.getenv('BOOKING_QUEUE_MAX_ATTEMPTS', '8'))
+    
+    @cached_property
+    def booking_queue_retention(self) -> int:
+        return int(os.getenv('BOOKING_QUEUE_RETENTION_SECONDS', '86400'))
+    
+    @cached_property
+    def invalidation_bus_path(self) -> str:
+        return os.getenv('INVALIDATION_BUS_PATH')
+    
+    @cached_property
+    def token_refresh_margin(self) -> int:
+        return int(os.getenv('TOKEN_REFRESH_MARGIN_SECONDS', '600'))
+    
+    @cached_property
+    def warmup_timeout(self) -> int:
+        return int(os.getenv('WARMUP_TIMEOUT_SECONDS', '30'))
+    
+    @cached_property
+    def warmup_retry_interval(self) -> int:
+        return int(os.getenv('WARMUP_RETRY_SECONDS', '10'))
+    
+    @cached_property
+    def route_min_connection(self) -> int:
+        return int(os.getenv('ROUTE_MIN_CONNECTION_MINUTES', '45'))
+    
+    @cached_property
+    def route_min_connection_international(self) -> int:
+        return int(os.getenv('ROUTE_MIN_CONNECTION_INTERNATIONAL_MINUTES', '90'))
+    
+    @cached_property
+    def route_max_connection(self) -> int:
+        return int(os.getenv('ROUTE_MAX_CONNECTION_MINUTES', '720'))
+    
+    @cached_property
+    def storage_backend(self) -> str:
+        return os.getenv('STORAGE_BACKEND', 'azure').lower()
+    
+    @cached_property
+    def storage_data_path(self) -> str:
+        return os.getenv('STORAGE_DATA_PATH')
\ No newline at end of file
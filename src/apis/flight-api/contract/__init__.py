@@ -1,3 +1,7 @@
 from .book_request import BookRequest
 from .flight_info_request import FlightInfoRequest
-from .booking_info_request import BookingInfoRequest
\ No newline at end of file
+from .booking_info_request import BookingInfoRequest
+from .batch_booking_result import BatchBookingResult
+from .flight_occupancy import FlightOccupancy
+from .booking_status import BookingStatus
+from .itinerary import Itinerary, Connection
\ No newline at end of file
@@ -0,0 +1,9 @@
+from pydantic import BaseModel, Field
+from typing import Optional
+
+class BatchBookingResult(BaseModel):
+    id: Optional[str] = Field(default=None, alias="bookingId")
+    country: str
+    flight_code: str = Field(default=None, alias='flightCode')
+    status: str # booked or failed
+    error: Optional[str] = None
@@ -0,0 +1,10 @@
+from pydantic import BaseModel, Field
+from datetime import datetime
+from typing import Optional
+
+class BookingStatus(BaseModel):
+    id: str = Field(default=None, alias="bookingId")
+    status: str # pending, written, failed or cancelled
+    attempts: int = 0 # Failed writes to CosmosDB
+    error: Optional[str] = None # Last write error
+    updated_at: Optional[datetime] = Field(default=None, alias='updatedAt')
\ No newline at end of file
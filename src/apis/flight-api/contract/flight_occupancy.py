@@ -0,0 +1,9 @@
+from pydantic import BaseModel, Field
+from typing import Optional
+
+class FlightOccupancy(BaseModel):
+    country: str
+    flight_code: str = Field(default=None, alias='flightCode')
+    bookings: int # Counted by the occupancy view
+    seats_taken: Optional[int] = Field(default=None, alias='seatsTaken') # MaxSeatCapacity - SeatsAvailable, missing when the flight is not indexed
+    drift: Optional[int] = None # seatsTaken - bookings
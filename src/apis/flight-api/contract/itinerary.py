@@ -0,0 +1,19 @@
+from pydantic import BaseModel, Field
+from datetime import datetime
+from typing import List
+from models import Flight
+
+class Connection(BaseModel):
+    airport: str
+    duration: str # Time between the arrival and the next departure, like 1h 30m
+
+class Itinerary(BaseModel):
+    from_airport: str = Field(..., alias='fromAirport')
+    to_airport: str = Field(..., alias='toAirport')
+    departure_time: datetime = Field(..., alias='departureTime')
+    arrival_time: datetime = Field(..., alias='arrivalTime')
+    duration: str # Departure of the first flight to arrival of the last one
+    stops: int
+    price: int # Sum of the flight prices
+    connections: List[Connection] = []
+    flights: List[Flight]
@@ -3,7 +3,9 @@ from fastapi import Request, HTTPException
 from azure.data.tables.aio import TableClient
 from config import Config
 from repository.flight_repository import FlightRepository
+from services import AirportCatalog, SeatInventory, FlightIndex, QueryCoalescer, FlightLookup, OccupancyView, IdempotencyStore, BookingQueue, RoutePlanner, FlightColumns
 from logging import Logger
+from typing import Optional
 import logging
 import sys
 
@@ -27,19 +29,53 @@ _logger.addHandler(stream_handler)
 # Dependency methods using dependency 
 # injection in the route
 ######################################
-def get_table_client_airport(request:Request) -> TableClient:
+# Coroutines on purpose, FastAPI runs plain functions in the threadpool
+async def get_table_client_airport(request:Request) -> TableClient:
     return request.app.state.table_client_airport
 
-def get_table_client_flight(request:Request) -> TableClient:
+async def get_table_client_flight(request:Request) -> TableClient:
     return request.app.state.table_client_flight
 
-def get_booking_repository(request:Request) -> FlightRepository:
+async def get_airport_catalog(request:Request) -> AirportCatalog:
+    return request.app.state.airport_catalog
+
+async def get_seat_inventory(request:Request) -> SeatInventory:
+    return request.app.state.seat_inventory
+
+async def get_flight_index(request:Request) -> FlightIndex:
+    return request.app.state.flight_index
+
+async def get_route_planner(request:Request) -> RoutePlanner:
+    return request.app.state.route_planner
+
+async def get_flight_columns(request:Request) -> FlightColumns:
+    return request.app.state.flight_columns
+
+async def get_query_coalescer(request:Request) -> QueryCoalescer:
+    return request.app.state.query_coalescer
+
+async def get_flight_lookup(request:Request) -> FlightLookup:
+    return request.app.state.flight_lookup
+
+async def get_occupancy_view(request:Request) -> OccupancyView:
+    return request.app.state.occupancy_view
+
+async def get_idempotency_store(request:Request) -> IdempotencyStore:
+    return request.app.state.idempotency_store
+
+async def get_booking_queue(request:Request) -> Optional[BookingQueue]:
+    return request.app.state.booking_queue
+
+async def get_booking_repository(request:Request) -> FlightRepository:
     return request.app.state.repository
 
-def get_logger() -> Logger:
+async def get_logger() -> Logger:
     return _logger
 
-def get_easy_auth_token(request: Request)->str:
+async def get_config() -> Config:
+    return _config
+
+async def get_easy_auth_token(request: Request)->str:
     if _config.is_development:
         user_principal_id = _config.user_principal_name
     else:
@@ -0,0 +1,34 @@
+# Multi-worker deployment of the API: gunicorn -c gunicorn.conf.py main:app
+#
+# Each worker is a process with its own caches (airport catalog, flight index,
+# query results, occupancy view). Seat changes, cancellations and catalog changes
+# are broadcast to the other workers through Unix sockets in INVALIDATION_BUS_PATH.
+# Use STORAGE_BACKEND=azure and IDEMPOTENCY_STORE=table with several workers, the
+# in-memory storage and idempotency store are per process. One worker by default,
+# set WEB_CONCURRENCY once the stores are shared.
+
+import os
+import shutil
+import tempfile
+
+bind = os.getenv("BIND", "0.0.0.0:8000")
+workers = int(os.getenv("WEB_CONCURRENCY", "1"))
+worker_class = "uvicorn.workers.UvicornWorker"
+# The startup of a worker loads the flight index, which takes a while on large schedules
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+graceful_timeout = 30
+keepalive = 5
+
+# Read by the workers, they are forked after this file runs
+_bus_created = not os.getenv("INVALIDATION_BUS_PATH")
+if _bus_created:
+    os.environ["INVALIDATION_BUS_PATH"] = tempfile.mkdtemp(prefix="flightapi-bus-")
+
+def when_ready(server):
+    if workers > 1 and os.getenv("IDEMPOTENCY_STORE", "memory").lower() == "memory":
+        server.log.warning(f"{workers} workers with IDEMPOTENCY_STORE=memory: a retried request reaching "
+                           "another worker is executed again, use IDEMPOTENCY_STORE=table")
+
+def on_exit(server):
+    if _bus_created:
+        shutil.rmtree(os.environ["INVALIDATION_BUS_PATH"], ignore_errors=True)
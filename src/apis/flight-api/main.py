@@ -12,6 +12,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "X-Continuation-Token", "Server-Timing", "Idempotent-Replayed", "Location", "X-Total-Count"],
 )
 
 for route in routes:
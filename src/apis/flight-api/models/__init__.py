@@ -1,3 +1,4 @@
 from .airport import Airport
 from .flight import Flight
+from .flight_snapshot import FlightSnapshot
 from .flight_info import FlightInfo
\ No newline at end of file
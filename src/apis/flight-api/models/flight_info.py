@@ -1,7 +1,10 @@
 from pydantic import BaseModel, Field
+from typing import Optional
+from .flight_snapshot import FlightSnapshot
 
 class FlightInfo(BaseModel):
     id: str
     country: str
     flight_code: str = Field(default=None, alias='flightCode')
-    username: str # Partition Key
\ No newline at end of file
+    username: str # Partition Key
+    flight: Optional[FlightSnapshot] = None # Missing on bookings written before the snapshot
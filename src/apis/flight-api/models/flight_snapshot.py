@@ -0,0 +1,23 @@
+from pydantic import BaseModel, Field
+from datetime import datetime
+from typing import Any, Mapping
+
+class FlightSnapshot(BaseModel):
+    """Copy of the flight fields shown with a booking, stored in the booking document"""
+    airline: str
+    from_airport: str = Field(..., alias='fromAirport')
+    to_airport: str = Field(..., alias='toAirport')
+    duration: str
+    direct_flight: bool = Field(..., alias='directFlight')
+    departure_time: datetime = Field(..., alias='departureTime')
+    arrival_time: datetime = Field(..., alias='arrivalTime')
+
+    @classmethod
+    def from_entity(cls, entity: Mapping[str, Any]) -> "FlightSnapshot":
+        return cls(airline=entity['Airline'],
+                   fromAirport=entity['FromAirport'],
+                   toAirport=entity['ToAirport'],
+                   duration=entity['Duration'],
+                   directFlight=entity['DirectFlight'],
+                   departureTime=entity['DepartureTime'],
+                   arrivalTime=entity['ArrivalTime'])
@@ -0,0 +1,3 @@
+from .metrics import MetricsRegistry
+from .middleware import MetricsMiddleware
+from .instrumentation import InstrumentedTableClient, InstrumentedContainer
@@ -0,0 +1,148 @@
+from azure.cosmos.aio import ContainerProxy
+from azure.data.tables.aio import TableClient
+from typing import Any, AsyncIterator, Callable, Mapping, Optional
+from storage import is_pager
+from .metrics import MetricsRegistry
+import functools
+import time
+
+class InstrumentedTableClient:
+    """Proxy of an async TableClient timing every call made to Table Storage"""
+
+    _TIMED = ('get_entity', 'create_entity', 'update_entity', 'upsert_entity', 'delete_entity', 'submit_transaction')
+
+    def __init__(self, table_client: TableClient, dependency: str, registry: MetricsRegistry):
+        self._table_client = table_client
+        self._dependency = dependency
+        self._registry = registry
+
+    def __getattr__(self, name: str) -> Any:
+        attribute = getattr(self._table_client, name)
+        if name in self._TIMED:
+            return _timed(attribute, self._dependency, name, self._registry)
+        return attribute
+
+    def query_entities(self, query_filter: str, **kwargs) -> "_TimedPages":
+        return _TimedPages(self._table_client.query_entities(query_filter, **kwargs),
+                           self._dependency, 'query_entities', self._registry)
+
+    def list_entities(self, **kwargs) -> "_TimedPages":
+        return _TimedPages(self._table_client.list_entities(**kwargs),
+                           self._dependency, 'list_entities', self._registry)
+
+class InstrumentedContainer:
+    """Proxy of an async Cosmos ContainerProxy timing every call and recording its RU charge"""
+
+    _TIMED = ('create_item', 'read_item', 'upsert_item', 'replace_item', 'patch_item', 'delete_item')
+
+    def __init__(self, container: ContainerProxy, dependency: str, registry: MetricsRegistry):
+        self._container = container
+        self._dependency = dependency
+        self._registry = registry
+
+    def __getattr__(self, name: str) -> Any:
+        attribute = getattr(self._container, name)
+        if name in self._TIMED:
+            return _timed(attribute, self._dependency, name, self._registry, charged=True)
+        return attribute
+
+    def query_items(self, *args, **kwargs) -> "_TimedPages":
+        charge = kwargs['response_hook'] = _ChargeHook(kwargs.get('response_hook'))
+        return _TimedPages(self._container.query_items(*args, **kwargs),
+                           self._dependency, 'query_items', self._registry, charge)
+
+    def query_items_change_feed(self, *args, **kwargs) -> "_TimedPages":
+        charge = kwargs['response_hook'] = _ChargeHook(kwargs.get('response_hook'))
+        return _TimedPages(self._container.query_items_change_feed(*args, **kwargs),
+                           self._dependency, 'query_items_change_feed', self._registry, charge)
+
+class _ChargeHook:
+    """Cosmos response_hook summing the RU charge of the responses of one call, then calling
+    the hook of the caller. The charge is read from the headers of each response, the
+    last_response_headers of the client are shared by concurrent calls. The call made
+    when a pager is created carries those shared headers, it is not counted."""
+
+    def __init__(self, hook: Optional[Callable[[Mapping[str, str], Any], None]] = None):
+        self._hook = hook
+        self.total = 0.0
+        self.responses = 0
+
+    def __call__(self, headers: Mapping[str, str], result: Any) -> None:
+        if not is_pager(result):
+            self.total += float(headers.get('x-ms-request-charge', 0) or 0)
+            self.responses += 1
+        if self._hook:
+            self._hook(headers, result)
+
+def _timed(method, dependency: str, operation: str, registry: MetricsRegistry, charged: bool = False):
+    @functools.wraps(method)
+    async def wrapper(*args, **kwargs):
+        charge = None
+        if charged:
+            charge = kwargs['response_hook'] = _ChargeHook(kwargs.get('response_hook'))
+        start = time.perf_counter()
+        try:
+            return await method(*args, **kwargs)
+        finally:
+            registry.observe_dependency(dependency, operation, time.perf_counter() - start,
+                                        request_charge=charge.total if charge else None)
+    return wrapper
+
+class _TimedPages:
+    """Wraps an AsyncItemPaged, times the whole iteration and counts the pages read"""
+
+    def __init__(self, paged, dependency: str, operation: str, registry: MetricsRegistry, charge: Optional[_ChargeHook] = None):
+        self._paged = paged
+        self._dependency = dependency
+        self._operation = operation
+        self._registry = registry
+        self._charge = charge
+
+    def __aiter__(self) -> AsyncIterator:
+        return self._items()
+
+    async def _items(self) -> AsyncIterator:
+        async for page in self.by_page():
+            async for item in page:
+                yield item
+
+    def by_page(self, continuation_token: Optional[str] = None) -> "_TimedPageIterator":
+        return _TimedPageIterator(self._paged.by_page(continuation_token), self)
+
+class _TimedPageIterator:
+    """Records every page when it is read, so an iteration stopped after a page is complete"""
+
+    def __init__(self, pages, owner: _TimedPages):
+        self._pages = pages
+        self._owner = owner
+
+    @property
+    def continuation_token(self) -> Optional[str]:
+        return self._pages.continuation_token
+
+    def __aiter__(self) -> "_TimedPageIterator":
+        return self
+
+    async def __anext__(self):
+        charge = self._owner._charge
+        charge_before, responses_before = (charge.total, charge.responses) if charge else (0.0, 0)
+        start = time.perf_counter()
+        try:
+            page = await self._pages.__anext__()
+        except StopAsyncIteration:
+            # No page left, recorded when a request was sent to find it out
+            if charge and charge.responses > responses_before:
+                self._record(start, charge.total - charge_before, 0)
+            raise
+        except BaseException:
+            # The query failed
+            self._record(start, charge.total - charge_before if charge else None, 0)
+            raise
+
+        self._record(start, charge.total - charge_before if charge else None, 1)
+        return page
+
+    def _record(self, start: float, request_charge: Optional[float], pages: int) -> None:
+        owner = self._owner
+        owner._registry.observe_dependency(owner._dependency, owner._operation, time.perf_counter() - start,
+                                           request_charge=request_charge, pages=pages)
@@ -0,0 +1,98 @@
+from collections import defaultdict
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Tuple
+import bisect
+import threading
+
+# Upper bounds in seconds, shared by every latency histogram
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+# Downstream calls made while serving the current request, (name, seconds)
+request_timings: ContextVar[Optional[List[Tuple[str, float]]]] = ContextVar('request_timings', default=None)
+
+class Histogram:
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+class MetricsRegistry:
+    """Latency histograms and counters of the API, rendered in the Prometheus text format"""
+
+    def __init__(self, prefix: str = 'flightapi'):
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self._histograms: Dict[str, Dict[Labels, Histogram]] = defaultdict(dict)
+        self._counters: Dict[str, Dict[Labels, float]] = defaultdict(lambda: defaultdict(float))
+        self._help: Dict[str, str] = {}
+
+    def observe_request(self, method: str, route: str, status: int, seconds: float) -> None:
+        self._observe('request_duration_seconds', 'Duration of the HTTP requests per route',
+                      (('method', method), ('route', route), ('status', str(status))), seconds)
+
+    def observe_dependency(self, dependency: str, operation: str, seconds: float,
+                           request_charge: Optional[float] = None, pages: Optional[int] = None) -> None:
+        labels = (('dependency', dependency), ('operation', operation))
+        self._observe('dependency_duration_seconds', 'Duration of the calls to Table Storage and CosmosDB', labels, seconds)
+
+        if request_charge is not None:
+            self.increment('cosmos_request_charge_total', 'Request units consumed by CosmosDB calls', labels, request_charge)
+        if pages is not None:
+            self.increment('table_pages_total', 'Pages read by Table Storage queries', labels, pages)
+
+        timings = request_timings.get()
+        if timings is not None:
+            timings.append((f"{dependency}.{operation}", seconds))
+
+    def increment(self, name: str, help: str, labels: Labels, value: float = 1) -> None:
+        with self._lock:
+            self._help[name] = help
+            self._counters[name][labels] += value
+
+    def render(self) -> str:
+        lines = []
+        with self._lock:
+            for name, series in self._histograms.items():
+                metric = f"{self.prefix}_{name}"
+                lines.append(f"# HELP {metric} {self._help[name]}")
+                lines.append(f"# TYPE {metric} histogram")
+                for labels, histogram in series.items():
+                    cumulative = 0
+                    for bound, count in zip(list(histogram.buckets) + ['+Inf'], histogram.counts):
+                        cumulative += count
+                        lines.append(f"{metric}_bucket{_format_labels(labels + (('le', str(bound)),))} {cumulative}")
+                    lines.append(f"{metric}_sum{_format_labels(labels)} {histogram.sum}")
+                    lines.append(f"{metric}_count{_format_labels(labels)} {histogram.count}")
+
+            for name, series in self._counters.items():
+                metric = f"{self.prefix}_{name}"
+                lines.append(f"# HELP {metric} {self._help[name]}")
+                lines.append(f"# TYPE {metric} counter")
+                for labels, value in series.items():
+                    lines.append(f"{metric}{_format_labels(labels)} {value}")
+
+        return "\n".join(lines) + "\n"
+
+    def _observe(self, name: str, help: str, labels: Labels, value: float) -> None:
+        with self._lock:
+            self._help[name] = help
+            histogram = self._histograms[name].get(labels)
+            if histogram is None:
+                histogram = self._histograms[name][labels] = Histogram()
+            histogram.observe(value)
+
+def _format_labels(labels: Labels) -> str:
+    escaped = [f'{key}="{_escape(value)}"' for key, value in labels]
+    return "{" + ",".join(escaped) + "}"
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
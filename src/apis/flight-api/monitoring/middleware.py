@@ -0,0 +1,52 @@
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from collections import defaultdict
+from .metrics import MetricsRegistry, request_timings
+import time
+
+class MetricsMiddleware:
+    """Records the latency of every request per route and adds a Server-Timing header
+    with the time spent in each downstream dependency"""
+
+    def __init__(self, app: ASGIApp, registry: MetricsRegistry):
+        self.app = app
+        self.registry = registry
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        timings = []
+        token = request_timings.set(timings)
+        status = 500
+
+        async def send_with_timing(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", _server_timing(time.perf_counter() - start, timings).encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            request_timings.reset(token)
+            route = scope.get("route")
+            # Use the route template so the number of series stays bounded
+            path = getattr(route, "path", None) or "unmatched"
+            self.registry.observe_request(scope["method"], path, status, time.perf_counter() - start)
+
+def _server_timing(total: float, timings: list) -> str:
+    durations = defaultdict(float)
+    calls = defaultdict(int)
+    for name, seconds in timings:
+        durations[name] += seconds
+        calls[name] += 1
+
+    entries = [f"app;dur={total * 1000:.2f}"]
+    for name, seconds in durations.items():
+        entries.append(f'{name};dur={seconds * 1000:.2f};desc="{calls[name]} call(s)"')
+    return ", ".join(entries)
@@ -1,43 +1,136 @@
 from azure.cosmos.aio import ContainerProxy
-from models import FlightInfo
-from typing import List
+from azure.cosmos.exceptions import CosmosResourceExistsError, CosmosResourceNotFoundError
+from models import FlightInfo, FlightSnapshot
+from storage import is_pager
+from collections import defaultdict
+from logging import Logger
+from typing import AsyncIterator, Callable, Dict, List, Mapping, Optional, Tuple, Union
+import asyncio
 import uuid
 
 class FlightRepository:
-    def __init__(self,container:ContainerProxy):
+    def __init__(self,container:ContainerProxy,logger:Logger):
         self.container = container
-    
-    async def book_flight(self,country:str,flight_code:str,username:str) -> FlightInfo:
+        self.logger = logger
+        # Cumulative request units and calls per Cosmos operation
+        self.request_charges: Dict[str, Dict[str, float]] = defaultdict(lambda: {"calls": 0, "request_charge": 0.0})
+        self._delete_listeners: List[Callable[[str], None]] = []
+
+    def add_delete_listener(self, listener:Callable[[str], None]) -> None:
+        """Register a callback invoked with the id of each booking deleted"""
+        self._delete_listeners.append(listener)
+
+    def new_booking(self,country:str,flight_code:str,username:str,flight:Optional[FlightSnapshot] = None) -> FlightInfo:
         guid = str(uuid.uuid4())
-        flight_info = FlightInfo(
+        return FlightInfo(
             id=guid,
             country=country,
             flightCode=flight_code,
-            username=username
-        ) 
-        await self.container.create_item(flight_info.model_dump(by_alias=True))
-        return flight_info        
+            username=username,
+            flight=flight
+        )
+
+    async def book_flight(self,country:str,flight_code:str,username:str,flight:Optional[FlightSnapshot] = None) -> FlightInfo:
+        flight_info = self.new_booking(country,flight_code,username,flight)
+        await self.create_booking(flight_info)
+        return flight_info
+
+    async def create_booking(self,flight_info:FlightInfo,exist_ok:bool = False) -> None:
+        """Write a booking document, with `exist_ok` a document already written by a previous attempt is not an error"""
+        try:
+            await self.container.create_item(flight_info.model_dump(mode='json',by_alias=True),
+                                             response_hook=self._charge_hook("create_item"))
+        except CosmosResourceExistsError:
+            if not exist_ok:
+                raise
+
+    async def book_flights(self,flights:List[Tuple[str,str,Optional[FlightSnapshot]]],username:str,concurrency:int) -> List[Union[FlightInfo,Exception]]:
+        # Documents are written concurrently, bounded to not exhaust the container throughput
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def book(country:str,flight_code:str,flight:Optional[FlightSnapshot]) -> FlightInfo:
+            async with semaphore:
+                return await self.book_flight(country,flight_code,username,flight)
+
+        return await asyncio.gather(*[book(*booking) for booking in flights],return_exceptions=True)
 
     async def delete_booking(self, id:str, user_name:str) -> None:
-        try:            
-            await self.container.delete_item(item=id,partition_key=user_name)    
+        try:
+            await self.container.delete_item(item=id,partition_key=user_name,
+                                             response_hook=self._charge_hook("delete_item"))
         except Exception:
-            pass
-    
-    async def get_bookings(self, user_name:str) -> List[FlightInfo]:
+            return
+
+        for listener in self._delete_listeners:
+            listener(id)
+
+    async def get_bookings(self, user_name:str, limit:Optional[int] = None, continuation:Optional[str] = None) -> Tuple[List[FlightInfo],Optional[str]]:
+        # Scoped to the user partition and projecting only the fields of FlightInfo
+        query = "SELECT c.id, c.country, c.flightCode, c.username, c.flight FROM c WHERE c.username = @username"
+        pager = self.container.query_items(query=query,
+                                           parameters=[{"name": "@username", "value": str(user_name)}],
+                                           partition_key=str(user_name),
+                                           max_item_count=limit,
+                                           response_hook=self._charge_hook("query_items"))
+
         bookings = []
-        query = "SELECT DISTINCT * FROM c where c.username = @username"
-        async for item in self.container.query_items(query=query,
-                                                     parameters=[{"name": "@username", "value": str(user_name)}]):
-            booking = FlightInfo.model_validate(item)
-            bookings.append(booking)
-        return bookings             
-    
+        pages = pager.by_page(continuation)
+        async for page in pages:
+            async for item in page:
+                bookings.append(FlightInfo.model_validate(item))
+            if limit is not None:
+                return bookings, pages.continuation_token
+
+        return bookings, None
+
     async def get_booking(self, id:str, user_name:str) -> FlightInfo:
-        query = "SELECT * FROM c where c.id = @id AND c.username = @username"
-        async for item in self.container.query_items(query=query,
-                                                     parameters=[{"name": "@username", "value": str(user_name)},
-                                                                 {"name": "@id", "value": id}]):
+        try:
+            # Point read, id and partition key are both known
+            item = await self.container.read_item(item=id,partition_key=user_name,
+                                                  response_hook=self._charge_hook("read_item"))
             return FlightInfo.model_validate(item)
-        
-        return None    
\ No newline at end of file
+        except CosmosResourceNotFoundError:
+            return None
+
+    async def iter_bookings(self) -> AsyncIterator[FlightInfo]:
+        """All the bookings of the container, a cross partition query used by the reconciliation"""
+        query = "SELECT c.id, c.country, c.flightCode, c.username, c.flight FROM c"
+        pages = self.container.query_items(query=query,response_hook=self._charge_hook("query_items")).by_page()
+        async for page in pages:
+            async for item in page:
+                yield FlightInfo.model_validate(item)
+
+    async def update_flight_snapshots(self,updates:List[Tuple[FlightInfo,FlightSnapshot]],concurrency:int) -> int:
+        """Write the flight snapshot of existing bookings, returns the number of bookings updated"""
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def update(booking:FlightInfo,flight:FlightSnapshot) -> None:
+            async with semaphore:
+                # Patch only the snapshot, a concurrent change to the rest of the document is kept
+                await self.container.patch_item(item=booking.id,
+                                                partition_key=booking.username,
+                                                patch_operations=[{"op": "set", "path": "/flight", "value": flight.model_dump(mode='json',by_alias=True)}],
+                                                response_hook=self._charge_hook("patch_item"))
+
+        updated = 0
+        for (booking, _), result in zip(updates, await asyncio.gather(*[update(*u) for u in updates],return_exceptions=True)):
+            if isinstance(result, CosmosResourceNotFoundError):
+                continue # Cancelled in the meantime
+            if isinstance(result, Exception):
+                self.logger.warning(f"Flight snapshot update of booking {booking.id} failed: {result}")
+                continue
+            updated += 1
+        return updated
+
+    def _charge_hook(self, operation:str) -> Callable[[Mapping[str, str], object], None]:
+        def hook(headers:Mapping[str, str], result:object) -> None:
+            if not is_pager(result):
+                self._record_charge(operation, headers)
+        return hook
+
+    def _record_charge(self, operation:str, headers:Optional[Mapping[str, str]]) -> None:
+        charge = float((headers or {}).get('x-ms-request-charge', 0) or 0)
+        stats = self.request_charges[operation]
+        stats["calls"] += 1
+        stats["request_charge"] += charge
+        self.logger.debug(f"Cosmos {operation} consumed {charge} RU")
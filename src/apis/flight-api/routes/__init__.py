@@ -1,9 +1,11 @@
 from .airport import router as airport_router
 from .flight import router as flight_router
 from .booking import router as booking_router
+from .occupancy import router as occupancy_router
 
 routes = [
     airport_router,
     flight_router,
-    booking_router
+    booking_router,
+    occupancy_router
 ]
\ No newline at end of file
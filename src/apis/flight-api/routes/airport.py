@@ -1,20 +1,34 @@
-from fastapi import APIRouter, Depends, HTTPException, Header
-from azure.data.tables.aio import TableClient
-from dependencies import get_table_client_airport
-from typing import List, Annotated
+from fastapi import APIRouter, Depends, HTTPException, Header, Response
+from dependencies import get_airport_catalog
+from services import AirportCatalog
+from typing import List, Annotated, Optional
 from models import Airport
 
 router = APIRouter(prefix="/airport")
 
-@router.get("/",description="Return the list of all the airport")
-async def get_airport(table_client: Annotated[TableClient, Depends(get_table_client_airport)]) -> List[Airport]:
-    entities = table_client.query_entities("")
-    airports:List[Airport] = []
-    async for entity in entities:
-        airport = Airport(
-            country=entity.get("PartitionKey"),
-            airport_code=entity.get("RowKey"),
-            airport_name=entity.get("AirportName")
-        )
-        airports.append(airport)
-    return airports        
\ No newline at end of file
+@router.get("/",description="Return the list of all the airport", response_model=List[Airport])
+async def get_airport(catalog: Annotated[AirportCatalog, Depends(get_airport_catalog)],
+                      if_none_match: Annotated[Optional[str], Header()] = None) -> Response:
+    if not catalog.is_loaded:
+        raise HTTPException(status_code=503, detail='Airport catalog not available yet')
+
+    # Read both once, the background refresh can swap the snapshot at any time
+    body, etag = catalog.body, catalog.etag
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+
+    if _etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+
+    return Response(content=body, media_type="application/json", headers=headers)
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        # If-None-Match uses the weak comparison function (RFC 9110 13.1.2)
+        if tag == "*" or tag.removeprefix("W/") == etag:
+            return True
+
+    return False
@@ -1,106 +1,146 @@
-from fastapi import APIRouter, Depends, HTTPException
-from azure.data.tables.aio import TableClient
-from dependencies import get_table_client_flight, get_logger, get_booking_repository, get_easy_auth_token
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query, Response
+from dependencies import get_logger, get_booking_repository, get_easy_auth_token, get_config, get_flight_lookup, get_booking_queue
+from services import BookingQueue, FlightLookup
 from repository.flight_repository import FlightRepository
 from logging import Logger
-from contract import FlightInfoRequest
-from typing import Annotated, List
-from models import Flight
+from contract import BookingStatus, FlightInfoRequest
+from typing import Annotated, List, Optional
+from models import FlightInfo, FlightSnapshot
+from config import Config
+from responses import FastJSONResponse
 
 router = APIRouter(prefix="/booking")
 
-@router.get('/all',description="Get all bookings for a specific user")
-async def get_all_bookings(logger: Annotated[Logger, Depends(get_logger)],
+@router.get('/all',description="Get all bookings for a specific user, paginated when a limit is given. The token of the next page is returned in the X-Continuation-Token header",
+            response_model=List[FlightInfoRequest])
+async def get_all_bookings(background_tasks: BackgroundTasks,
+                           logger: Annotated[Logger, Depends(get_logger)],
+                           config: Annotated[Config, Depends(get_config)],
                            repository: Annotated[FlightRepository, Depends(get_booking_repository)],
-                           table_client: Annotated[TableClient, Depends(get_table_client_flight)],
-                           user_principal_name: Annotated[str,Depends(get_easy_auth_token)]) -> List[FlightInfoRequest]:
+                           flight_lookup: Annotated[FlightLookup, Depends(get_flight_lookup)],
+                           user_principal_name: Annotated[str,Depends(get_easy_auth_token)],
+                           limit: Annotated[Optional[int], Query(ge=1, le=1000)] = None,
+                           continuation: Annotated[Optional[str], Query()] = None) -> Response:
    try:
-      bookings = await repository.get_bookings(user_principal_name)
+      bookings, continuation_token = await repository.get_bookings(user_principal_name, limit, continuation)
+
+      headers = {}
+      if continuation_token:
+          headers["X-Continuation-Token"] = continuation_token
       
       if not bookings:
-          return []
-      
-      # Build a single query filter for all flights to minimize database calls
-      flight_filters = []
-      for booking in bookings:
-          flight_filters.append(f"(PartitionKey eq '{booking.country}' and RowKey eq '{booking.flight_code}')")
-      
-      # Single query to get all flights
-      combined_filter = " or ".join(flight_filters)
-      queried_entities = table_client.query_entities(query_filter=combined_filter)
+          return FastJSONResponse([], headers=headers)
       
-      # Create a lookup dictionary for O(1) access
+      # Bookings carry a snapshot of their flight, only the ones written before
+      # the snapshot existed need the flight table
+      legacy = [(booking.country, booking.flight_code) for booking in bookings if booking.flight is None]
       flights_lookup = {}
-      async for entity in queried_entities:
-          key = f"{entity['PartitionKey']}_{entity['RowKey']}"
-          flights_lookup[key] = Flight(**entity)
+      if legacy:
+          # Deduplicated and grouped by partition into bounded queries run concurrently
+          entities = await flight_lookup.get_many(legacy)
+          flights_lookup = {key: FlightSnapshot.from_entity(entity) for key, entity in entities.items()}
       
       # Build the response list
       flight_info_requests = []
+      migrations = []
+      missing = set()
       for booking in bookings:
-          flight_key = f"{booking.country}_{booking.flight_code}"
-          flight = flights_lookup.get(flight_key)
+          flight = booking.flight
+          if flight is None:
+              flight = flights_lookup.get((booking.country, booking.flight_code))
+              if flight is not None:
+                  migrations.append((booking, flight))
           
           if flight:
-              flight_info_requests.append(FlightInfoRequest(
-                  bookingId=booking.id,
-                  country=booking.country,
-                  flightCode=booking.flight_code,
-                  airline=flight.Airline,
-                  from_airport=flight.FromAirport,
-                  to_airport=flight.ToAirport,
-                  duration=flight.Duration,
-                  direct_flight=flight.DirectFlight,
-                  departure_time=flight.DepartureTime,
-                  arrival_time=flight.ArrivalTime
-              ))
-          else:
+              flight_info_requests.append(_flight_info_request(booking, flight))
+          elif (booking.country, booking.flight_code) not in missing:
+              missing.add((booking.country, booking.flight_code))
               logger.warning(f"Flight not found for booking {booking.id}: {booking.country}/{booking.flight_code}")
       
-      return flight_info_requests
+      # Legacy documents get their snapshot once the response is sent
+      if migrations:
+          background_tasks.add_task(repository.update_flight_snapshots, migrations, config.booking_batch_concurrency)
+
+      return FastJSONResponse(flight_info_requests, headers=headers)
 
    except Exception as e:
       logger.error(e)
       raise HTTPException(status_code=500, detail='Internal Server Error')          
 
-@router.get('/{booking_id}')
+@router.get('/status/{booking_id}',description="Progress of the write of a booking: pending, written, failed or cancelled",
+            response_model=BookingStatus)
+async def get_booking_status(booking_id:str,
+                             logger: Annotated[Logger, Depends(get_logger)],
+                             repository: Annotated[FlightRepository, Depends(get_booking_repository)],
+                             booking_queue: Annotated[Optional[BookingQueue], Depends(get_booking_queue)],
+                             user_principal_name: Annotated[str,Depends(get_easy_auth_token)]) -> Response:
+    try:
+        status = booking_queue.status(booking_id,user_principal_name) if booking_queue is not None else None
+        if status is not None:
+            return FastJSONResponse(status)
+
+        # Written synchronously, or pruned from the queue
+        flight_info = await repository.get_booking(booking_id,user_principal_name)
+    except Exception as e:
+      logger.error(e)
+      raise HTTPException(status_code=500, detail='Internal Server Error')
+
+    if flight_info is None:
+        raise HTTPException(status_code=404, detail='Booking not found')
+    return FastJSONResponse({"bookingId": booking_id, "status": "written", "attempts": 0, "error": None, "updatedAt": None})
+
+@router.get('/{booking_id}',response_model=FlightInfoRequest)
 async def get_booking_info(booking_id:str,
+                           background_tasks: BackgroundTasks,
                            logger: Annotated[Logger, Depends(get_logger)],
+                           config: Annotated[Config, Depends(get_config)],
                            repository: Annotated[FlightRepository, Depends(get_booking_repository)],
-                           table_client: Annotated[TableClient, Depends(get_table_client_flight)],
-                           user_principal_name: Annotated[str,Depends(get_easy_auth_token)]) -> FlightInfoRequest:
+                           flight_lookup: Annotated[FlightLookup, Depends(get_flight_lookup)],
+                           booking_queue: Annotated[Optional[BookingQueue], Depends(get_booking_queue)],
+                           user_principal_name: Annotated[str,Depends(get_easy_auth_token)]) -> Response:
     try:
         flight_info = await repository.get_booking(booking_id,user_principal_name)
 
-        if flight_info is None:
-          raise HTTPException(status_code=404, detail='Booking not found')
-        
-        parameters = {"country": flight_info.country, "flight_code": flight_info.flight_code}
-        filter = "PartitionKey eq @country and RowKey eq @flight_code"
-        queried_entities = table_client.query_entities(query_filter=filter, parameters=parameters)           
-
-        flight: Flight = None
-
-        async for entity in queried_entities:
-            flight = Flight(**entity)
-            break # Always return 1 entity anyway
-        
-        if flight is None:
-           raise HTTPException(status_code=404, detail='Flight cannot be found')
-        
-        return FlightInfoRequest(
-           bookingId=booking_id,
-           country=flight_info.country,
-           flightCode=flight_info.flight_code,
-           airline=flight.Airline,
-           from_airport=flight.FromAirport,
-           to_airport=flight.ToAirport,
-           duration=flight.Duration,
-           direct_flight=flight.DirectFlight,
-           departure_time=flight.DepartureTime,
-           arrival_time=flight.ArrivalTime
-        )
+        # Accepted but not written to CosmosDB yet
+        if flight_info is None and booking_queue is not None:
+          flight_info = booking_queue.get(booking_id,user_principal_name)
+    except Exception as e:
+      logger.error(e)
+      raise HTTPException(status_code=500, detail='Internal Server Error')
+
+    if flight_info is None:
+      raise HTTPException(status_code=404, detail='Booking not found')
+
+    if flight_info.flight is not None:
+      return FastJSONResponse(_flight_info_request(flight_info, flight_info.flight))
 
+    try:
+        key = (flight_info.country, flight_info.flight_code)
+        entity = (await flight_lookup.get_many([key])).get(key)
     except Exception as e:
       logger.error(e)
-      raise HTTPException(status_code=500, detail='Internal Server Error')    
\ No newline at end of file
+      raise HTTPException(status_code=500, detail='Internal Server Error')
+
+    if entity is None:
+       raise HTTPException(status_code=404, detail='Flight cannot be found')
+
+    flight = FlightSnapshot.from_entity(entity)
+    background_tasks.add_task(repository.update_flight_snapshots, [(flight_info, flight)], config.booking_batch_concurrency)
+
+    return FastJSONResponse(_flight_info_request(flight_info, flight))
+
+def _flight_info_request(booking: FlightInfo, flight: FlightSnapshot) -> dict:
+    # Both were validated when the booking document was read, the response is
+    # written in the FlightInfoRequest format without validating them again
+    return {
+        "bookingId": booking.id,
+        "country": booking.country,
+        "flightCode": booking.flight_code,
+        "airline": flight.airline,
+        "from_airport": flight.from_airport,
+        "to_airport": flight.to_airport,
+        "duration": flight.duration,
+        "direct_flight": flight.direct_flight,
+        "departure_time": flight.departure_time,
+        "arrival_time": flight.arrival_time
+    }
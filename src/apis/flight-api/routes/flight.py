@@ -1,111 +1,452 @@
-from fastapi import APIRouter, Depends, HTTPException, Response
+from fastapi import APIRouter, Depends, HTTPException, Header, Query, Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
 from azure.data.tables.aio import TableClient
-from dependencies import get_table_client_flight, get_logger, get_booking_repository, get_easy_auth_token
+from dependencies import get_table_client_flight, get_logger, get_booking_repository, get_easy_auth_token, get_seat_inventory, get_config, get_flight_index, get_query_coalescer, get_idempotency_store, get_booking_queue, get_route_planner, get_flight_columns
 from repository.flight_repository import FlightRepository
-from azure.data.tables import UpdateMode
+from services import SeatInventory, FlightIndex, QueryCoalescer, NoSeatsAvailableError, SeatCapacityError, SeatConflictError
+from services import RoutePlanner, Route, FlightColumns
+from services import BookingQueue, IdempotencyStore, StoredResponse, IdempotencyConflictError, IdempotencyKeyReusedError
 from logging import Logger
-from contract import BookRequest, FlightInfoRequest, BookingInfoRequest
-from typing import List, Annotated
-from models import Flight
+from contract import BookRequest, FlightInfoRequest, BookingInfoRequest, BatchBookingResult, Itinerary
+from config import Config
+from typing import AsyncIterator, Iterable, List, Annotated, Literal, Mapping, Optional, Tuple
+from datetime import date, datetime, timezone
+from pydantic_core import to_json
+import asyncio
+import hashlib
+from models import Flight, FlightSnapshot
+from responses import FastJSONResponse, project
 
 router = APIRouter(prefix="/flight")
 
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+# Flights of the in-memory index written per chunk in streaming mode
+STREAM_CHUNK_SIZE = 500
 
-@router.get('/country/{country}')
+# Table property of each public field of a flight, in the order of the Flight model
+FLIGHT_FIELDS = {field.alias: name for name, field in Flight.model_fields.items()}
+# (table property, field) pairs of a complete flight
+FLIGHT_RESPONSE_FIELDS = [(name, alias) for alias, name in FLIGHT_FIELDS.items()]
+
+
+@router.get('/country/{country}',description="Return the list of all flight for a country, streamed as NDJSON with ?stream=true or Accept: application/x-ndjson",
+            response_model=List[Flight])
 async def flight_by_country(country:str,
                             logger: Annotated[Logger, Depends(get_logger)],
-                            table_client: Annotated[TableClient, Depends(get_table_client_flight)]) -> List[Flight]:
+                            query_coalescer: Annotated[QueryCoalescer, Depends(get_query_coalescer)],
+                            table_client: Annotated[TableClient, Depends(get_table_client_flight)],
+                            stream: Annotated[bool, Query(description="Stream the flights as NDJSON")] = False,
+                            select: Annotated[Optional[str], Query(alias="$select", description="Comma separated fields returned in streaming mode")] = None,
+                            accept: Annotated[Optional[str], Header()] = None) -> Response:
+    fields = _stream_fields(stream, accept, select)
     try:
-        parameters = {"country": country}
-        filter = "PartitionKey eq @country"
-        queried_entities = table_client.query_entities(query_filter=filter, parameters=parameters)        
-
-        flights: List[Flight] = []
-
-        async for entity in queried_entities:
-            flights.append(Flight(**entity))
+        if fields is not None:
+            return _ndjson_response(_query_pages(table_client, "PartitionKey eq @country", {"country": country}, fields), fields, logger)
 
-        return flights       
+        return FastJSONResponse(await query_coalescer.get((country, "country"),
+                                                          lambda: _query_flights(table_client, "PartitionKey eq @country", {"country": country})))
     except Exception as e:
       logger.error(e)
       raise HTTPException(status_code=500, detail='Internal Server Error')        
 
-@router.get("/{country}/{airport_code}",description="Return the list of all flight for a specific destination")
+@router.get("/{country}/{airport_code}",description="Return the list of all flight for a specific destination, streamed as NDJSON with ?stream=true or Accept: application/x-ndjson",
+            response_model=List[Flight])
 async def flight_by_airport(country: str,
                             airport_code: str,
                             logger: Annotated[Logger, Depends(get_logger)],
-                            table_client: Annotated[TableClient, Depends(get_table_client_flight)]) -> List[Flight]:
+                            flight_index: Annotated[FlightIndex, Depends(get_flight_index)],
+                            query_coalescer: Annotated[QueryCoalescer, Depends(get_query_coalescer)],
+                            table_client: Annotated[TableClient, Depends(get_table_client_flight)],
+                            stream: Annotated[bool, Query(description="Stream the flights as NDJSON")] = False,
+                            select: Annotated[Optional[str], Query(alias="$select", description="Comma separated fields returned in streaming mode")] = None,
+                            accept: Annotated[Optional[str], Header()] = None) -> Response:
+    fields = _stream_fields(stream, accept, select)
     try:
-        parameters = {"country": country, "code": airport_code}
-        filter = "PartitionKey eq @country and ToAirport eq @code"
-        queried_entities = table_client.query_entities(query_filter=filter, parameters=parameters)        
+        if flight_index.is_loaded:
+            flights = flight_index.by_destination(country, airport_code)
+            if fields is not None:
+                return _ndjson_response(_snapshot_pages(flights), fields, logger)
+            return FastJSONResponse(project(flights, FLIGHT_RESPONSE_FIELDS))
+
+        # Index not loaded yet, scan the country partition
+        filter, parameters = "PartitionKey eq @country and ToAirport eq @code", {"country": country, "code": airport_code}
+        if fields is not None:
+            return _ndjson_response(_query_pages(table_client, filter, parameters, fields), fields, logger)
+
+        return FastJSONResponse(await query_coalescer.get((country, ("destination", airport_code)),
+                                                          lambda: _query_flights(table_client, filter, parameters)))
+
+    except Exception as e:
+        logger.error(e)
+        raise HTTPException(status_code=500, detail='Internal Server Error')
 
-        flights: List[Flight] = []
+@router.get("/origin/{country}/{airport_code}",description="Return the list of all flight to a country leaving from a specific airport, streamed as NDJSON with ?stream=true or Accept: application/x-ndjson",
+            response_model=List[Flight])
+async def flight_by_origin(country: str,
+                           airport_code: str,
+                           logger: Annotated[Logger, Depends(get_logger)],
+                           flight_index: Annotated[FlightIndex, Depends(get_flight_index)],
+                           query_coalescer: Annotated[QueryCoalescer, Depends(get_query_coalescer)],
+                           table_client: Annotated[TableClient, Depends(get_table_client_flight)],
+                           stream: Annotated[bool, Query(description="Stream the flights as NDJSON")] = False,
+                           select: Annotated[Optional[str], Query(alias="$select", description="Comma separated fields returned in streaming mode")] = None,
+                           accept: Annotated[Optional[str], Header()] = None) -> Response:
+    fields = _stream_fields(stream, accept, select)
+    try:
+        if flight_index.is_loaded:
+            flights = flight_index.by_origin(country, airport_code)
+            if fields is not None:
+                return _ndjson_response(_snapshot_pages(flights), fields, logger)
+            return FastJSONResponse(project(flights, FLIGHT_RESPONSE_FIELDS))
 
-        async for entity in queried_entities:
-            flights.append(Flight(**entity))
+        filter, parameters = "PartitionKey eq @country and FromAirport eq @code", {"country": country, "code": airport_code}
+        if fields is not None:
+            return _ndjson_response(_query_pages(table_client, filter, parameters, fields), fields, logger)
 
-        return flights
+        return FastJSONResponse(await query_coalescer.get((country, ("origin", airport_code)),
+                                                          lambda: _query_flights(table_client, filter, parameters)))
 
     except Exception as e:
         logger.error(e)
         raise HTTPException(status_code=500, detail='Internal Server Error')
     
-@router.post("/book",description="Book a flight ticket")
+@router.get("/search",description="Return the best itineraries between two airports leaving on a date (UTC), direct flights and connections of up to max_stops stops with seats available",
+            response_model=List[Itinerary])
+async def search_flights(from_airport: Annotated[str, Query(alias="from", description="Airport code of the origin")],
+                         to_airport: Annotated[str, Query(alias="to", description="Airport code of the destination")],
+                         day: Annotated[date, Query(alias="date", description="Departure date of the first flight")],
+                         logger: Annotated[Logger, Depends(get_logger)],
+                         route_planner: Annotated[RoutePlanner, Depends(get_route_planner)],
+                         max_stops: Annotated[int, Query(ge=0, le=2)] = 1,
+                         sort: Annotated[Literal["duration", "price", "departure"], Query()] = "duration",
+                         limit: Annotated[int, Query(ge=1, le=50)] = 10) -> Response:
+    if not route_planner.is_loaded:
+        raise HTTPException(status_code=503, detail='Flight schedule not available yet')
+
+    try:
+        routes = route_planner.search(from_airport.upper(), to_airport.upper(), day, max_stops, sort, limit)
+        return FastJSONResponse([_itinerary(route, route_planner) for route in routes])
+    except Exception as e:
+        logger.error(e)
+        raise HTTPException(status_code=500, detail='Internal Server Error')
+
+@router.get("/query",description="Return the flights matching the filters, sorted, from the columnar snapshot of the schedule. The number of matches is in the X-Total-Count header",
+            response_model=List[Flight])
+async def query_flights(logger: Annotated[Logger, Depends(get_logger)],
+                        flight_columns: Annotated[FlightColumns, Depends(get_flight_columns)],
+                        flight_index: Annotated[FlightIndex, Depends(get_flight_index)],
+                        country: Annotated[Optional[List[str]], Query(description="Countries of the flights, repeat for many")] = None,
+                        from_airport: Annotated[Optional[List[str]], Query(description="Origin airport codes")] = None,
+                        to_airport: Annotated[Optional[List[str]], Query(description="Destination airport codes")] = None,
+                        airline: Annotated[Optional[List[str]], Query()] = None,
+                        min_price: Annotated[Optional[int], Query(ge=0)] = None,
+                        max_price: Annotated[Optional[int], Query(ge=0)] = None,
+                        max_duration: Annotated[Optional[int], Query(ge=0, description="Minutes")] = None,
+                        min_seats: Annotated[int, Query(ge=0, description="0 includes the full flights")] = 1,
+                        direct_flight: Annotated[Optional[bool], Query()] = None,
+                        departure_after: Annotated[Optional[datetime], Query()] = None,
+                        departure_before: Annotated[Optional[datetime], Query()] = None,
+                        sort: Annotated[Literal["price", "duration", "departure", "seats"], Query()] = "price",
+                        descending: Annotated[bool, Query()] = False,
+                        limit: Annotated[int, Query(ge=1, le=500)] = 20) -> Response:
+    if not flight_columns.is_loaded:
+        raise HTTPException(status_code=503, detail='Flight schedule not available yet')
+
+    try:
+        total, keys = flight_columns.query(country, from_airport, to_airport, airline, min_price, max_price, max_duration,
+                                           min_seats or None, direct_flight,
+                                           _epoch(departure_after), _epoch(departure_before),
+                                           sort, descending, limit)
+        flights = [flight for flight in (flight_index.get(*key) for key in keys) if flight is not None]
+        return FastJSONResponse(project(flights, FLIGHT_RESPONSE_FIELDS), headers={"X-Total-Count": str(total)})
+    except Exception as e:
+        logger.error(e)
+        raise HTTPException(status_code=500, detail='Internal Server Error')
+
+@router.post("/book",description="Book a flight ticket. With the booking queue enabled the booking is written after the response, its progress is at the URL of the Location header")
 async def book_flight(book_request:BookRequest,
+                      request: Request,
                       response: Response,
                       logger: Annotated[Logger, Depends(get_logger)],
-                      table_client: Annotated[TableClient, Depends(get_table_client_flight)],
+                      seat_inventory: Annotated[SeatInventory, Depends(get_seat_inventory)],
                       repository: Annotated[FlightRepository, Depends(get_booking_repository)],
-                      user_principal_name: Annotated[str,Depends(get_easy_auth_token)]) -> BookingInfoRequest:
-    try:
+                      booking_queue: Annotated[Optional[BookingQueue], Depends(get_booking_queue)],
+                      idempotency_store: Annotated[IdempotencyStore, Depends(get_idempotency_store)],
+                      user_principal_name: Annotated[str,Depends(get_easy_auth_token)],
+                      idempotency_key: Annotated[Optional[str], Header(description="Retries with the same key return the first response")] = None) -> BookingInfoRequest:
+    async with _IdempotentRequest(idempotency_store, idempotency_key, user_principal_name, "book", book_request, logger) as idempotent:
+        if idempotent.replay is not None:
+            return idempotent.replay
+
+        try:
             
-      await update_flight_seat(book_request=book_request,
-                               table_client=table_client,
-                               mode="UPDATE")
+          flight = await seat_inventory.reserve(book_request.country, book_request.flight_code)
           
-      flight_info = await repository.book_flight(book_request.country,book_request.flight_code,user_principal_name)
-      response.status_code = 202
-      return BookingInfoRequest(bookingId=flight_info.id, country=book_request.country,flightCode=book_request.flight_code)
+          # The flight fields are copied in the booking, listing bookings needs no flight table lookup
+          snapshot = FlightSnapshot.from_entity(flight)
+          if booking_queue is not None:
+            # The seat is taken, the document is written to CosmosDB by the queue workers
+            flight_info = repository.new_booking(book_request.country,book_request.flight_code,user_principal_name,snapshot)
+            try:
+              booking_queue.enqueue(flight_info)
+            except Exception:
+              await seat_inventory.release(book_request.country, book_request.flight_code)
+              raise
+            response.headers["Location"] = request.url_for("get_booking_status", booking_id=flight_info.id).path
+          else:
+            flight_info = await repository.book_flight(book_request.country,book_request.flight_code,user_principal_name,snapshot)
+          response.status_code = 202
+          result = BookingInfoRequest(bookingId=flight_info.id, country=book_request.country,flightCode=book_request.flight_code)
+          await idempotent.complete(response.status_code, result)
+          return result
     
-    except Exception as e:
-      logger.error(e)
-      raise HTTPException(status_code=500, detail='Internal Server Error')        
+        except NoSeatsAvailableError:
+          raise HTTPException(status_code=400, detail='No seats available')
+        except SeatConflictError as e:
+          logger.warning(e)
+          raise HTTPException(status_code=409, detail='Flight is busy, please retry')
+        except Exception as e:
+          logger.error(e)
+          raise HTTPException(status_code=500, detail='Internal Server Error')        
+
+@router.post("/book/batch",description="Book many flight tickets in one call, seats are reserved per country in transactional batches")
+async def book_flights(book_requests:List[BookRequest],
+                       response: Response,
+                       logger: Annotated[Logger, Depends(get_logger)],
+                       config: Annotated[Config, Depends(get_config)],
+                       seat_inventory: Annotated[SeatInventory, Depends(get_seat_inventory)],
+                       repository: Annotated[FlightRepository, Depends(get_booking_repository)],
+                       idempotency_store: Annotated[IdempotencyStore, Depends(get_idempotency_store)],
+                       user_principal_name: Annotated[str,Depends(get_easy_auth_token)],
+                       idempotency_key: Annotated[Optional[str], Header(description="Retries with the same key return the first response")] = None) -> List[BatchBookingResult]:
+    if len(book_requests) > config.booking_batch_max_size:
+        raise HTTPException(status_code=400, detail=f'A batch cannot contain more than {config.booking_batch_max_size} bookings')
+
+    async with _IdempotentRequest(idempotency_store, idempotency_key, user_principal_name, "book/batch", book_requests, logger) as idempotent:
+        if idempotent.replay is not None:
+            return idempotent.replay
+
+        try:
+            reservations = await seat_inventory.reserve_many((r.country, r.flight_code) for r in book_requests)
+
+            # Hand out the granted seats in request order
+            remaining = {key: reservation.granted for key, reservation in reservations.items()}
+            results: List[BatchBookingResult] = [None] * len(book_requests)
+            accepted: List[int] = []
+
+            for i, book_request in enumerate(book_requests):
+                key = (book_request.country, book_request.flight_code)
+                if remaining[key] > 0:
+                    remaining[key] -= 1
+                    accepted.append(i)
+                else:
+                    results[i] = BatchBookingResult(country=book_request.country,
+                                                    flightCode=book_request.flight_code,
+                                                    status='failed',
+                                                    error=reservations[key].error or 'No seats available')
+
+            # The flight read by the reservation is copied in each booking
+            flights = []
+            for i in accepted:
+                key = (book_requests[i].country, book_requests[i].flight_code)
+                flights.append((*key, FlightSnapshot.from_entity(reservations[key].flight)))
+
+            bookings = await repository.book_flights(flights,
+                                                     user_principal_name,
+                                                     config.booking_batch_concurrency)
+
+            released = []
+            for i, booking in zip(accepted, bookings):
+                book_request = book_requests[i]
+                if isinstance(booking, Exception):
+                    logger.error(f"Booking of {book_request.country}/{book_request.flight_code} failed: {booking}")
+                    released.append(seat_inventory.release(book_request.country, book_request.flight_code))
+                    results[i] = BatchBookingResult(country=book_request.country,
+                                                    flightCode=book_request.flight_code,
+                                                    status='failed',
+                                                    error='Booking failed')
+                else:
+                    results[i] = BatchBookingResult(bookingId=booking.id,
+                                                    country=book_request.country,
+                                                    flightCode=book_request.flight_code,
+                                                    status='booked')
+
+            # Give back the seats of the bookings that could not be written
+            for error in await asyncio.gather(*released, return_exceptions=True):
+                if isinstance(error, Exception):
+                    logger.error(f"Seat release after a failed booking failed: {error}")
+
+            response.status_code = 202
+            await idempotent.complete(response.status_code, results)
+            return results
+
+        except Exception as e:
+          logger.error(e)
+          raise HTTPException(status_code=500, detail='Internal Server Error')
 
 @router.delete("/cancel",description="Cancel flight")    
 async def cancel_flight(booking_info_request:BookingInfoRequest,
                         logger: Annotated[Logger, Depends(get_logger)],
-                        table_client: Annotated[TableClient, Depends(get_table_client_flight)],
+                        seat_inventory: Annotated[SeatInventory, Depends(get_seat_inventory)],
                         repository: Annotated[FlightRepository, Depends(get_booking_repository)],
-                        user_principal_name: Annotated[str,Depends(get_easy_auth_token)]):
-    try:
-      await update_flight_seat(book_request=BookRequest(country=booking_info_request.country,flightCode=booking_info_request.flight_code),
-                               table_client=table_client)
-      
-      await repository.delete_booking(booking_info_request.id,user_principal_name)
+                        booking_queue: Annotated[Optional[BookingQueue], Depends(get_booking_queue)],
+                        idempotency_store: Annotated[IdempotencyStore, Depends(get_idempotency_store)],
+                        user_principal_name: Annotated[str,Depends(get_easy_auth_token)],
+                        idempotency_key: Annotated[Optional[str], Header(description="Retries with the same key return the first response")] = None):
+    async with _IdempotentRequest(idempotency_store, idempotency_key, user_principal_name, "cancel", booking_info_request, logger) as idempotent:
+        if idempotent.replay is not None:
+            return idempotent.replay
 
-      return {"message": "Flight cancelled successfully"}, 204    
-    except Exception as e:
-      logger.error(e)
-      raise HTTPException(status_code=500, detail='Internal Server Error')         
+        try:
+          # A failed booking was never written and the queue already gave its seat back
+          status = booking_queue.status(booking_info_request.id,user_principal_name) if booking_queue is not None else None
+          if status is None or status['status'] != 'failed':
+            await seat_inventory.release(booking_info_request.country, booking_info_request.flight_code)
+          
+            # A booking still in the queue is never written, or deleted once its write ends
+            if booking_queue is None or not booking_queue.cancel(booking_info_request.id,user_principal_name):
+              await repository.delete_booking(booking_info_request.id,user_principal_name)
 
-async def update_flight_seat(book_request:BookRequest,
-                             table_client:TableClient,
-                             mode: str = "DELETE"):
-    
-    flight = await table_client.get_entity(partition_key=book_request.country, row_key=book_request.flight_code)
-    seats_available = flight.get('SeatsAvailable', 0)
-    max_seat_capacity = flight.get('MaxSeatCapacity', 0)
-    
-    if mode == "UPDATE":
-        if seats_available > 0:
-            flight['SeatsAvailable'] = seats_available - 1
-        else:
-            raise HTTPException(status_code=400, detail='No seats available')
-    else:
-        if seats_available < max_seat_capacity:
-            flight['SeatsAvailable'] = seats_available + 1
-        else:
-            raise HTTPException(status_code=400, detail='Cannot cancel: seats already at maximum capacity')
-
-    await table_client.upsert_entity(mode=UpdateMode.REPLACE, entity=flight)
\ No newline at end of file
+          result = {"message": "Flight cancelled successfully"}, 204
+          await idempotent.complete(200, result)
+          return result
+        except SeatCapacityError:
+          raise HTTPException(status_code=400, detail='Cannot cancel: seats already at maximum capacity')
+        except SeatConflictError as e:
+          logger.warning(e)
+          raise HTTPException(status_code=409, detail='Flight is busy, please retry')
+        except Exception as e:
+          logger.error(e)
+          raise HTTPException(status_code=500, detail='Internal Server Error')
+
+class _IdempotentRequest:
+    """Runs a write request once per Idempotency-Key of a user.
+
+    A retry of a completed request gets its stored response in `replay`, a retry
+    while the request is running gets a 409. The key is released when the request
+    fails, so the client can retry it.
+    """
+
+    def __init__(self, store: IdempotencyStore, key: Optional[str], user: str, operation: str, request, logger: Logger):
+        self.store = store
+        self.key = f"{user}:{operation}:{key}" if key else None
+        # The same key sent with another body is a client error, not a retry
+        self.fingerprint = hashlib.sha256(to_json(request)).hexdigest()
+        self.logger = logger
+        self.replay: Optional[Response] = None
+        self._completed = False
+
+    async def __aenter__(self) -> "_IdempotentRequest":
+        if self.key is None:
+            return self
+        try:
+            stored = await self.store.claim(self.key, self.fingerprint)
+        except IdempotencyConflictError:
+            raise HTTPException(status_code=409, detail='A request with this Idempotency-Key is in progress')
+        except IdempotencyKeyReusedError:
+            raise HTTPException(status_code=422, detail='Idempotency-Key already used with a different request')
+        except Exception as e:
+            self.logger.error(e)
+            raise HTTPException(status_code=500, detail='Internal Server Error')
+
+        if stored is not None:
+            self._completed = True
+            self.replay = FastJSONResponse(stored.content, status_code=stored.status_code,
+                                           headers={"Idempotent-Replayed": "true"})
+        return self
+
+    async def complete(self, status_code: int, content) -> None:
+        if self.key is None:
+            return
+        try:
+            await self.store.complete(self.key, StoredResponse(status_code, jsonable_encoder(content)))
+            self._completed = True
+        except Exception as e:
+            # The request succeeded, a retry would run it again
+            self.logger.warning(f"Idempotency key {self.key} could not be completed: {e}")
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        if self.key is None or self._completed:
+            return
+        try:
+            await self.store.release(self.key)
+        except Exception as e:
+            self.logger.warning(f"Idempotency key {self.key} could not be released: {e}")
+
+async def _query_flights(table_client: TableClient, filter: str, parameters: dict) -> List[dict]:
+    queried_entities = table_client.query_entities(query_filter=filter, parameters=parameters)
+
+    # Entities of the flight table are trusted, they become response dicts
+    # without being validated into Flight models
+    return project([entity async for entity in queried_entities], FLIGHT_RESPONSE_FIELDS)
+
+def _itinerary(route: Route, route_planner: RoutePlanner) -> dict:
+    flights = route_planner.flights(route)
+    return {"fromAirport": route.legs[0].origin,
+            "toAirport": route.legs[-1].destination,
+            "departureTime": flights[0]['DepartureTime'],
+            "arrivalTime": flights[-1]['ArrivalTime'],
+            "duration": _duration(route.duration),
+            "stops": len(route.legs) - 1,
+            "price": route.price,
+            "connections": [{"airport": inbound.destination, "duration": _duration(outbound.departure - inbound.arrival)}
+                            for inbound, outbound in zip(route.legs, route.legs[1:])],
+            "flights": project(flights, FLIGHT_RESPONSE_FIELDS)}
+
+def _duration(seconds: float) -> str:
+    # Same format as the Duration of the flights
+    minutes = int(seconds // 60)
+    return f"{minutes // 60}h {minutes % 60}m"
+
+def _epoch(value: Optional[datetime]) -> Optional[float]:
+    # Times without an offset are UTC, like the flight times
+    if value is None:
+        return None
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+def _stream_fields(stream: bool, accept: Optional[str], select: Optional[str]) -> Optional[List[Tuple[str, str]]]:
+    """(table property, field) pairs written in streaming mode, None when the client wants a JSON array"""
+    if not (stream or NDJSON_MEDIA_TYPE in (accept or "")):
+        if select:
+            raise HTTPException(status_code=400, detail='$select is only supported in streaming mode')
+        return None
+
+    if not select:
+        return FLIGHT_RESPONSE_FIELDS
+
+    aliases = [alias.strip() for alias in select.split(",") if alias.strip()]
+    unknown = [alias for alias in aliases if alias not in FLIGHT_FIELDS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields in $select: {', '.join(unknown)}")
+    return [(FLIGHT_FIELDS[alias], alias) for alias in dict.fromkeys(aliases)]
+
+async def _query_pages(table_client: TableClient, filter: str, parameters: dict, fields: List[Tuple[str, str]]) -> AsyncIterator[List[Mapping]]:
+    # Only the selected properties are read from Table Storage
+    queried_entities = table_client.query_entities(query_filter=filter,
+                                                   parameters=parameters,
+                                                   select=[name for name, _ in fields])
+    async for page in queried_entities.by_page():
+        yield [entity async for entity in page]
+
+async def _snapshot_pages(flights: List[Mapping]) -> AsyncIterator[List[Mapping]]:
+    for i in range(0, len(flights), STREAM_CHUNK_SIZE):
+        yield flights[i:i + STREAM_CHUNK_SIZE]
+
+def _ndjson_response(pages: AsyncIterator[Iterable[Mapping]], fields: List[Tuple[str, str]], logger: Logger) -> StreamingResponse:
+    async def lines() -> AsyncIterator[bytes]:
+        try:
+            # Entities are written as read, one line per flight and one chunk per page,
+            # without building Flight models
+            async for page in pages:
+                chunk = b"".join(to_json({alias: entity.get(name) for name, alias in fields}) + b"\n" for entity in page)
+                if chunk:
+                    yield chunk
+        except Exception as e:
+            # Headers are already sent, the client sees a truncated stream
+            logger.error(e)
+            raise
+
+    return StreamingResponse(lines(), media_type=NDJSON_MEDIA_TYPE)
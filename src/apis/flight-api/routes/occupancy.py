@@ -0,0 +1,32 @@
+from fastapi import APIRouter, Depends, HTTPException
+from dependencies import get_flight_index, get_occupancy_view
+from services import FlightIndex, OccupancyView
+from contract import FlightOccupancy
+from typing import Annotated, List
+
+router = APIRouter(prefix="/occupancy")
+
+@router.get("/drift",description="Return the flights whose seats taken in the flight table differ from their number of bookings")
+async def get_occupancy_drift(occupancy_view: Annotated[OccupancyView, Depends(get_occupancy_view)],
+                              flight_index: Annotated[FlightIndex, Depends(get_flight_index)]) -> List[FlightOccupancy]:
+    if not occupancy_view.is_loaded or not flight_index.is_loaded:
+        raise HTTPException(status_code=503, detail='Occupancy view not available yet')
+
+    return [FlightOccupancy(**flight) for flight in occupancy_view.drift(flight_index.flights())]
+
+@router.get("/{country}/{flight_code}",description="Return the number of bookings of a flight, read from the occupancy view maintained from the booking change feed")
+async def get_flight_occupancy(country: str,
+                               flight_code: str,
+                               occupancy_view: Annotated[OccupancyView, Depends(get_occupancy_view)],
+                               flight_index: Annotated[FlightIndex, Depends(get_flight_index)]) -> FlightOccupancy:
+    if not occupancy_view.is_loaded:
+        raise HTTPException(status_code=503, detail='Occupancy view not available yet')
+
+    bookings = occupancy_view.get(country, flight_code)
+    flight = flight_index.get(country, flight_code)
+    if flight is None:
+        return FlightOccupancy(country=country, flightCode=flight_code, bookings=bookings)
+
+    seats_taken = flight.get('MaxSeatCapacity', 0) - flight.get('SeatsAvailable', 0)
+    return FlightOccupancy(country=country, flightCode=flight_code, bookings=bookings,
+                           seatsTaken=seats_taken, drift=seats_taken - bookings)
@@ -1,59 +1,182 @@
 # Sample
 # https://github.com/Azure/azure-sdk-for-python/tree/main/sdk/tables/azure-data-tables/samples
 
-from azure.data.tables import TableServiceClient, TableClient
-from azure.identity import DefaultAzureCredential
+from azure.core.exceptions import HttpResponseError, ResourceExistsError
+from azure.data.tables import TableErrorCode, UpdateMode
+from azure.data.tables.aio import TableServiceClient, TableClient
+from azure.identity.aio import DefaultAzureCredential
 from dotenv import load_dotenv
 from config import Config
+from typing import Dict, Iterator, List
+import asyncio
 import json
 import os
 import time
 
+# Maximum number of operations accepted by a Table transactional batch
+BATCH_SIZE = 100
+READ_CHUNK_SIZE = 64 * 1024
+
 def delete_table() -> bool:
     value = os.getenv('DELETE_TABLE', 'false').lower()
-    return value in ['true', '1', 'yes']       
+    return value in ['true', '1', 'yes']
 
-try:
+def seed_concurrency() -> int:
+    return int(os.getenv('SEED_CONCURRENCY', '16'))
 
-    load_dotenv(override=True)
+def table_ready_timeout() -> int:
+    return int(os.getenv('SEED_TABLE_READY_TIMEOUT_SECONDS', '300'))
+
+def stream_json_array(path: str) -> Iterator[dict]:
+    """Yield the objects of a top level JSON array without loading the whole file"""
+    decoder = json.JSONDecoder()
+    with open(path, "r", encoding="utf-8") as f:
+        buffer = ""
+        position = 0
+        eof = False
+
+        while True:
+            # Skip the array brackets, separators and whitespace between objects
+            while position < len(buffer) and buffer[position] in "[, \t\r\n":
+                position += 1
+
+            if position < len(buffer):
+                if buffer[position] == "]":
+                    return
+                try:
+                    item, position = decoder.raw_decode(buffer, position)
+                    yield item
+                    continue
+                except json.JSONDecodeError:
+                    # Object cut at the end of the chunk, read more
+                    if eof:
+                        raise
+
+            if eof:
+                return
+
+            chunk = f.read(READ_CHUNK_SIZE)
+            eof = not chunk
+            buffer = buffer[position:] + chunk
+            position = 0
+
+def partition_batches(entities: Iterator[dict]) -> Iterator[List[dict]]:
+    """Group entities by PartitionKey into batches of at most BATCH_SIZE entities"""
+    pending: Dict[str, List[dict]] = {}
+    for entity in entities:
+        batch = pending.setdefault(entity["PartitionKey"], [])
+        batch.append(entity)
+        if len(batch) == BATCH_SIZE:
+            yield pending.pop(entity["PartitionKey"])
+
+    yield from pending.values()
+
+class Progress:
+
+    def __init__(self, name: str, interval: float = 5.0):
+        self.name = name
+        self.interval = interval
+        self.count = 0
+        self.started = time.perf_counter()
+        self._last_report = self.started
 
+    def add(self, count: int) -> None:
+        self.count += count
+        now = time.perf_counter()
+        if now - self._last_report >= self.interval:
+            self._last_report = now
+            print(f"  {self.name}: {self.count} entities ({self.rate:.0f} entities/sec)")
+
+    @property
+    def rate(self) -> float:
+        elapsed = time.perf_counter() - self.started
+        return self.count / elapsed if elapsed > 0 else 0.0
+
+async def wait_table_ready(table_service_client: TableServiceClient, table_name: str) -> None:
+    # A deleted table cannot be created again until the service finished removing it
+    deadline = time.monotonic() + table_ready_timeout()
+    delay = 1.0
+    while True:
+        try:
+            await table_service_client.create_table(table_name=table_name)
+            return
+        except HttpResponseError as e:
+            if getattr(e, 'error_code', None) != TableErrorCode.TABLE_BEING_DELETED:
+                if isinstance(e, ResourceExistsError):
+                    return # Table already exists
+                raise
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"Table {table_name} still being deleted after {table_ready_timeout()} seconds")
+            print(f"Table {table_name} is being deleted, retrying in {delay:.0f}s...")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 15.0)
+
+async def seed_table(table_client: TableClient, path: str, concurrency: int) -> int:
+    progress = Progress(table_client.table_name)
+    semaphore = asyncio.Semaphore(concurrency)
+    pending = set()
+    errors: List[Exception] = []
+
+    async def submit(batch: List[dict]) -> None:
+        try:
+            # Upsert makes the seeding idempotent, a failed run can simply be started again
+            await table_client.submit_transaction([("upsert", entity, {"mode": UpdateMode.REPLACE}) for entity in batch])
+            progress.add(len(batch))
+        except Exception as e:
+            errors.append(e)
+        finally:
+            semaphore.release()
+
+    for batch in partition_batches(stream_json_array(path)):
+        # Only read the next batch once a slot is free so memory stays bounded
+        await semaphore.acquire()
+        if errors:
+            break
+        task = asyncio.create_task(submit(batch))
+        pending.add(task)
+        task.add_done_callback(pending.discard)
+
+    await asyncio.gather(*pending)
+    if errors:
+        raise errors[0]
+
+    print(f"Seeded {progress.count} entities to {table_client.table_name} ({progress.rate:.0f} entities/sec).")
+    return progress.count
+
+async def main() -> None:
     config = Config()
-    table_service_client = TableServiceClient(endpoint=config.storage_endpoint,credential=DefaultAzureCredential())
-    
-    try:
-        if delete_table():
-            print(f"Deleting table {config.airport_table}...")
-            table_service_client.delete_table(table_name=config.airport_table)
-            table_service_client.delete_table(table_name=config.flight_table)
-            time.sleep(120)
-    except Exception as e:
-        print(f"Delete table failed: {e}")    
+    credential = DefaultAzureCredential()
+
+    async with TableServiceClient(endpoint=config.storage_endpoint,credential=credential) as table_service_client:
+        try:
+            if delete_table():
+                print(f"Deleting table {config.airport_table}...")
+                await table_service_client.delete_table(table_name=config.airport_table)
+                await table_service_client.delete_table(table_name=config.flight_table)
+        except Exception as e:
+            print(f"Delete table failed: {e}")
 
-    table_service_client.create_table_if_not_exists(table_name=config.airport_table)
-    table_service_client.create_table_if_not_exists(table_name=config.flight_table)
+        await asyncio.gather(wait_table_ready(table_service_client, config.airport_table),
+                             wait_table_ready(table_service_client, config.flight_table))
 
-    table_client_airport = table_service_client.get_table_client(table_name=config.airport_table)
-    table_client_flight = table_service_client.get_table_client(table_name=config.flight_table)
+        table_client_airport = table_service_client.get_table_client(table_name=config.airport_table)
+        table_client_flight = table_service_client.get_table_client(table_name=config.flight_table)
 
-    # Load JSON file
-    with open("data/airport.json", "r") as f:
-        airports = json.load(f)
+        airports = await seed_table(table_client_airport, "data/airport.json", seed_concurrency())
+        flights = await seed_table(table_client_flight, "data/flights.json", seed_concurrency())
 
-    # Insert each airport entity into the table
-    for airport in airports:
-        table_client_airport.create_entity(entity=airport)
+    await credential.close()
 
-    with open("data/flights.json", "r") as f:
-        flights = json.load(f)
+    print(f"Seeded {airports} airports to Azure Table Storage.")
+    print(f"Seeded {flights} flights to Azure Table Storage.")
 
-    # Insert each airport entity into the table
-    for flight in flights:
-        table_client_flight.create_entity(entity=flight)    
+try:
+
+    load_dotenv(override=True)
 
-    print(f"Seeded {len(airports)} airports to Azure Table Storage.")
-    print(f"Seeded {len(flights)} flights to Azure Table Storage.")
+    asyncio.run(main())
 
     exit(0)
 except Exception as e:
     print(f"Script failed: {e}")
-    exit(1)
\ No newline at end of file
+    exit(1)
@@ -0,0 +1,14 @@
+from .airport_catalog import AirportCatalog
+from .seat_inventory import SeatInventory, SeatReservation, NoSeatsAvailableError, SeatCapacityError, SeatConflictError
+from .flight_index import FlightIndex
+from .query_coalescer import QueryCoalescer
+from .flight_lookup import FlightLookup
+from .booking_reconciler import BookingReconciler
+from .occupancy_view import OccupancyView
+from .idempotency import IdempotencyStore, MemoryIdempotencyStore, TableIdempotencyStore, StoredResponse, IdempotencyConflictError, IdempotencyKeyReusedError
+from .booking_queue import BookingQueue
+from .invalidation_bus import InvalidationBus
+from .warmup import Warmup
+
+from .route_planner import RoutePlanner, Route, Leg
+from .flight_columns import FlightColumns, SORT_COLUMNS
\ No newline at end of file
@@ -0,0 +1,63 @@
+from azure.data.tables.aio import TableClient
+from pydantic import TypeAdapter
+from models import Airport
+from logging import Logger
+from typing import Callable, Dict, List, Optional
+from .background_refresh import BackgroundRefresh
+import hashlib
+
+_airports_adapter = TypeAdapter(List[Airport])
+
+class AirportCatalog(BackgroundRefresh):
+    """In-process snapshot of the airport table.
+
+    The catalog is loaded once at startup and refreshed in the background every
+    `ttl` seconds. Requests are served from the pre-serialized JSON body so the
+    airport route never touches Table Storage.
+    """
+
+    def __init__(self, table_client: TableClient, ttl: int, logger: Logger):
+        super().__init__(ttl, logger)
+        self.table_client = table_client
+        self.body: bytes = b"[]"
+        self.etag: Optional[str] = None
+        # Country of each airport code
+        self.countries: Dict[str, str] = {}
+        self._listeners: List[Callable[[str], None]] = []
+
+    def add_listener(self, listener: Callable[[str], None]) -> None:
+        """Register a callback invoked with the new etag when a refresh finds a different catalog"""
+        self._listeners.append(listener)
+
+    def catalog_changed(self, etag: str) -> None:
+        """Another worker loaded a catalog with this etag, reload unless it is already served"""
+        if etag != self.etag:
+            self.reload_soon()
+
+    @property
+    def is_loaded(self) -> bool:
+        return self.etag is not None
+
+    async def load(self) -> None:
+        airports: List[Airport] = []
+        async for entity in self.table_client.query_entities(""):
+            airports.append(Airport(
+                country=entity.get("PartitionKey"),
+                airport_code=entity.get("RowKey"),
+                airport_name=entity.get("AirportName")
+            ))
+
+        body = _airports_adapter.dump_json(airports, by_alias=True)
+        etag = f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+
+        previous = self.etag
+        if etag != previous:
+            self.logger.info(f"Airport catalog loaded with {len(airports)} airports (etag {etag})")
+
+        # Swap both values together so a request never sees a body with the wrong etag
+        self.body, self.etag = body, etag
+        self.countries = {airport.RowKey: airport.PartitionKey for airport in airports}
+
+        if previous is not None and etag != previous:
+            for listener in self._listeners:
+                listener(etag)
@@ -0,0 +1,51 @@
+from logging import Logger
+from typing import Optional
+import contextlib
+import asyncio
+
+class BackgroundRefresh:
+    """Base class of the in-memory snapshots reloaded every `ttl` seconds"""
+
+    def __init__(self, ttl: int, logger: Logger):
+        self.ttl = ttl
+        self.logger = logger
+        self._refresh_task: Optional[asyncio.Task] = None
+        self._reload_task: Optional[asyncio.Task] = None
+
+    async def load(self) -> None:
+        raise NotImplementedError
+
+    def start(self) -> None:
+        if self.ttl > 0 and self._refresh_task is None:
+            self._refresh_task = asyncio.create_task(self._refresh_loop())
+
+    def reload_soon(self) -> None:
+        """Reload now in the background instead of at the next refresh, a reload already running is not repeated"""
+        if self._reload_task is None or self._reload_task.done():
+            self._reload_task = asyncio.create_task(self._reload())
+
+    async def stop(self) -> None:
+        if self._refresh_task is not None:
+            self._refresh_task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._refresh_task
+            self._refresh_task = None
+        if self._reload_task is not None:
+            self._reload_task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._reload_task
+            self._reload_task = None
+
+    async def _reload(self) -> None:
+        try:
+            await self.load()
+        except Exception as e:
+            self.logger.warning(f"{type(self).__name__} reload failed, serving previous snapshot: {e}")
+
+    async def _refresh_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.ttl)
+            try:
+                await self.load()
+            except Exception as e:
+                self.logger.warning(f"{type(self).__name__} refresh failed, serving previous snapshot: {e}")
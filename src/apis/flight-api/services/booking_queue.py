@@ -0,0 +1,214 @@
+from repository.flight_repository import FlightRepository
+from models import FlightInfo
+from datetime import datetime, timezone
+from logging import Logger
+from typing import Any, Dict, List, Optional, Tuple
+from .seat_inventory import SeatInventory
+import asyncio
+import contextlib
+import random
+import sqlite3
+import time
+import uuid
+
+class BookingQueue:
+    """Write-behind of the booking documents through a durable local queue.
+
+    The booking route reserves the seat, `enqueue`s the document in a SQLite file
+    and answers right away. `workers` tasks drain the queue by batches of
+    `batch_size` and write the documents to CosmosDB, a failed write is retried with
+    jittered exponential backoff up to `max_attempts` times, then the booking is
+    marked failed and its seat released. Finished rows are kept `retention` seconds
+    so clients can read their status.
+
+    The file can be shared by the worker processes of a host. Rows are claimed with
+    a lease of `LEASE` seconds by a single UPDATE, a row whose worker died while
+    writing it is claimed again once the lease expires, and the write of a
+    document that already exists counts as done.
+
+    The SQLite calls run on the event loop, in WAL mode with synchronous=NORMAL a
+    commit does not wait for the disk and takes a few tens of microseconds.
+    """
+
+    PENDING = ('queued', 'writing')
+    # Backoff of the retries, doubled after each failed attempt
+    RETRY_DELAY = 0.5
+    MAX_RETRY_DELAY = 60
+    # Idle workers look for retries that became due at this interval
+    POLL_INTERVAL = 1.0
+    PRUNE_INTERVAL = 60
+    LEASE = 120
+
+    def __init__(self, path: str, repository: FlightRepository, seat_inventory: SeatInventory, logger: Logger,
+                 workers: int = 4, batch_size: int = 10, max_attempts: int = 8, retention: int = 86400):
+        self.path = path
+        self.repository = repository
+        self.seat_inventory = seat_inventory
+        self.logger = logger
+        self.workers = workers
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.retention = retention
+        self._connection: Optional[sqlite3.Connection] = None
+        self._wakeup = asyncio.Event()
+        self._tasks: List[asyncio.Task] = []
+        self._pruned_at = 0.0
+        # Owner of the rows claimed by this instance
+        self._owner = uuid.uuid4().hex
+
+    def open(self) -> None:
+        self._connection = sqlite3.connect(self.path)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        with self._connection:
+            self._connection.execute("""CREATE TABLE IF NOT EXISTS bookings (
+                                            id TEXT PRIMARY KEY,
+                                            username TEXT NOT NULL,
+                                            document TEXT NOT NULL,
+                                            status TEXT NOT NULL,
+                                            attempts INTEGER NOT NULL DEFAULT 0,
+                                            error TEXT,
+                                            owner TEXT,
+                                            next_attempt_at REAL NOT NULL,
+                                            updated_at REAL NOT NULL)""")
+            self._connection.execute("CREATE INDEX IF NOT EXISTS bookings_due ON bookings (status, next_attempt_at)")
+        pending = self.pending()
+        if pending:
+            self.logger.info(f"Booking queue opened with {pending} bookings to write")
+
+    def start(self) -> None:
+        if self._connection is None:
+            self.open()
+        if not self._tasks:
+            self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        for task in self._tasks:
+            with contextlib.suppress(asyncio.CancelledError):
+                await task
+        self._tasks = []
+        if self._connection is not None:
+            with self._connection:
+                # Claimed by this instance, the other workers take them over right away
+                self._connection.execute("UPDATE bookings SET status = 'queued', next_attempt_at = ? WHERE status = 'writing' AND owner = ?",
+                                         (time.time(), self._owner))
+            self._connection.close()
+            self._connection = None
+
+    def enqueue(self, booking: FlightInfo) -> None:
+        now = time.time()
+        with self._connection:
+            self._connection.execute("INSERT INTO bookings (id, username, document, status, next_attempt_at, updated_at) "
+                                     "VALUES (?, ?, ?, 'queued', ?, ?)",
+                                     (booking.id, booking.username, booking.model_dump_json(by_alias=True), now, now))
+        self._wakeup.set()
+
+    def get(self, id: str, username: str) -> Optional[FlightInfo]:
+        """A booking of the user not written to CosmosDB yet"""
+        row = self._connection.execute("SELECT document FROM bookings WHERE id = ? AND username = ? AND status IN (?, ?)",
+                                       (id, username, *self.PENDING)).fetchone()
+        return FlightInfo.model_validate_json(row[0]) if row else None
+
+    def cancel(self, id: str, username: str) -> bool:
+        """Stop the write of a pending booking, returns False when it is not pending"""
+        with self._connection:
+            cursor = self._connection.execute("UPDATE bookings SET status = 'cancelled', updated_at = ? "
+                                              "WHERE id = ? AND username = ? AND status IN (?, ?)",
+                                              (time.time(), id, username, *self.PENDING))
+        return cursor.rowcount > 0
+
+    def status(self, id: str, username: str) -> Optional[Dict[str, Any]]:
+        row = self._connection.execute("SELECT status, attempts, error, updated_at FROM bookings WHERE id = ? AND username = ?",
+                                       (id, username)).fetchone()
+        if row is None:
+            return None
+        status, attempts, error, updated_at = row
+        return {"bookingId": id,
+                "status": 'pending' if status in self.PENDING else status,
+                "attempts": attempts,
+                "error": error,
+                "updatedAt": datetime.fromtimestamp(updated_at, timezone.utc)}
+
+    def pending(self) -> int:
+        return self._connection.execute("SELECT COUNT(*) FROM bookings WHERE status IN (?, ?)", self.PENDING).fetchone()[0]
+
+    async def _worker(self) -> None:
+        while True:
+            self._wakeup.clear()
+            batch = self._claim()
+            if not batch:
+                self._prune()
+                with contextlib.suppress(asyncio.TimeoutError):
+                    await asyncio.wait_for(self._wakeup.wait(), self.POLL_INTERVAL)
+                continue
+            try:
+                await self._write(batch)
+            except Exception as e:
+                self.logger.error(f"Booking queue batch failed: {e}")
+
+    def _claim(self) -> List[Tuple[FlightInfo, int]]:
+        # One statement, two workers never claim the same row. The lease of a row in
+        # writing is in next_attempt_at
+        now = time.time()
+        with self._connection:
+            rows = self._connection.execute("UPDATE bookings SET status = 'writing', owner = ?, next_attempt_at = ? "
+                                            "WHERE id IN (SELECT id FROM bookings WHERE status IN (?, ?) AND next_attempt_at <= ? "
+                                            "             ORDER BY next_attempt_at LIMIT ?) "
+                                            "RETURNING document, attempts",
+                                            (self._owner, now + self.LEASE, *self.PENDING, now, self.batch_size)).fetchall()
+        return [(FlightInfo.model_validate_json(document), attempts) for document, attempts in rows]
+
+    async def _write(self, batch: List[Tuple[FlightInfo, int]]) -> None:
+        results = await asyncio.gather(*[self.repository.create_booking(booking, exist_ok=True) for booking, _ in batch],
+                                       return_exceptions=True)
+
+        now = time.time()
+        written, cancelled, failed = [], [], []
+        with self._connection:
+            for (booking, attempts), error in zip(batch, results):
+                if not isinstance(error, Exception):
+                    cursor = self._connection.execute("UPDATE bookings SET status = 'written', updated_at = ? "
+                                                      "WHERE id = ? AND status = 'writing' AND owner = ?", (now, booking.id, self._owner))
+                    if cursor.rowcount:
+                        written.append(booking)
+                    elif self._connection.execute("SELECT status FROM bookings WHERE id = ?", (booking.id,)).fetchone() == ('cancelled',):
+                        cancelled.append(booking)
+                    continue
+
+                attempts += 1
+                if attempts >= self.max_attempts:
+                    cursor = self._connection.execute("UPDATE bookings SET status = 'failed', attempts = ?, error = ?, updated_at = ? "
+                                                      "WHERE id = ? AND status = 'writing' AND owner = ?", (attempts, str(error), now, booking.id, self._owner))
+                    if cursor.rowcount:
+                        failed.append(booking)
+                    self.logger.error(f"Booking {booking.id} could not be written after {attempts} attempts: {error}")
+                else:
+                    delay = min(self.RETRY_DELAY * 2 ** (attempts - 1), self.MAX_RETRY_DELAY) * random.uniform(0.5, 1)
+                    self._connection.execute("UPDATE bookings SET status = 'queued', attempts = ?, error = ?, next_attempt_at = ?, updated_at = ? "
+                                             "WHERE id = ? AND status = 'writing' AND owner = ?", (attempts, str(error), now + delay, now, booking.id, self._owner))
+                    self.logger.warning(f"Booking {booking.id} write failed, retry {attempts} in {delay:.1f}s: {error}")
+
+        # Cancelled while being written, the cancellation already released the seat
+        for booking in cancelled:
+            await self.repository.delete_booking(booking.id, booking.username)
+
+        # The booking will never exist, give its seat back
+        for booking in failed:
+            try:
+                await self.seat_inventory.release(booking.country, booking.flight_code)
+            except Exception as e:
+                self.logger.error(f"Seat release of failed booking {booking.id} failed: {e}")
+
+        if written:
+            self.logger.debug(f"Booking queue wrote {len(written)} bookings")
+
+    def _prune(self) -> None:
+        now = time.time()
+        if now - self._pruned_at < self.PRUNE_INTERVAL:
+            return
+        self._pruned_at = now
+        with self._connection:
+            self._connection.execute("DELETE FROM bookings WHERE status NOT IN (?, ?) AND updated_at < ?",
+                                     (*self.PENDING, now - self.retention))
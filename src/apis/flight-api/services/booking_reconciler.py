@@ -0,0 +1,47 @@
+from repository.flight_repository import FlightRepository
+from models import FlightInfo, FlightSnapshot
+from logging import Logger
+from typing import List, Tuple
+from .background_refresh import BackgroundRefresh
+from .flight_index import FlightIndex
+
+class BookingReconciler(BackgroundRefresh):
+    """Keeps the flight snapshot stored in the booking documents in line with the schedule.
+
+    Every `ttl` seconds the bookings are compared with the flight index, documents
+    whose snapshot differs, or written before the snapshot existed, are patched.
+    The pass is skipped while the flight index is not loaded.
+    """
+
+    # Bookings patched together, bounds the updates held in memory during a pass
+    CHUNK_SIZE = 100
+
+    def __init__(self, repository: FlightRepository, flight_index: FlightIndex, ttl: int, concurrency: int, logger: Logger):
+        super().__init__(ttl, logger)
+        self.repository = repository
+        self.flight_index = flight_index
+        self.concurrency = concurrency
+
+    async def load(self) -> None:
+        if not self.flight_index.is_loaded:
+            self.logger.info("Booking reconciliation skipped, the flight index is not loaded")
+            return
+
+        scanned = updated = 0
+        updates: List[Tuple[FlightInfo, FlightSnapshot]] = []
+        async for booking in self.repository.iter_bookings():
+            scanned += 1
+            flight = self.flight_index.get(booking.country, booking.flight_code)
+            if flight is None:
+                continue # Removed from the schedule, the booking keeps its last snapshot
+
+            snapshot = FlightSnapshot.from_entity(flight)
+            if booking.flight != snapshot:
+                updates.append((booking, snapshot))
+            if len(updates) >= self.CHUNK_SIZE:
+                updated += await self.repository.update_flight_snapshots(updates, self.concurrency)
+                updates = []
+
+        if updates:
+            updated += await self.repository.update_flight_snapshots(updates, self.concurrency)
+        self.logger.info(f"Booking reconciliation updated {updated} of {scanned} bookings")
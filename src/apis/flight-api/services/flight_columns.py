@@ -0,0 +1,286 @@
+from logging import Logger
+from operator import itemgetter
+from typing import Callable, Dict, Iterable, List, Mapping, Optional, Sequence, Tuple, Union
+from .flight_index import FlightIndex, FlightKey, timestamp
+import numpy as np
+import time
+import warnings
+
+# Sortable columns of a query
+SORT_COLUMNS = ("price", "duration", "departure", "seats")
+# Columns with presorted row orders, seats change in place and are sorted per query
+PRESORTED_COLUMNS = ("price", "duration", "departure")
+# Rows of a presorted order checked at a time when looking for the first matches
+WALK_CHUNK = 4096
+# Below this share of matching rows, the matches are kept as row indexes and sorted
+# per query instead of walking a presorted order
+WALK_MIN_DENSITY = 0.01
+
+Rows = Union[slice, np.ndarray]
+
+# Properties read from each flight, in the order of the columns
+_FIELDS = itemgetter('PartitionKey', 'RowKey', 'Airline', 'FromAirport', 'ToAirport', 'Price', 'SeatsAvailable',
+                     'DirectFlight', 'DepartureTime', 'ArrivalTime')
+
+class _Dictionary:
+    """Dictionary encoding of a string column, the codes use the smallest unsigned dtype"""
+
+    def __init__(self, values: Sequence[str]):
+        self.values: List[str] = list(dict.fromkeys(values))
+        self.lookup: Dict[str, int] = {value: code for code, value in enumerate(self.values)}
+        self.codes = np.fromiter(map(self.lookup.__getitem__, values), dtype=np.min_scalar_type(max(len(self.values) - 1, 0)),
+                                 count=len(values))
+
+    def encode(self, values: Sequence[str]) -> np.ndarray:
+        """Codes of the values, the unknown ones are left out"""
+        return np.array([self.lookup[value] for value in values if value in self.lookup], dtype=self.codes.dtype)
+
+class _Columns:
+    """One immutable generation of the snapshot, swapped as a whole on rebuild"""
+
+    def __init__(self, flights: List[Mapping]):
+        if flights:
+            country, flight_code, airline, from_airport, to_airport, price, seats, direct, departure, arrival = zip(*map(_FIELDS, flights))
+        else:
+            country = flight_code = airline = from_airport = to_airport = price = seats = direct = departure = arrival = ()
+
+        self.country = _Dictionary(country)
+        self.airline = _Dictionary(airline)
+        self.from_airport = _Dictionary(from_airport)
+        self.to_airport = _Dictionary(to_airport)
+        self.departure = _epochs(departure)
+        self.arrival = _epochs(arrival)
+
+        # Rows of a country are contiguous and ordered by departure, so the country
+        # and departure filters are slices found by binary search
+        order = np.lexsort((self.departure, self.country.codes))
+        for dictionary in (self.country, self.airline, self.from_airport, self.to_airport):
+            dictionary.codes = dictionary.codes[order]
+        self.departure = self.departure[order]
+        self.arrival = self.arrival[order]
+        self.duration = ((self.arrival - self.departure) // 60).astype(np.int32)
+        self.flight_code = np.array(flight_code, dtype=object)[order]
+        self.price = np.array(price, dtype=np.int32)[order]
+        self.seats = np.array(seats, dtype=np.int32)[order]
+        self.direct = np.array(direct, dtype=np.bool_)[order]
+
+        # Rows sorted on each presorted column, over the whole table and within each country
+        self.orders = {name: np.argsort(getattr(self, name), kind='stable').astype(np.int32) for name in PRESORTED_COLUMNS}
+        self.country_orders = {name: np.lexsort((getattr(self, name), self.country.codes)).astype(np.int32) for name in PRESORTED_COLUMNS}
+
+        bounds = np.searchsorted(self.country.codes, np.arange(len(self.country.values) + 1))
+        self.partitions: Dict[int, Tuple[int, int]] = {code: (int(bounds[code]), int(bounds[code + 1]))
+                                                        for code in range(len(self.country.values))}
+
+    def __len__(self) -> int:
+        return len(self.price)
+
+    @property
+    def nbytes(self) -> int:
+        # The flight codes are references to the strings of the flight index
+        columns = [self.departure, self.arrival, self.duration, self.price, self.seats, self.direct, self.flight_code,
+                   self.country.codes, self.airline.codes, self.from_airport.codes, self.to_airport.codes,
+                   *self.orders.values(), *self.country_orders.values()]
+        return sum(column.nbytes for column in columns)
+
+class FlightColumns:
+    """Columnar snapshot of the flight table for filters, sorts and top-k.
+
+    Each column is a NumPy array: price, seats, duration in minutes, departure and
+    arrival in epoch seconds, and the airline, airport and country codes dictionary
+    encoded. A query is a few vectorized comparisons over the rows of the countries
+    asked, with the departure window found by binary search, then a partial sort of
+    the matches keeps the `limit` first.
+
+    The snapshot is rebuilt from the flight index after each load that changed the
+    schedule, and seat counts are patched in place after each seat change.
+    """
+
+    def __init__(self, flight_index: FlightIndex, logger: Logger):
+        self.flight_index = flight_index
+        self.logger = logger
+        self._columns: Optional[_Columns] = None
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._columns is not None
+
+    @property
+    def nbytes(self) -> int:
+        return self._columns.nbytes if self._columns is not None else 0
+
+    def schedule_changed(self, changed: Iterable[dict], removed: Iterable[FlightKey]) -> None:
+        """Flight index listener, rebuilds the columns from the loaded schedule"""
+        started = time.perf_counter()
+        self._columns = _Columns(list(self.flight_index.flights()))
+        self.logger.info(f"Flight columns built with {len(self._columns)} flights ({self._columns.nbytes / 1e6:.1f} MB) "
+                         f"in {time.perf_counter() - started:.2f}s")
+
+    def flight_updated(self, entity: Mapping) -> None:
+        """Seat inventory listener, patches the seat count of the flight row"""
+        columns = self._columns
+        flight = self.flight_index.get(entity['PartitionKey'], entity['RowKey'])
+        if columns is None or flight is None:
+            return
+        country = columns.country.lookup.get(entity['PartitionKey'])
+        if country is None:
+            return
+
+        start, end = columns.partitions[country]
+        departure = timestamp(flight['DepartureTime'])
+        row = start + int(np.searchsorted(columns.departure[start:end], departure))
+        while row < end and columns.departure[row] <= departure:
+            if columns.flight_code[row] == entity['RowKey']:
+                columns.seats[row] = entity['SeatsAvailable']
+                return
+            row += 1
+
+    def query(self, countries: Optional[Sequence[str]] = None, from_airports: Optional[Sequence[str]] = None,
+              to_airports: Optional[Sequence[str]] = None, airlines: Optional[Sequence[str]] = None,
+              min_price: Optional[int] = None, max_price: Optional[int] = None, max_duration: Optional[int] = None,
+              min_seats: Optional[int] = None, direct: Optional[bool] = None,
+              departure_after: Optional[float] = None, departure_before: Optional[float] = None,
+              sort: str = "price", descending: bool = False, limit: int = 20) -> Tuple[int, List[FlightKey]]:
+        """Number of flights matching the filters and the keys of the `limit` first in the `sort` order"""
+        columns = self._columns
+        if columns is None:
+            return 0, []
+
+        if countries:
+            # A country given twice is read once, its rows would be counted twice
+            partitions = [columns.partitions[code] for code in columns.country.encode(list(dict.fromkeys(countries))).tolist()]
+        else:
+            partitions = [(0, len(columns))]
+
+        # Tests of the rows of a slice or of an index array. The dictionary encoded
+        # columns are the cheapest to read, they go first
+        tests: List[Callable[[Rows], np.ndarray]] = []
+        for dictionary, values in ((columns.from_airport, from_airports), (columns.to_airport, to_airports), (columns.airline, airlines)):
+            if values:
+                tests.append(_membership(dictionary, values))
+        if direct is not None:
+            tests.append(lambda rows: columns.direct[rows] == direct)
+        if not countries:
+            # Departures are only ordered within a country
+            if departure_after is not None:
+                tests.append(lambda rows: columns.departure[rows] >= departure_after)
+            if departure_before is not None:
+                tests.append(lambda rows: columns.departure[rows] < departure_before)
+        if min_price is not None:
+            tests.append(lambda rows: columns.price[rows] >= min_price)
+        if max_price is not None:
+            tests.append(lambda rows: columns.price[rows] <= max_price)
+        if max_duration is not None:
+            tests.append(lambda rows: columns.duration[rows] <= max_duration)
+        if min_seats is not None:
+            tests.append(lambda rows: columns.seats[rows] >= min_seats)
+
+        parts: List[_Part] = []
+        total = 0
+        for partition_start, partition_end in partitions:
+            start, end = partition_start, partition_end
+            if countries:
+                if departure_after is not None:
+                    start += int(np.searchsorted(columns.departure[start:end], departure_after))
+                if departure_before is not None:
+                    end = start + int(np.searchsorted(columns.departure[start:end], departure_before))
+            if start < end:
+                part = _Part(partition_start, partition_end, start, end)
+                part.filter(tests)
+                if part.count:
+                    parts.append(part)
+                    total += part.count
+
+        if not total:
+            return 0, []
+
+        orders = (columns.country_orders if countries else columns.orders).get(sort)
+        rows = np.concatenate([part.first(orders, descending, limit) for part in parts])
+        values = getattr(columns, sort)[rows].astype(np.int64)
+        if descending:
+            values = -values
+        if len(rows) > limit:
+            first = np.argpartition(values, limit - 1)[:limit]
+            rows, values = rows[first], values[first]
+        rows = rows[np.lexsort((rows, values))]
+
+        country_values, flight_codes = columns.country.values, columns.flight_code
+        return total, [(country_values[columns.country.codes[row]], flight_codes[row]) for row in rows.tolist()]
+
+def _membership(dictionary: _Dictionary, values: Sequence[str]) -> Callable[[Rows], np.ndarray]:
+    codes = dictionary.encode(values)
+    if len(codes) == 1:
+        code = codes[0]
+        return lambda rows: dictionary.codes[rows] == code
+    # A lookup table indexed by code, np.isin sorts its input
+    table = np.zeros(len(dictionary.values), dtype=np.bool_)
+    table[codes] = True
+    return lambda rows: table[dictionary.codes[rows]]
+
+class _Part:
+    """Rows [start, end) of a partition [partition_start, partition_end) under filtering.
+
+    The matches are a mask of the rows, or their indexes once the mask is sparse so
+    the remaining tests only read the rows still matching.
+    """
+
+    def __init__(self, partition_start: int, partition_end: int, start: int, end: int):
+        self.partition_start = partition_start
+        self.partition_end = partition_end
+        self.start = start
+        self.end = end
+        self.mask: Optional[np.ndarray] = None
+        self.rows: Optional[np.ndarray] = None
+        self.count = end - start
+
+    def filter(self, tests: List[Callable[[Rows], np.ndarray]]) -> None:
+        for test in tests:
+            if self.rows is not None:
+                self.rows = self.rows[test(self.rows)]
+                self.count = len(self.rows)
+                continue
+
+            result = test(slice(self.start, self.end))
+            self.mask = result if self.mask is None else np.logical_and(self.mask, result, out=self.mask)
+            self.count = int(np.count_nonzero(self.mask))
+            if self.count < (self.end - self.start) * WALK_MIN_DENSITY:
+                self.rows = np.flatnonzero(self.mask) + self.start
+                self.mask = None
+            if not self.count:
+                return
+
+    def first(self, orders: Optional[np.ndarray], descending: bool, limit: int) -> np.ndarray:
+        """At least the `limit` first matching rows in the order of `orders`, or all the matches without it"""
+        if self.rows is not None:
+            return self.rows
+        if orders is None or self.count < (self.partition_end - self.partition_start) * WALK_MIN_DENSITY:
+            return np.flatnonzero(self.mask) + self.start if self.mask is not None else np.arange(self.start, self.end)
+
+        # Many matches, the first ones in the sorted order come quickly
+        order = orders[self.partition_start:self.partition_end]
+        if descending:
+            order = order[::-1]
+        found: List[np.ndarray] = []
+        needed = limit
+        for offset in range(0, len(order), WALK_CHUNK):
+            rows = order[offset:offset + WALK_CHUNK]
+            if self.start > self.partition_start or self.end < self.partition_end:
+                rows = rows[(rows >= self.start) & (rows < self.end)]
+            if self.mask is not None:
+                rows = rows[self.mask[rows - self.start]]
+            found.append(rows[:needed])
+            needed -= len(found[-1])
+            if not needed:
+                break
+        return np.concatenate(found)
+
+def _epochs(values: Sequence) -> np.ndarray:
+    # ISO strings of the in-memory storage are parsed by NumPy, Table Storage datetimes one by one
+    try:
+        with warnings.catch_warnings():
+            # Offsets other than Z are applied, with a warning
+            warnings.simplefilter("ignore")
+            return np.array([value[:-1] if value.endswith('Z') else value for value in values],
+                            dtype='datetime64[s]').astype(np.int64)
+    except (AttributeError, TypeError, ValueError):
+        return np.array([timestamp(value) for value in values], dtype=np.int64)
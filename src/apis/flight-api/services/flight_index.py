@@ -0,0 +1,83 @@
+from azure.data.tables.aio import TableClient
+from collections import defaultdict
+from datetime import datetime, timezone
+from logging import Logger
+from typing import Any, Callable, Dict, Iterable, List, Mapping, Optional, Tuple
+from .background_refresh import BackgroundRefresh
+
+FlightKey = Tuple[str, str]
+# Called after each load with the flights added or changed and the keys removed
+ScheduleListener = Callable[[List[dict], List[FlightKey]], None]
+
+class FlightIndex(BackgroundRefresh):
+    """In-memory inverted index of the flight table.
+
+    Flights are indexed by (country, ToAirport) and (country, FromAirport), so
+    destination and origin lookups are dictionary hits instead of partition scans.
+    The schedule is reloaded every `ttl` seconds and seat counts are patched in
+    place by the seat inventory after each successful write.
+    """
+
+    def __init__(self, table_client: TableClient, ttl: int, logger: Logger):
+        super().__init__(ttl, logger)
+        self.table_client = table_client
+        self.is_loaded = False
+        self._flights: Dict[FlightKey, dict] = {}
+        self._by_destination: Dict[FlightKey, List[FlightKey]] = {}
+        self._by_origin: Dict[FlightKey, List[FlightKey]] = {}
+        self._listeners: List[ScheduleListener] = []
+
+    def add_listener(self, listener: ScheduleListener) -> None:
+        """Register a callback receiving the difference between each loaded schedule and the previous one"""
+        self._listeners.append(listener)
+
+    async def load(self) -> None:
+        flights: Dict[FlightKey, dict] = {}
+        by_destination: Dict[FlightKey, List[FlightKey]] = defaultdict(list)
+        by_origin: Dict[FlightKey, List[FlightKey]] = defaultdict(list)
+
+        # Table Storage returns entities ordered by PartitionKey then RowKey,
+        # the posting lists keep that order
+        async for entity in self.table_client.query_entities(""):
+            key = (entity['PartitionKey'], entity['RowKey'])
+            flights[key] = dict(entity)
+            by_destination[(key[0], entity.get('ToAirport'))].append(key)
+            by_origin[(key[0], entity.get('FromAirport'))].append(key)
+
+        previous = self._flights
+        self._flights, self._by_destination, self._by_origin = flights, dict(by_destination), dict(by_origin)
+        self.is_loaded = True
+        self.logger.info(f"Flight index loaded with {len(flights)} flights")
+
+        if self._listeners:
+            changed = [flight for key, flight in flights.items() if previous.get(key) != flight]
+            removed = [key for key in previous if key not in flights]
+            if changed or removed:
+                for listener in self._listeners:
+                    listener(changed, removed)
+
+    def flights(self) -> Iterable[dict]:
+        return self._flights.values()
+
+    def get(self, country: str, flight_code: str) -> Optional[dict]:
+        return self._flights.get((country, flight_code))
+
+    def by_destination(self, country: str, airport_code: str) -> List[dict]:
+        return [self._flights[key] for key in self._by_destination.get((country, airport_code), [])]
+
+    def by_origin(self, country: str, airport_code: str) -> List[dict]:
+        return [self._flights[key] for key in self._by_origin.get((country, airport_code), [])]
+
+    def flight_updated(self, entity: Mapping) -> None:
+        """Seat inventory listener, keeps the seat count of the snapshot current"""
+        flight = self._flights.get((entity['PartitionKey'], entity['RowKey']))
+        if flight is not None:
+            flight['SeatsAvailable'] = entity['SeatsAvailable']
+
+def timestamp(value: Any) -> float:
+    """Epoch seconds of a flight time, Table Storage returns datetimes and the in-memory storage the ISO strings of data/*.json"""
+    if not isinstance(value, datetime):
+        value = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
@@ -0,0 +1,63 @@
+from azure.core.exceptions import ResourceNotFoundError
+from azure.data.tables import TableEntity
+from azure.data.tables.aio import TableClient
+from collections import defaultdict
+from typing import Dict, Iterable, List, Tuple
+import asyncio
+
+FlightKey = Tuple[str, str]
+
+class FlightLookup:
+    """Reads a set of flights by key with bounded queries.
+
+    Keys are deduplicated and grouped by partition. A partition with a single
+    flight is a point read, larger ones are split into filters of at most
+    `chunk_size` row keys (Table Storage allows 15 comparisons per filter, the
+    partition key takes one). At most `concurrency` queries run at a time.
+    """
+
+    def __init__(self, table_client: TableClient, chunk_size: int, concurrency: int):
+        self.table_client = table_client
+        self.chunk_size = chunk_size
+        self.concurrency = concurrency
+
+    async def get_many(self, keys: Iterable[FlightKey]) -> Dict[FlightKey, TableEntity]:
+        """Flights found for `keys`, missing flights are absent from the result"""
+        partitions: Dict[str, List[str]] = defaultdict(list)
+        for country, flight_code in dict.fromkeys(keys):
+            partitions[country].append(flight_code)
+
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def run(country: str, flight_codes: List[str]) -> List[TableEntity]:
+            async with semaphore:
+                if len(flight_codes) == 1:
+                    return await self._read(country, flight_codes[0])
+                return await self._query(country, flight_codes)
+
+        queries = [run(country, flight_codes[i:i + self.chunk_size])
+                   for country, flight_codes in partitions.items()
+                   for i in range(0, len(flight_codes), self.chunk_size)]
+
+        flights: Dict[FlightKey, TableEntity] = {}
+        for entities in await asyncio.gather(*queries):
+            for entity in entities:
+                flights[(entity['PartitionKey'], entity['RowKey'])] = entity
+        return flights
+
+    async def _read(self, country: str, flight_code: str) -> List[TableEntity]:
+        try:
+            return [await self.table_client.get_entity(partition_key=country, row_key=flight_code)]
+        except ResourceNotFoundError:
+            return []
+
+    async def _query(self, country: str, flight_codes: List[str]) -> List[TableEntity]:
+        # Parameterized, the values are escaped by the client
+        parameters = {"country": country}
+        row_filters = []
+        for i, flight_code in enumerate(flight_codes):
+            parameters[f"flight_code{i}"] = flight_code
+            row_filters.append(f"RowKey eq @flight_code{i}")
+
+        query_filter = f"PartitionKey eq @country and ({' or '.join(row_filters)})"
+        return [entity async for entity in self.table_client.query_entities(query_filter=query_filter, parameters=parameters)]
@@ -0,0 +1,155 @@
+from azure.core import MatchConditions
+from azure.core.exceptions import ResourceExistsError, ResourceModifiedError, ResourceNotFoundError
+from azure.data.tables import UpdateMode
+from azure.data.tables.aio import TableClient
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Optional
+import hashlib
+import json
+import time
+
+class IdempotencyConflictError(Exception):
+    """A request with the same key is still running"""
+
+class IdempotencyKeyReusedError(Exception):
+    """The key was already used with a different request"""
+
+@dataclass
+class StoredResponse:
+    status_code: int
+    content: Any
+
+class IdempotencyStore:
+    """Responses of the write requests, by idempotency key.
+
+    `claim` is called before running a request: it returns the stored response
+    of a completed request with the same key, raises IdempotencyConflictError
+    while that request is still running, or records the key as pending and
+    returns None. The caller then either `complete`s the key with its response
+    or `release`s it when the request failed, so a retry runs again.
+    """
+
+    # A pending key left by a request that never completed is claimable again after this delay
+    PENDING_TTL = 60
+
+    def __init__(self, ttl: int):
+        self.ttl = ttl
+
+    async def claim(self, key: str, fingerprint: str) -> Optional[StoredResponse]:
+        raise NotImplementedError
+
+    async def complete(self, key: str, response: StoredResponse) -> None:
+        raise NotImplementedError
+
+    async def release(self, key: str) -> None:
+        raise NotImplementedError
+
+@dataclass
+class _Entry:
+    fingerprint: str
+    expires_at: float
+    response: Optional[StoredResponse] = None
+
+class MemoryIdempotencyStore(IdempotencyStore):
+    """Idempotency store of the instance, bounded to `max_entries` with the least recently used evicted first"""
+
+    def __init__(self, ttl: int, max_entries: int = 10000):
+        super().__init__(ttl)
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+
+    async def claim(self, key: str, fingerprint: str) -> Optional[StoredResponse]:
+        # No await, claims of the same key in this process cannot interleave
+        now = time.monotonic()
+        entry = self._entries.get(key)
+        if entry is not None and entry.expires_at > now:
+            if entry.fingerprint != fingerprint:
+                raise IdempotencyKeyReusedError(f"Idempotency key {key} was used with a different request")
+            if entry.response is None:
+                raise IdempotencyConflictError(f"A request with idempotency key {key} is in progress")
+            self._entries.move_to_end(key)
+            return entry.response
+
+        self._entries[key] = _Entry(fingerprint, now + self.PENDING_TTL)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return None
+
+    async def complete(self, key: str, response: StoredResponse) -> None:
+        entry = self._entries.get(key)
+        if entry is not None:
+            entry.response = response
+            entry.expires_at = time.monotonic() + self.ttl
+
+    async def release(self, key: str) -> None:
+        self._entries.pop(key, None)
+
+class TableIdempotencyStore(IdempotencyStore):
+    """Idempotency store shared by the instances, one Table Storage entity per key.
+
+    The first instance to create the entity owns the request, the others see it
+    pending or completed. Expired entities are taken over with an ETag condition,
+    they are not deleted in the background.
+    """
+
+    def __init__(self, table_client: TableClient, ttl: int):
+        super().__init__(ttl)
+        self.table_client = table_client
+
+    async def create_table(self) -> None:
+        """Create the table of the store, nothing else creates it"""
+        try:
+            await self.table_client.create_table()
+        except ResourceExistsError:
+            pass
+
+    async def claim(self, key: str, fingerprint: str) -> Optional[StoredResponse]:
+        partition_key, row_key = self._keys(key)
+        entity = {"PartitionKey": partition_key, "RowKey": row_key, "Fingerprint": fingerprint,
+                  "StatusCode": 0, "ExpiresAt": time.time() + self.PENDING_TTL}
+        try:
+            await self.table_client.create_entity(entity=entity)
+            return None
+        except ResourceExistsError:
+            pass
+
+        try:
+            stored = await self.table_client.get_entity(partition_key=partition_key, row_key=row_key)
+        except ResourceNotFoundError:
+            # Released in the meantime, the retry of the client will claim it
+            raise IdempotencyConflictError(f"A request with idempotency key {key} is in progress")
+
+        if stored['ExpiresAt'] <= time.time():
+            try:
+                await self.table_client.update_entity(entity=entity, mode=UpdateMode.REPLACE,
+                                                      etag=stored.metadata['etag'],
+                                                      match_condition=MatchConditions.IfNotModified)
+                return None
+            except (ResourceModifiedError, ResourceNotFoundError):
+                raise IdempotencyConflictError(f"A request with idempotency key {key} is in progress")
+
+        if stored['Fingerprint'] != fingerprint:
+            raise IdempotencyKeyReusedError(f"Idempotency key {key} was used with a different request")
+        if not stored['StatusCode']:
+            raise IdempotencyConflictError(f"A request with idempotency key {key} is in progress")
+        return StoredResponse(stored['StatusCode'], json.loads(stored['Content']))
+
+    async def complete(self, key: str, response: StoredResponse) -> None:
+        partition_key, row_key = self._keys(key)
+        await self.table_client.update_entity(entity={"PartitionKey": partition_key,
+                                                      "RowKey": row_key,
+                                                      "StatusCode": response.status_code,
+                                                      "Content": json.dumps(response.content),
+                                                      "ExpiresAt": time.time() + self.ttl},
+                                              mode=UpdateMode.MERGE)
+
+    async def release(self, key: str) -> None:
+        partition_key, row_key = self._keys(key)
+        await self.table_client.delete_entity(partition_key=partition_key, row_key=row_key)
+
+    def _keys(self, key: str) -> tuple:
+        # Keys are hashed, Table Storage rejects / \ # ? in keys; the prefix spreads the partitions
+        digest = hashlib.sha256(key.encode()).hexdigest()
+        return digest[:2], digest
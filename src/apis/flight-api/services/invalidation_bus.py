@@ -0,0 +1,94 @@
+from collections import defaultdict
+from logging import Logger
+from typing import Any, Callable, Dict, List, Mapping, Optional
+import asyncio
+import contextlib
+import json
+import os
+import socket
+
+Handler = Callable[[Dict[str, Any]], None]
+
+class InvalidationBus:
+    """Cache invalidations broadcast between the worker processes of a host.
+
+    Every worker binds a Unix datagram socket named after its pid in `path`, a
+    directory shared by the workers. `publish` sends an event to the socket of each
+    other worker, where the handlers `subscribe`d to its topic run. Delivery is best
+    effort: an event lost while a worker restarts is caught up by the refresh of its
+    caches. The socket of a worker that exited is removed by the first publisher
+    that cannot reach it.
+    """
+
+    def __init__(self, path: str, logger: Logger):
+        self.path = path
+        self.logger = logger
+        self.address = os.path.join(path, f"{os.getpid()}.sock")
+        self.published = 0
+        self.received = 0
+        self._handlers: Dict[str, List[Handler]] = defaultdict(list)
+        self._transport: Optional[asyncio.DatagramTransport] = None
+        self._sender: Optional[socket.socket] = None
+
+    async def start(self) -> None:
+        os.makedirs(self.path, exist_ok=True)
+        # Left by a previous process with the same pid
+        with contextlib.suppress(FileNotFoundError):
+            os.unlink(self.address)
+
+        self._transport, _ = await asyncio.get_running_loop().create_datagram_endpoint(
+            lambda: _BusProtocol(self), local_addr=self.address, family=socket.AF_UNIX)
+        self._sender = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self._sender.setblocking(False)
+
+    async def stop(self) -> None:
+        if self._transport is not None:
+            self._transport.close()
+            self._transport = None
+        if self._sender is not None:
+            self._sender.close()
+            self._sender = None
+        with contextlib.suppress(FileNotFoundError):
+            os.unlink(self.address)
+
+    def subscribe(self, topic: str, handler: Handler) -> None:
+        self._handlers[topic].append(handler)
+
+    def publish(self, topic: str, data: Mapping[str, Any]) -> None:
+        if self._sender is None:
+            return
+        message = json.dumps({"topic": topic, "data": data}).encode()
+        for name in os.listdir(self.path):
+            address = os.path.join(self.path, name)
+            if address == self.address or not name.endswith(".sock"):
+                continue
+            try:
+                self._sender.sendto(message, address)
+                self.published += 1
+            except (ConnectionRefusedError, FileNotFoundError):
+                # The worker is gone
+                with contextlib.suppress(FileNotFoundError):
+                    os.unlink(address)
+            except BlockingIOError:
+                self.logger.warning(f"Invalidation {topic} dropped, the queue of {name} is full")
+
+    def _dispatch(self, message: bytes) -> None:
+        try:
+            event = json.loads(message)
+        except ValueError:
+            self.logger.warning("Invalidation bus received a malformed message")
+            return
+        self.received += 1
+        for handler in self._handlers.get(event["topic"], []):
+            try:
+                handler(event["data"])
+            except Exception as e:
+                self.logger.warning(f"Invalidation {event['topic']} handler failed: {e}")
+
+class _BusProtocol(asyncio.DatagramProtocol):
+
+    def __init__(self, bus: InvalidationBus):
+        self.bus = bus
+
+    def datagram_received(self, data: bytes, addr: Any) -> None:
+        self.bus._dispatch(data)
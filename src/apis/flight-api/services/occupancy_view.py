@@ -0,0 +1,158 @@
+from azure.cosmos.aio import ContainerProxy
+from collections import Counter
+from logging import Logger
+from typing import Any, Callable, Dict, Iterable, List, Mapping, Optional, Tuple
+from storage import is_pager
+from .background_refresh import BackgroundRefresh
+import json
+import os
+import time
+
+FlightKey = Tuple[str, str]
+
+class OccupancyView(BackgroundRefresh):
+    """Number of bookings per flight, maintained from the change feed of the booking container.
+
+    Every `ttl` seconds the changes written since the last checkpoint are applied.
+    Bookings are tracked by id, so a booking seen again after an update is not
+    counted twice. The change feed does not report deletes: cancellations made by
+    this instance are applied through `booking_deleted`, the ones made by other
+    instances are caught by a full rebuild from the start of the feed every
+    `rebuild_interval` seconds. With a `checkpoint_path`, the view and its
+    continuation are saved after each change so a restart resumes from there.
+    """
+
+    def __init__(self, container: ContainerProxy, ttl: int, rebuild_interval: int, logger: Logger,
+                 checkpoint_path: Optional[str] = None):
+        super().__init__(ttl, logger)
+        self.container = container
+        self.rebuild_interval = rebuild_interval
+        self.checkpoint_path = checkpoint_path
+        self.continuation: Optional[str] = None
+        self.is_loaded = False
+        self._bookings: Dict[str, FlightKey] = {}
+        self._counts: Counter = Counter()
+        self._rebuilt_at = 0.0
+        # Deletes seen while a rebuild reads the feed, applied to the rebuilt view
+        self._deleted_during_rebuild: Optional[List[str]] = None
+
+    async def load(self) -> None:
+        if not self.is_loaded and self.checkpoint_path:
+            self._restore()
+
+        if not self.is_loaded or (self.rebuild_interval > 0 and time.monotonic() - self._rebuilt_at >= self.rebuild_interval):
+            await self.rebuild()
+            return
+
+        changes = 0
+        etags: List[str] = []
+        async for item in self.container.query_items_change_feed(continuation=self.continuation,
+                                                                 response_hook=_etag_hook(etags)):
+            self._apply(item, self._bookings, self._counts)
+            changes += 1
+        if etags:
+            self.continuation = etags[-1]
+
+        if changes:
+            self.logger.debug(f"Occupancy view applied {changes} booking changes")
+            self._save()
+
+    async def rebuild(self) -> None:
+        """Recompute the view from the start of the change feed, which holds the current version of every booking"""
+        bookings: Dict[str, FlightKey] = {}
+        counts: Counter = Counter()
+        etags: List[str] = []
+        self._deleted_during_rebuild = []
+        try:
+            async for item in self.container.query_items_change_feed(start_time="Beginning",
+                                                                     response_hook=_etag_hook(etags)):
+                self._apply(item, bookings, counts)
+            deleted = self._deleted_during_rebuild
+        finally:
+            self._deleted_during_rebuild = None
+
+        self._bookings, self._counts = bookings, counts
+        for booking_id in deleted:
+            self.booking_deleted(booking_id)
+        self.continuation = etags[-1] if etags else None
+        self._rebuilt_at = time.monotonic()
+        self.is_loaded = True
+        self.logger.info(f"Occupancy view built with {len(bookings)} bookings on {len(counts)} flights")
+        self._save()
+
+    def get(self, country: str, flight_code: str) -> int:
+        return self._counts.get((country, flight_code), 0)
+
+    def booking_deleted(self, booking_id: str) -> None:
+        """Booking repository listener, the change feed does not report deletes"""
+        if self._deleted_during_rebuild is not None:
+            self._deleted_during_rebuild.append(booking_id)
+        key = self._bookings.pop(booking_id, None)
+        if key is not None:
+            self._decrement(self._counts, key)
+
+    def drift(self, flights: Iterable[Mapping[str, Any]]) -> List[Dict[str, Any]]:
+        """Flights whose seats taken in the flight table (MaxSeatCapacity - SeatsAvailable) differ from their bookings"""
+        report = []
+        for flight in flights:
+            key = (flight['PartitionKey'], flight['RowKey'])
+            seats_taken = flight.get('MaxSeatCapacity', 0) - flight.get('SeatsAvailable', 0)
+            bookings = self._counts.get(key, 0)
+            if seats_taken != bookings:
+                report.append({"country": key[0], "flightCode": key[1], "bookings": bookings,
+                               "seatsTaken": seats_taken, "drift": seats_taken - bookings})
+        return report
+
+    def _apply(self, item: Mapping[str, Any], bookings: Dict[str, FlightKey], counts: Counter) -> None:
+        if 'country' not in item or 'flightCode' not in item:
+            return
+        key = (item['country'], item['flightCode'])
+        previous = bookings.get(item['id'])
+        if previous == key:
+            return
+        if previous is not None:
+            self._decrement(counts, previous)
+        bookings[item['id']] = key
+        counts[key] += 1
+
+    def _decrement(self, counts: Counter, key: FlightKey) -> None:
+        counts[key] -= 1
+        if counts[key] <= 0:
+            del counts[key]
+
+    def _restore(self) -> None:
+        try:
+            with open(self.checkpoint_path, 'r', encoding='utf-8') as f:
+                checkpoint = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            self.logger.warning(f"Occupancy view checkpoint cannot be read, rebuilding: {e}")
+            return
+
+        self._bookings = {booking_id: tuple(key) for booking_id, key in checkpoint['bookings'].items()}
+        self._counts = Counter(self._bookings.values())
+        self.continuation = checkpoint['continuation']
+        # The checkpoint stands for a rebuild, the next one happens after a full interval
+        self._rebuilt_at = time.monotonic()
+        self.is_loaded = True
+        self.logger.info(f"Occupancy view restored with {len(self._bookings)} bookings")
+
+    def _save(self) -> None:
+        if not self.checkpoint_path:
+            return
+        # Written next to the checkpoint then renamed, a crash never leaves a partial file.
+        # The name is per process, the workers of a host can share the checkpoint
+        temporary = f"{self.checkpoint_path}.{os.getpid()}.tmp"
+        with open(temporary, 'w', encoding='utf-8') as f:
+            json.dump({"continuation": self.continuation, "bookings": self._bookings}, f)
+        os.replace(temporary, self.checkpoint_path)
+
+def _etag_hook(etags: List[str]) -> Callable[[Mapping[str, str], Any], None]:
+    # The SDK returns the continuation of the next poll as the etag of each response. It is
+    # read from the headers of the feed responses of this call, last_response_headers is
+    # shared by concurrent calls and may hold the etag of a document
+    def hook(headers: Mapping[str, str], result: Any) -> None:
+        if not is_pager(result) and headers.get('etag'):
+            etags.append(headers['etag'])
+    return hook
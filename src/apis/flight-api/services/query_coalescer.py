@@ -0,0 +1,86 @@
+from collections import defaultdict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Mapping, Tuple
+import asyncio
+import time
+
+QueryKey = Tuple[str, Hashable]
+
+class QueryCoalescer:
+    """Single-flight execution of the flight table queries.
+
+    Concurrent calls with the same key share one in-flight query and its parsed
+    result. Results are then kept `ttl` seconds to absorb bursts (`0` only
+    coalesces). Keys start with the partition (country) so a seat change drops every
+    result of that partition, and a query started before the change is never cached.
+    """
+
+    def __init__(self, ttl: float, max_entries: int = 1024):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._inflight: Dict[QueryKey, asyncio.Task] = {}
+        self._results: Dict[QueryKey, Tuple[float, Any]] = {}
+        self._generations: Dict[str, int] = defaultdict(int)
+        self.hits = 0
+        self.coalesced = 0
+        self.misses = 0
+
+    async def get(self, key: QueryKey, query: Callable[[], Awaitable[Any]]) -> Any:
+        cached = self._results.get(key)
+        if cached is not None:
+            expires, result = cached
+            if expires > time.monotonic():
+                self.hits += 1
+                return result
+            del self._results[key]
+
+        task = self._inflight.get(key)
+        if task is None:
+            self.misses += 1
+            task = asyncio.create_task(self._run(key, query))
+            self._inflight[key] = task
+        else:
+            self.coalesced += 1
+
+        # Shielded so a caller that disconnects does not cancel the query of the others
+        return await asyncio.shield(task)
+
+    def invalidate(self, partition: str) -> None:
+        self._generations[partition] += 1
+        for key in [key for key in self._results if key[0] == partition]:
+            del self._results[key]
+        # Callers arriving after the change must not join a query started before it
+        for key in [key for key in self._inflight if key[0] == partition]:
+            del self._inflight[key]
+
+    def flight_updated(self, entity: Mapping) -> None:
+        """Seat inventory listener, drops the results of the flight partition"""
+        self.invalidate(entity['PartitionKey'])
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits,
+                "coalesced": self.coalesced,
+                "misses": self.misses,
+                "entries": len(self._results)}
+
+    async def _run(self, key: QueryKey, query: Callable[[], Awaitable[Any]]) -> Any:
+        generation = self._generations[key[0]]
+        try:
+            result = await query()
+        finally:
+            if self._inflight.get(key) is asyncio.current_task():
+                del self._inflight[key]
+
+        if self.ttl > 0 and generation == self._generations[key[0]]:
+            if len(self._results) >= self.max_entries:
+                self._evict()
+            self._results[key] = (time.monotonic() + self.ttl, result)
+        return result
+
+    def _evict(self) -> None:
+        now = time.monotonic()
+        for key in [key for key, (expires, _) in self._results.items() if expires <= now]:
+            del self._results[key]
+        # Still full, drop the oldest entry
+        if len(self._results) >= self.max_entries:
+            del self._results[next(iter(self._results))]
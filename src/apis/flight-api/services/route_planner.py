@@ -0,0 +1,184 @@
+from datetime import date, datetime, timezone
+from typing import Dict, Iterable, List, NamedTuple, Tuple
+from .airport_catalog import AirportCatalog
+from .flight_index import FlightIndex, FlightKey, timestamp
+import bisect
+import heapq
+
+class Leg(NamedTuple):
+    key: FlightKey
+    origin: str
+    destination: str
+    departure: float
+    arrival: float
+    price: int
+
+class Route(NamedTuple):
+    legs: Tuple[Leg, ...]
+    price: int
+
+    @property
+    def departure(self) -> float:
+        return self.legs[0].departure
+
+    @property
+    def arrival(self) -> float:
+        return self.legs[-1].arrival
+
+    @property
+    def duration(self) -> float:
+        return self.legs[-1].arrival - self.legs[0].departure
+
+# Ranking of the itineraries, ties broken by the other criteria. The first criterion
+# never decreases while an itinerary is extended, so it bounds the search
+SORT_KEYS = {
+    "duration": lambda route: (route.duration, route.price, len(route.legs)),
+    "price": lambda route: (route.price, route.duration, len(route.legs)),
+    "departure": lambda route: (route.departure, route.duration, route.price)
+}
+
+class _Departures:
+    """Legs ordered by departure, with their departure times in a parallel list for bisect"""
+
+    __slots__ = ("times", "legs")
+
+    def __init__(self):
+        self.times: List[float] = []
+        self.legs: List[Leg] = []
+
+    def add(self, leg: Leg) -> None:
+        index = bisect.bisect_right(self.times, leg.departure)
+        self.times.insert(index, leg.departure)
+        self.legs.insert(index, leg)
+
+    def remove(self, leg: Leg) -> None:
+        index = bisect.bisect_left(self.times, leg.departure)
+        while self.legs[index].key != leg.key:
+            index += 1
+        del self.times[index]
+        del self.legs[index]
+
+    def window(self, start: float, end: float) -> List[Leg]:
+        """Legs departing in [start, end)"""
+        return self.legs[bisect.bisect_left(self.times, start):bisect.bisect_left(self.times, end)]
+
+_NO_DEPARTURES = _Departures()
+
+# First criterion of SORT_KEYS for a partial itinerary
+_BOUNDS = {
+    "duration": lambda legs, price: legs[-1].arrival - legs[0].departure,
+    "price": lambda legs, price: price,
+    "departure": lambda legs, price: legs[0].departure
+}
+
+class RoutePlanner:
+    """Time-expanded flight graph of the schedule, searched for connecting itineraries.
+
+    Every airport holds its departures ordered by time, the waiting edges between
+    them are implicit: from an arrival the next legs are the departures of the
+    connecting airport between the minimum connection time and `max_connection`.
+    The minimum is `min_connection` when the connection stays in one country and
+    `min_connection_international` otherwise. Departures are also kept per
+    (origin, destination) so the last leg of a search is a lookup.
+
+    The graph follows the flight index: each load patches the legs that changed,
+    and seat counts are read from the index so full flights are skipped right away.
+    """
+
+    def __init__(self, flight_index: FlightIndex, airport_catalog: AirportCatalog,
+                 min_connection: int, min_connection_international: int, max_connection: int):
+        self.flight_index = flight_index
+        self.airport_catalog = airport_catalog
+        self.min_connection = min_connection * 60
+        self.min_connection_international = min_connection_international * 60
+        self.max_connection = max_connection * 60
+        self._legs: Dict[FlightKey, Leg] = {}
+        self._departures: Dict[str, _Departures] = {}
+        self._routes: Dict[Tuple[str, str], _Departures] = {}
+
+    @property
+    def is_loaded(self) -> bool:
+        return self.flight_index.is_loaded
+
+    def schedule_changed(self, changed: Iterable[dict], removed: Iterable[FlightKey]) -> None:
+        """Flight index listener, patches the legs of the flights added, changed or removed"""
+        for key in removed:
+            self._remove(key)
+        for flight in changed:
+            key = (flight['PartitionKey'], flight['RowKey'])
+            self._remove(key)
+            try:
+                leg = Leg(key, flight['FromAirport'], flight['ToAirport'], timestamp(flight['DepartureTime']),
+                          timestamp(flight['ArrivalTime']), flight['Price'])
+            except (KeyError, TypeError, ValueError):
+                # Incomplete schedule, the flight cannot be part of an itinerary
+                continue
+            self._legs[key] = leg
+            self._departures.setdefault(leg.origin, _Departures()).add(leg)
+            self._routes.setdefault((leg.origin, leg.destination), _Departures()).add(leg)
+
+    def search(self, origin: str, destination: str, day: date, max_stops: int = 1,
+               sort: str = "duration", limit: int = 10) -> List[Route]:
+        """The `limit` best itineraries leaving `origin` on `day` (UTC) with at most `max_stops` connections"""
+        start = datetime(day.year, day.month, day.day, tzinfo=timezone.utc).timestamp()
+        bound = _BOUNDS[sort]
+        min_connection = min(self.min_connection, self.min_connection_international)
+        routes: List[Route] = []
+        # First criterion of the `limit` best itineraries found so far, negated for a max-heap
+        best: List[float] = []
+
+        def extend(legs: Tuple[Leg, ...], price: int, visited: frozenset) -> None:
+            last = legs[-1]
+            if len(best) == limit and bound(legs, price) > -best[0]:
+                # Worse than the `limit` best already, and extending it only makes it worse
+                return
+            if last.destination == destination:
+                route = Route(legs, price)
+                routes.append(route)
+                value = bound(legs, price)
+                if len(best) < limit:
+                    heapq.heappush(best, -value)
+                elif value < -best[0]:
+                    heapq.heapreplace(best, -value)
+                return
+            if len(legs) > max_stops:
+                return
+
+            # The last allowed leg has to land at the destination
+            departures = self._routes.get((last.destination, destination)) if len(legs) == max_stops else self._departures.get(last.destination)
+            for leg in (departures or _NO_DEPARTURES).window(last.arrival + min_connection, last.arrival + self.max_connection):
+                if leg.destination in visited:
+                    continue
+                connection = leg.departure - last.arrival
+                if connection < self.min_connection_international and connection < self._connection_time(last, leg):
+                    continue
+                if self._has_seats(leg):
+                    extend(legs + (leg,), price + leg.price, visited | {leg.destination})
+
+        for leg in self._departures.get(origin, _NO_DEPARTURES).window(start, start + 86400):
+            if leg.destination != origin and self._has_seats(leg):
+                extend((leg,), leg.price, frozenset((origin, leg.destination)))
+
+        return heapq.nsmallest(limit, routes, key=SORT_KEYS[sort])
+
+    def flights(self, route: Route) -> List[dict]:
+        """Flight entities of the legs of an itinerary"""
+        return [self.flight_index.get(*leg.key) for leg in route.legs]
+
+    def _remove(self, key: FlightKey) -> None:
+        leg = self._legs.pop(key, None)
+        if leg is None:
+            return
+        self._departures[leg.origin].remove(leg)
+        self._routes[(leg.origin, leg.destination)].remove(leg)
+
+    def _has_seats(self, leg: Leg) -> bool:
+        flight = self.flight_index.get(*leg.key)
+        return flight is not None and flight.get('SeatsAvailable', 0) > 0
+
+    def _connection_time(self, inbound: Leg, outbound: Leg) -> int:
+        countries = self.airport_catalog.countries
+        country = countries.get(inbound.destination)
+        if country is not None and countries.get(inbound.origin) == country and countries.get(outbound.destination) == country:
+            return self.min_connection
+        return self.min_connection_international
@@ -0,0 +1,196 @@
+from azure.core import MatchConditions
+from azure.core.exceptions import ResourceModifiedError, ResourceNotFoundError
+from azure.data.tables import UpdateMode, TableEntity, TableErrorCode, TableTransactionError
+from azure.data.tables.aio import TableClient
+from collections import Counter, defaultdict
+from logging import Logger
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+import weakref
+import asyncio
+import random
+
+class NoSeatsAvailableError(Exception):
+    pass
+
+class SeatCapacityError(Exception):
+    pass
+
+class SeatConflictError(Exception):
+    pass
+
+# Maximum number of operations accepted by a Table transactional batch
+MAX_TRANSACTION_SIZE = 100
+
+FlightKey = Tuple[str, str]
+
+@dataclass
+class SeatReservation:
+    granted: int = 0
+    flight: Optional[TableEntity] = None
+    error: Optional[str] = None
+
+class SeatInventory:
+    """Seat counter of the flight table using ETag optimistic concurrency.
+
+    Every change is a conditional replace (If-Match on the ETag read just before),
+    so two writers can never overwrite each other. On a 412 the flight is read again
+    and the change retried with a jittered exponential backoff. Requests for the same
+    flight inside this process are queued behind a per-flight lock so only writers
+    from other instances can cause conflicts.
+    """
+
+    def __init__(self,
+                 table_client: TableClient,
+                 logger: Logger,
+                 max_retries: int = 5,
+                 base_delay: float = 0.05,
+                 max_delay: float = 1.0):
+        self.table_client = table_client
+        self.logger = logger
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._locks: weakref.WeakValueDictionary = weakref.WeakValueDictionary()
+        self._listeners: List[Callable[[TableEntity], None]] = []
+
+    def add_listener(self, listener: Callable[[TableEntity], None]) -> None:
+        """Register a callback invoked with the flight entity after each seat change"""
+        self._listeners.append(listener)
+
+    async def reserve(self, country: str, flight_code: str) -> TableEntity:
+        return await self._adjust(country, flight_code, -1)
+
+    async def release(self, country: str, flight_code: str) -> TableEntity:
+        return await self._adjust(country, flight_code, 1)
+
+    async def reserve_many(self, flights: Iterable[FlightKey]) -> Dict[FlightKey, SeatReservation]:
+        """Reserve one seat per (country, flight_code) item, grouped into transactional batches.
+
+        A flight can be granted fewer seats than requested when it fills up. Unknown
+        flights and partitions that keep conflicting are reported through `error`.
+        """
+        requested = Counter(flights)
+        partitions: Dict[str, List[str]] = defaultdict(list)
+        for country, flight_code in requested:
+            partitions[country].append(flight_code)
+
+        reservations: Dict[FlightKey, SeatReservation] = {}
+        for results in await asyncio.gather(*[self._reserve_partition(country, flight_codes, requested)
+                                              for country, flight_codes in partitions.items()]):
+            reservations.update(results)
+        return reservations
+
+    async def _reserve_partition(self, country: str, flight_codes: List[str], requested: Counter) -> Dict[FlightKey, SeatReservation]:
+        reservations: Dict[FlightKey, SeatReservation] = {}
+
+        for i in range(0, len(flight_codes), MAX_TRANSACTION_SIZE):
+            chunk = flight_codes[i:i + MAX_TRANSACTION_SIZE]
+            try:
+                reservations.update(await self._reserve_chunk(country, chunk, requested))
+            except SeatConflictError as e:
+                self.logger.warning(e)
+                reservations.update({(country, code): SeatReservation(error='Flight is busy, please retry') for code in chunk})
+            except Exception as e:
+                self.logger.error(f"Batch seat update on partition {country} failed: {e}")
+                reservations.update({(country, code): SeatReservation(error='Seat update failed') for code in chunk})
+
+        return reservations
+
+    async def _reserve_chunk(self, country: str, chunk: List[str], requested: Counter) -> Dict[FlightKey, SeatReservation]:
+        for attempt in range(self.max_retries + 1):
+            flights = await asyncio.gather(*[self._get_or_none(country, flight_code) for flight_code in chunk])
+
+            operations = []
+            reservations: Dict[FlightKey, SeatReservation] = {}
+            for flight_code, flight in zip(chunk, flights):
+                if flight is None:
+                    reservations[(country, flight_code)] = SeatReservation(error='Flight not found')
+                    continue
+
+                seats_available = flight.get('SeatsAvailable', 0)
+                seats = min(requested[(country, flight_code)], seats_available)
+                reservations[(country, flight_code)] = SeatReservation(granted=seats, flight=flight)
+                if seats > 0:
+                    flight['SeatsAvailable'] = seats_available - seats
+                    operations.append(("update", flight, {"mode": UpdateMode.REPLACE,
+                                                          "etag": flight.metadata['etag'],
+                                                          "match_condition": MatchConditions.IfNotModified}))
+
+            if not operations:
+                return reservations
+
+            try:
+                # All the seat changes of the chunk are applied atomically, or none of them
+                await self.table_client.submit_transaction(operations)
+                for _, flight, _ in operations:
+                    self._notify(flight)
+                return reservations
+            except TableTransactionError as e:
+                if not _is_condition_failure(e):
+                    raise
+                if attempt < self.max_retries:
+                    delay = self._backoff(attempt)
+                    self.logger.debug(f"Batch seat update conflict on partition {country}, retry {attempt + 1} in {delay:.3f}s")
+                    await asyncio.sleep(delay)
+
+        raise SeatConflictError(f"Batch seat update on partition {country} failed after {self.max_retries} retries")
+
+    async def _get_or_none(self, country: str, flight_code: str) -> TableEntity:
+        try:
+            return await self.table_client.get_entity(partition_key=country, row_key=flight_code)
+        except ResourceNotFoundError:
+            return None
+
+    async def _adjust(self, country: str, flight_code: str, delta: int) -> TableEntity:
+        async with self._lock_for(country, flight_code):
+            for attempt in range(self.max_retries + 1):
+                flight = await self.table_client.get_entity(partition_key=country, row_key=flight_code)
+                seats_available = flight.get('SeatsAvailable', 0)
+                max_seat_capacity = flight.get('MaxSeatCapacity', 0)
+
+                seats = seats_available + delta
+                if seats < 0:
+                    raise NoSeatsAvailableError(f"No seats available on flight {country}/{flight_code}")
+                if seats > max_seat_capacity:
+                    raise SeatCapacityError(f"Flight {country}/{flight_code} is already at maximum capacity")
+
+                flight['SeatsAvailable'] = seats
+
+                try:
+                    await self.table_client.update_entity(entity=flight,
+                                                          mode=UpdateMode.REPLACE,
+                                                          etag=flight.metadata['etag'],
+                                                          match_condition=MatchConditions.IfNotModified)
+                    self._notify(flight)
+                    return flight
+                except ResourceModifiedError:
+                    if attempt == self.max_retries:
+                        break
+                    delay = self._backoff(attempt)
+                    self.logger.debug(f"Seat update conflict on {country}/{flight_code}, retry {attempt + 1} in {delay:.3f}s")
+                    await asyncio.sleep(delay)
+
+        raise SeatConflictError(f"Seat update on flight {country}/{flight_code} failed after {self.max_retries} retries")
+
+    def _notify(self, flight: TableEntity) -> None:
+        for listener in self._listeners:
+            try:
+                listener(flight)
+            except Exception as e:
+                self.logger.warning(f"Seat change listener failed: {e}")
+
+    def _lock_for(self, country: str, flight_code: str) -> asyncio.Lock:
+        key = (country, flight_code)
+        lock = self._locks.get(key)
+        if lock is None:
+            lock = asyncio.Lock()
+            self._locks[key] = lock
+        return lock
+
+    def _backoff(self, attempt: int) -> float:
+        # Full jitter, spreads competing writers from other instances apart
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+def _is_condition_failure(error: TableTransactionError) -> bool:
+    return error.status_code == 412 or getattr(error, 'error_code', None) == TableErrorCode.UPDATE_CONDITION_NOT_SATISFIED
@@ -0,0 +1,50 @@
+from logging import Logger
+from typing import Any, Awaitable, Callable, Dict, Mapping
+from .background_refresh import BackgroundRefresh
+import asyncio
+import time
+
+class Warmup(BackgroundRefresh):
+    """Warm-up of the credential and of the storage connections, and readiness of the instance.
+
+    The `steps` run concurrently at startup, each bounded by `timeout` seconds. The
+    ones that failed run again every `ttl` seconds until they pass. `probes` are
+    conditions read with the readiness, like the initial load of a snapshot. The
+    instance is ready once every step passed and every probe holds.
+    """
+
+    def __init__(self, steps: Mapping[str, Callable[[], Awaitable[Any]]], probes: Mapping[str, Callable[[], bool]],
+                 ttl: int, timeout: int, logger: Logger):
+        super().__init__(ttl, logger)
+        self.steps = steps
+        self.probes = probes
+        self.timeout = timeout
+        self._results: Dict[str, str] = {name: "pending" for name in steps}
+
+    async def load(self) -> None:
+        pending = [name for name, result in self._results.items() if result != "ok"]
+        if not pending:
+            return
+
+        started = time.perf_counter()
+        results = await asyncio.gather(*[asyncio.wait_for(self.steps[name](), self.timeout) for name in pending],
+                                       return_exceptions=True)
+        for name, result in zip(pending, results):
+            if isinstance(result, asyncio.TimeoutError):
+                self._results[name] = f"timed out after {self.timeout}s"
+            elif isinstance(result, Exception):
+                self._results[name] = f"{type(result).__name__}: {result}"
+            else:
+                self._results[name] = "ok"
+
+        failed = {name: self._results[name] for name in pending if self._results[name] != "ok"}
+        if failed:
+            self.logger.warning(f"Warm-up incomplete, retry in {self.ttl}s: {failed}")
+        else:
+            self.logger.info(f"Warm-up of {', '.join(pending)} done in {time.perf_counter() - started:.2f}s")
+
+    def status(self) -> Dict[str, Any]:
+        checks = dict(self._results)
+        for name, probe in self.probes.items():
+            checks[name] = "ok" if probe() else "pending"
+        return {"ready": all(result == "ok" for result in checks.values()), "checks": checks}
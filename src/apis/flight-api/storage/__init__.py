@@ -0,0 +1,4 @@
+from .backend import Storage, create_storage, azure_storage, memory_storage
+from .memory_table import MemoryTableClient
+from .memory_container import MemoryContainer
+from .response_hook import is_pager
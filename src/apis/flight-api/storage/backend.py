@@ -0,0 +1,84 @@
+from azure.cosmos.aio import ContainerProxy, CosmosClient
+from azure.data.tables.aio import TableClient, TableServiceClient
+from azure.identity.aio import DefaultAzureCredential
+from config import Config
+from logging import Logger
+from pathlib import Path
+from typing import Awaitable, Callable, List, Optional
+from urllib.parse import urlparse
+from .credential import CachedTokenCredential
+from .memory_container import MemoryContainer
+from .memory_table import MemoryTableClient
+import json
+
+DATA_PATH = Path(__file__).resolve().parent.parent / "data"
+
+STORAGE_SCOPE = "https://storage.azure.com/.default"
+
+class Storage:
+    """Clients of the airport and flight tables and of the booking container.
+
+    The idempotency table is optional, it is only used by the Table idempotency store.
+    `credential` and `token_scopes` are set with Azure, for the warm-up of the tokens.
+    """
+
+    def __init__(self,
+                 table_client_airport: TableClient,
+                 table_client_flight: TableClient,
+                 container: ContainerProxy,
+                 closers: List[Callable[[], Awaitable[None]]] = None,
+                 table_client_idempotency: Optional[TableClient] = None,
+                 credential: Optional[CachedTokenCredential] = None,
+                 token_scopes: List[str] = None):
+        self.table_client_airport = table_client_airport
+        self.table_client_flight = table_client_flight
+        self.container = container
+        self.table_client_idempotency = table_client_idempotency
+        self.credential = credential
+        self.token_scopes = token_scopes or []
+        self._closers = closers or []
+
+    async def close(self) -> None:
+        for close in self._closers:
+            await close()
+
+def create_storage(config: Config, logger: Logger) -> Storage:
+    backend = config.storage_backend
+    if backend == 'azure':
+        return azure_storage(config, logger)
+    if backend == 'memory':
+        return memory_storage(Path(config.storage_data_path or DATA_PATH))
+    raise ValueError(f"Unknown storage backend '{backend}', expected 'azure' or 'memory'")
+
+def azure_storage(config: Config, logger: Logger) -> Storage:
+    # One credential for both services, the credential chain is probed once and tokens are cached
+    credential = CachedTokenCredential(DefaultAzureCredential(), logger, config.token_refresh_margin)
+    table_service_client = TableServiceClient(endpoint=config.storage_endpoint,credential=credential)
+
+    cosmos_client = CosmosClient(url=config.cosmos_endpoint,
+                                 credential=credential)
+    container = cosmos_client.get_database_client(config.cosmos_database).get_container_client(config.cosmos_container)
+
+    # Scope requested by the Cosmos client, built from the account endpoint
+    cosmos_endpoint = urlparse(config.cosmos_endpoint)
+    cosmos_scope = f"{cosmos_endpoint.scheme}://{cosmos_endpoint.hostname}/.default"
+
+    return Storage(table_service_client.get_table_client(table_name=config.airport_table),
+                   table_service_client.get_table_client(table_name=config.flight_table),
+                   container,
+                   [table_service_client.close, cosmos_client.close, credential.close],
+                   table_service_client.get_table_client(table_name=config.idempotency_table) if config.idempotency_table else None,
+                   credential,
+                   [STORAGE_SCOPE, cosmos_scope])
+
+def memory_storage(data_path: Path = DATA_PATH) -> Storage:
+    # Tables are loaded from the seed files, bookings start empty
+    table_client_airport = MemoryTableClient("airports")
+    table_client_flight = MemoryTableClient("flights")
+    for table_client, file_name in [(table_client_airport, "airport.json"), (table_client_flight, "flights.json")]:
+        with open(data_path / file_name, "r", encoding="utf-8") as f:
+            for entity in json.load(f):
+                table_client.seed(entity)
+
+    return Storage(table_client_airport, table_client_flight, MemoryContainer(partition_key_path="/username"),
+                   table_client_idempotency=MemoryTableClient("idempotency"))
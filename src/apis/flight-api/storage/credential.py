@@ -0,0 +1,88 @@
+from azure.core.credentials import AccessToken
+from azure.core.credentials_async import AsyncTokenCredential
+from logging import Logger
+from typing import Any, Dict, Optional, Tuple
+import asyncio
+import contextlib
+import time
+
+TokenKey = Tuple[Tuple[str, ...], Optional[str], bool]
+
+class CachedTokenCredential:
+    """Token cache in front of the credential shared by the Table and Cosmos clients.
+
+    Tokens are kept per scope and returned from memory while they are valid. A
+    background task fetches a new token `refresh_margin` seconds before each one
+    expires, earlier than the 5 minutes at which the SDK clients ask for a new
+    token, so no request waits for the credential after startup. Requests carrying
+    claims (a CAE challenge) always go to the credential.
+    """
+
+    RETRY_DELAY = 30
+
+    def __init__(self, credential: AsyncTokenCredential, logger: Logger, refresh_margin: int = 600):
+        self.credential = credential
+        self.logger = logger
+        self.refresh_margin = refresh_margin
+        self._tokens: Dict[TokenKey, AccessToken] = {}
+        self._refresh_at: Dict[TokenKey, float] = {}
+        self._locks: Dict[TokenKey, asyncio.Lock] = {}
+        self._refresh_task: Optional[asyncio.Task] = None
+
+    async def get_token(self, *scopes: str, claims: Optional[str] = None, tenant_id: Optional[str] = None,
+                        enable_cae: bool = False, **kwargs: Any) -> AccessToken:
+        if claims:
+            return await self.credential.get_token(*scopes, claims=claims, tenant_id=tenant_id, enable_cae=enable_cae, **kwargs)
+
+        key = (scopes, tenant_id, enable_cae)
+        token = self._tokens.get(key)
+        if token is not None and token.expires_on - time.time() > 60:
+            return token
+
+        # Concurrent first requests of a scope share one credential call
+        async with self._locks.setdefault(key, asyncio.Lock()):
+            token = self._tokens.get(key)
+            if token is None or token.expires_on - time.time() <= 60:
+                token = await self._fetch(key)
+        return token
+
+    async def close(self) -> None:
+        if self._refresh_task is not None:
+            self._refresh_task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._refresh_task
+            self._refresh_task = None
+        await self.credential.close()
+
+    async def __aenter__(self) -> "CachedTokenCredential":
+        return self
+
+    async def __aexit__(self, *args: Any) -> None:
+        await self.close()
+
+    async def _fetch(self, key: TokenKey) -> AccessToken:
+        scopes, tenant_id, enable_cae = key
+        token = await self.credential.get_token(*scopes, tenant_id=tenant_id, enable_cae=enable_cae)
+        now = time.time()
+        self._tokens[key] = token
+        # Half way through the lifetime of tokens shorter than the margin
+        self._refresh_at[key] = max(token.expires_on - self.refresh_margin, now + (token.expires_on - now) / 2)
+        if self._refresh_task is None:
+            self._refresh_task = asyncio.create_task(self._refresh_loop())
+        return token
+
+    async def _refresh_loop(self) -> None:
+        while True:
+            await asyncio.sleep(max(1, min(self._refresh_at.values()) - time.time()))
+
+            for key, refresh_at in list(self._refresh_at.items()):
+                if refresh_at > time.time():
+                    continue
+                try:
+                    async with self._locks.setdefault(key, asyncio.Lock()):
+                        await self._fetch(key)
+                    self.logger.debug(f"Token of {' '.join(key[0])} refreshed")
+                except Exception as e:
+                    # The current token is still valid, try again shortly
+                    self._refresh_at[key] = time.time() + self.RETRY_DELAY
+                    self.logger.warning(f"Token refresh of {' '.join(key[0])} failed: {e}")
@@ -0,0 +1,218 @@
+from azure.cosmos.exceptions import CosmosResourceExistsError, CosmosResourceNotFoundError, CosmosAccessConditionFailedError
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, List, Mapping, Optional, Tuple
+from .paging import MemoryPaged
+import asyncio
+import itertools
+import re
+import time
+
+_QUERY = re.compile(r"^\s*SELECT\s+(?P<projection>.+?)\s+FROM\s+(?P<alias>\w+)(?:\s+WHERE\s+(?P<where>.+?))?\s*$",
+                    re.IGNORECASE | re.DOTALL)
+_CONDITION = re.compile(r"^\s*(?P<alias>\w+)\.(?P<path>[\w.]+)\s*=\s*(?P<value>@\w+|'(?:[^']|\\')*'|-?\d+(?:\.\d+)?|true|false|null)\s*$",
+                        re.IGNORECASE)
+
+class MemoryContainer:
+    """In-memory engine with the surface of the async Cosmos ContainerProxy used by the API.
+
+    Items are indexed by partition key value then id. Queries support a projection
+    (`*` or a list of properties) and a WHERE clause made of equalities joined by AND,
+    which covers the queries of the repository. Every call reports a zero request
+    charge through `response_hook` and `client_connection.last_response_headers`.
+
+    The change feed is in latest version mode: each write stamps the item with a
+    sequence number (`_lsn`) and the feed returns the current version of the items
+    written after the continuation, deletes are not reported.
+    """
+
+    def __init__(self, partition_key_path: str = "/id", latency: float = 0.0):
+        self.partition_key_path = partition_key_path
+        self.latency = latency
+        self.client_connection = SimpleNamespace(last_response_headers={})
+        self._partitions: Dict[Any, Dict[str, dict]] = {}
+        self._versions = itertools.count(1)
+        self._lsn = 0
+
+    def __len__(self) -> int:
+        return sum(len(items) for items in self._partitions.values())
+
+    async def read(self, **kwargs) -> dict:
+        """Properties of the container"""
+        await self._delay()
+        return self._respond({"id": "memory", "partitionKey": {"paths": [self.partition_key_path], "kind": "Hash"}}, kwargs)
+
+    async def create_item(self, body: Mapping[str, Any], **kwargs) -> dict:
+        await self._delay()
+        partition = self._partitions.setdefault(self._partition_key(body), {})
+        if body['id'] in partition:
+            raise CosmosResourceExistsError(message=f"Item {body['id']} already exists")
+        return self._respond(self._write(partition, body), kwargs)
+
+    async def upsert_item(self, body: Mapping[str, Any], **kwargs) -> dict:
+        await self._delay()
+        partition = self._partitions.setdefault(self._partition_key(body), {})
+        return self._respond(self._write(partition, body), kwargs)
+
+    async def replace_item(self, item: Any, body: Mapping[str, Any], **kwargs) -> dict:
+        await self._delay()
+        stored = self._partitions.get(self._partition_key(body), {}).get(_id(item))
+        if stored is None:
+            raise CosmosResourceNotFoundError(message=f"Item {_id(item)} not found")
+        if kwargs.get('etag') is not None and kwargs.get('match_condition') is not None and stored['_etag'] != kwargs['etag']:
+            raise CosmosAccessConditionFailedError(message=f"Item {_id(item)} was modified")
+        return self._respond(self._write(self._partitions[self._partition_key(body)], body), kwargs)
+
+    async def read_item(self, item: Any, partition_key: Any, **kwargs) -> dict:
+        await self._delay()
+        stored = self._partitions.get(partition_key, {}).get(_id(item))
+        if stored is None:
+            raise CosmosResourceNotFoundError(message=f"Item {_id(item)} not found")
+        return self._respond(dict(stored), kwargs)
+
+    async def patch_item(self, item: Any, partition_key: Any, patch_operations: List[Dict[str, Any]], **kwargs) -> dict:
+        await self._delay()
+        partition = self._partitions.get(partition_key, {})
+        stored = partition.get(_id(item))
+        if stored is None:
+            raise CosmosResourceNotFoundError(message=f"Item {_id(item)} not found")
+
+        body = dict(stored)
+        for operation in patch_operations:
+            path = operation['path'].strip('/').split('/')
+            parent = body
+            for segment in path[:-1]:
+                # Nested objects are copied, the stored item is only replaced once every operation applied
+                parent[segment] = dict(parent.get(segment) or {})
+                parent = parent[segment]
+            if operation['op'] in ('set', 'add', 'replace'):
+                if operation['op'] == 'replace' and path[-1] not in parent:
+                    raise CosmosResourceNotFoundError(message=f"Path {operation['path']} not found in item {_id(item)}")
+                parent[path[-1]] = operation['value']
+            elif operation['op'] == 'remove':
+                if parent.pop(path[-1], None) is None:
+                    raise CosmosResourceNotFoundError(message=f"Path {operation['path']} not found in item {_id(item)}")
+            else:
+                raise NotImplementedError(f"Patch operation not supported by the in-memory container: {operation['op']}")
+        return self._respond(self._write(partition, body), kwargs)
+
+    async def delete_item(self, item: Any, partition_key: Any, **kwargs) -> None:
+        await self._delay()
+        partition = self._partitions.get(partition_key, {})
+        if partition.pop(_id(item), None) is None:
+            raise CosmosResourceNotFoundError(message=f"Item {_id(item)} not found")
+        self._respond(None, kwargs)
+
+    def query_items(self, query: str, parameters: Optional[List[Dict[str, Any]]] = None,
+                    partition_key: Any = None, max_item_count: Optional[int] = None, **kwargs) -> MemoryPaged:
+        project, matches = _compile_query(query, {p['name']: p['value'] for p in parameters or []})
+
+        def fetch() -> List[dict]:
+            if partition_key is not None:
+                partitions = [self._partitions.get(partition_key, {})]
+            else:
+                partitions = list(self._partitions.values())
+            return self._respond([project(item) for partition in partitions for item in partition.values() if matches(item)],
+                                 kwargs, _headers())
+
+        return MemoryPaged(fetch, max_item_count)
+
+    def query_items_change_feed(self, start_time: Any = "Now", continuation: Optional[str] = None,
+                                max_item_count: Optional[int] = None, **kwargs) -> MemoryPaged:
+        if continuation is not None:
+            after = int(continuation)
+        elif start_time == "Beginning":
+            after = 0
+        elif start_time == "Now":
+            after = self._lsn
+        else:
+            raise NotImplementedError("Only the Beginning and Now start times are supported by the in-memory container")
+
+        def fetch() -> List[dict]:
+            items = sorted((item for partition in self._partitions.values() for item in partition.values() if item['_lsn'] > after),
+                           key=lambda item: item['_lsn'])
+            # Like the SDK, the continuation of the next poll is returned as the etag header
+            return self._respond([dict(item) for item in items], kwargs, _headers(str(items[-1]['_lsn'] if items else after)))
+
+        return MemoryPaged(fetch, max_item_count)
+
+    def _partition_key(self, body: Mapping[str, Any]) -> Any:
+        return _resolve(body, self.partition_key_path.strip('/').split('/'))
+
+    def _write(self, partition: Dict[str, dict], body: Mapping[str, Any]) -> dict:
+        item = dict(body)
+        self._lsn = next(self._versions)
+        item['_lsn'] = self._lsn
+        item['_etag'] = f'"{self._lsn:016x}"'
+        item['_ts'] = int(time.time())
+        partition[item['id']] = item
+        return dict(item)
+
+    def _respond(self, result: Any, kwargs: Mapping[str, Any], headers: Optional[Dict[str, str]] = None) -> Any:
+        if headers is None:
+            headers = _headers(result.get('_etag') if result else None)
+        self.client_connection.last_response_headers = headers
+        response_hook = kwargs.get('response_hook')
+        if response_hook:
+            response_hook(headers, result)
+        return result
+
+    async def _delay(self) -> None:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+def _headers(etag: Optional[str] = None) -> Dict[str, str]:
+    headers = {'x-ms-request-charge': '0'}
+    if etag:
+        headers['etag'] = etag
+    return headers
+
+def _id(item: Any) -> str:
+    return item['id'] if isinstance(item, Mapping) else item
+
+def _resolve(item: Mapping[str, Any], path: List[str]) -> Any:
+    value: Any = item
+    for segment in path:
+        if not isinstance(value, Mapping) or segment not in value:
+            return None
+        value = value[segment]
+    return value
+
+def _compile_query(query: str, parameters: Mapping[str, Any]) -> Tuple[Callable[[dict], dict], Callable[[dict], bool]]:
+    match = _QUERY.match(query)
+    if match is None:
+        raise NotImplementedError(f"Query not supported by the in-memory container: {query}")
+    alias = match.group('alias')
+
+    projection = match.group('projection').strip()
+    if projection == '*':
+        project = dict
+    else:
+        paths = []
+        for column in projection.split(','):
+            column = column.strip()
+            if not column.startswith(f"{alias}."):
+                raise NotImplementedError(f"Projection not supported by the in-memory container: {column}")
+            paths.append(column[len(alias) + 1:].split('.'))
+        project = lambda item: {path[-1]: _resolve(item, path) for path in paths if _resolve(item, path) is not None}
+
+    conditions = []
+    if match.group('where'):
+        for clause in re.split(r"\s+AND\s+", match.group('where'), flags=re.IGNORECASE):
+            condition = _CONDITION.match(clause)
+            if condition is None or condition.group('alias') != alias:
+                raise NotImplementedError(f"Condition not supported by the in-memory container: {clause}")
+            conditions.append((condition.group('path').split('.'), _literal(condition.group('value'), parameters)))
+
+    return project, lambda item: all(_resolve(item, path) == value for path, value in conditions)
+
+def _literal(value: str, parameters: Mapping[str, Any]) -> Any:
+    if value.startswith('@'):
+        if value not in parameters:
+            raise ValueError(f"Missing value for query parameter {value}")
+        return parameters[value]
+    if value.startswith("'"):
+        return value[1:-1].replace("\\'", "'")
+    lowered = value.lower()
+    if lowered in ('true', 'false', 'null'):
+        return {'true': True, 'false': False, 'null': None}[lowered]
+    return float(value) if '.' in value else int(value)
@@ -0,0 +1,211 @@
+from azure.core import MatchConditions
+from azure.core.exceptions import ResourceExistsError, ResourceModifiedError, ResourceNotFoundError
+from azure.data.tables import TableEntity, TableErrorCode, TableTransactionError, UpdateMode
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Tuple
+from .odata import compile_filter
+from .paging import MemoryPaged
+import asyncio
+import bisect
+import itertools
+
+# Page size of Table Storage queries
+DEFAULT_PAGE_SIZE = 1000
+
+class MemoryTableClient:
+    """In-memory engine with the surface of the async TableClient used by the API.
+
+    Entities are indexed by partition then row key, so point reads are a dictionary
+    hit and partition queries only scan their partition. Writes honour the ETag
+    conditions, and the check and the write run without yielding to the event loop
+    so they are atomic. `latency` adds a delay to every call to simulate the network.
+    """
+
+    def __init__(self, table_name: str = "memory", latency: float = 0.0):
+        self.table_name = table_name
+        self.latency = latency
+        self._partitions: Dict[str, Dict[str, dict]] = {}
+        # Sorted row keys per partition, rebuilt when rows are added or removed
+        self._sorted_rows: Dict[str, List[str]] = {}
+        self._versions = itertools.count(1)
+
+    def __len__(self) -> int:
+        return sum(len(rows) for rows in self._partitions.values())
+
+    def seed(self, entity: Mapping[str, Any]) -> None:
+        self._write(entity)
+
+    async def __aenter__(self) -> "MemoryTableClient":
+        return self
+
+    async def __aexit__(self, *args) -> None:
+        await self.close()
+
+    async def close(self) -> None:
+        pass
+
+    async def create_table(self, **kwargs) -> None:
+        pass
+
+    async def get_entity(self, partition_key: str, row_key: str, **kwargs) -> TableEntity:
+        await self._delay()
+        stored = self._partitions.get(partition_key, {}).get(row_key)
+        if stored is None:
+            raise ResourceNotFoundError(f"Entity {partition_key}/{row_key} not found")
+        return _entity(stored, kwargs.get('select'))
+
+    def query_entities(self, query_filter: str, *, parameters: Optional[Mapping[str, Any]] = None,
+                       select: Optional[List[str]] = None, results_per_page: Optional[int] = None, **kwargs) -> MemoryPaged:
+        compiled = compile_filter(query_filter, parameters)
+        return MemoryPaged(lambda: [_entity(stored, select) for stored in self._scan(compiled) if compiled.predicate(stored)],
+                           results_per_page or DEFAULT_PAGE_SIZE)
+
+    def list_entities(self, *, select: Optional[List[str]] = None, results_per_page: Optional[int] = None, **kwargs) -> MemoryPaged:
+        return self.query_entities("", select=select, results_per_page=results_per_page)
+
+    async def create_entity(self, entity: Mapping[str, Any], **kwargs) -> dict:
+        await self._delay()
+        if self._get(entity) is not None:
+            raise ResourceExistsError(f"Entity {entity['PartitionKey']}/{entity['RowKey']} already exists")
+        return self._write(entity)
+
+    async def upsert_entity(self, entity: Mapping[str, Any], mode: UpdateMode = UpdateMode.MERGE, **kwargs) -> dict:
+        await self._delay()
+        return self._write(entity, mode)
+
+    async def update_entity(self, entity: Mapping[str, Any], mode: UpdateMode = UpdateMode.MERGE, *,
+                            etag: Optional[str] = None, match_condition: Optional[MatchConditions] = None, **kwargs) -> dict:
+        await self._delay()
+        stored = self._get(entity)
+        if stored is None:
+            raise ResourceNotFoundError(f"Entity {entity['PartitionKey']}/{entity['RowKey']} not found")
+        if match_condition == MatchConditions.IfNotModified and stored['_etag'] != etag:
+            raise ResourceModifiedError("The update condition specified in the request was not satisfied")
+        return self._write(entity, mode)
+
+    async def delete_entity(self, *args, etag: Optional[str] = None, match_condition: Optional[MatchConditions] = None, **kwargs) -> None:
+        await self._delay()
+        partition_key, row_key = _keys(args, kwargs)
+        stored = self._partitions.get(partition_key, {}).get(row_key)
+        if stored is None:
+            return
+        if match_condition == MatchConditions.IfNotModified and stored['_etag'] != etag:
+            raise ResourceModifiedError("The delete condition specified in the request was not satisfied")
+        self._delete(partition_key, row_key)
+
+    async def submit_transaction(self, operations: Iterable[tuple], **kwargs) -> List[dict]:
+        await self._delay()
+        operations = list(operations)
+
+        # Validate every operation first, a transaction is applied entirely or not at all
+        partition_keys = {entity['PartitionKey'] for _, entity, *_ in operations}
+        if len(partition_keys) > 1:
+            raise _transaction_error(0, TableErrorCode.COMMAND_NOT_SUPPORTED_IN_BATCH, "All the entities of a transaction must share a partition key")
+
+        for index, (kind, entity, *options) in enumerate(operations):
+            options = options[0] if options else {}
+            stored = self._get(entity)
+            if kind == "create" and stored is not None:
+                raise _transaction_error(index, TableErrorCode.ENTITY_ALREADY_EXISTS, "The specified entity already exists.")
+            if kind in ("update", "delete"):
+                if stored is None:
+                    raise _transaction_error(index, TableErrorCode.RESOURCE_NOT_FOUND, "The specified resource does not exist.")
+                if options.get('match_condition') == MatchConditions.IfNotModified and stored['_etag'] != options.get('etag'):
+                    raise _transaction_error(index, TableErrorCode.UPDATE_CONDITION_NOT_SATISFIED,
+                                             "The update condition specified in the request was not satisfied.")
+
+        results = []
+        for kind, entity, *options in operations:
+            options = options[0] if options else {}
+            if kind == "delete":
+                self._delete(entity['PartitionKey'], entity['RowKey'])
+                results.append({})
+            else:
+                results.append(self._write(entity, options.get('mode', UpdateMode.MERGE)))
+        return results
+
+    def _scan(self, compiled) -> Iterable[dict]:
+        # Entities are returned ordered by PartitionKey then RowKey like Table Storage
+        if compiled.candidates is None:
+            plan = dict.fromkeys(self._partitions)
+        else:
+            # Row keys to read per partition, None reads the whole partition
+            plan: Dict[str, Optional[set]] = {}
+            for partition_key, row_key in compiled.candidates:
+                if row_key is None:
+                    plan[partition_key] = None
+                elif plan.get(partition_key, set()) is not None:
+                    plan.setdefault(partition_key, set()).add(row_key)
+
+        for partition_key in sorted(plan):
+            rows = self._partitions.get(partition_key)
+            if not rows:
+                continue
+            row_keys = plan[partition_key]
+            if row_keys is None:
+                for row_key in self._rows(partition_key):
+                    yield rows[row_key]
+            else:
+                for row_key in sorted(row_keys):
+                    if row_key in rows:
+                        yield rows[row_key]
+
+    def _rows(self, partition_key: str) -> List[str]:
+        rows = self._sorted_rows.get(partition_key)
+        if rows is None:
+            rows = self._sorted_rows[partition_key] = sorted(self._partitions[partition_key])
+        return rows
+
+    def _get(self, entity: Mapping[str, Any]) -> Optional[dict]:
+        return self._partitions.get(entity['PartitionKey'], {}).get(entity['RowKey'])
+
+    def _write(self, entity: Mapping[str, Any], mode: UpdateMode = UpdateMode.REPLACE) -> dict:
+        partition_key, row_key = entity['PartitionKey'], entity['RowKey']
+        rows = self._partitions.setdefault(partition_key, {})
+        stored = rows.get(row_key)
+
+        values = dict(stored) if stored is not None and mode == UpdateMode.MERGE else {}
+        values.update((key, value) for key, value in entity.items() if not key.startswith('_'))
+        values['_etag'] = f'W/"datetime\'{next(self._versions)}\'"'
+        values['_timestamp'] = datetime.now(timezone.utc)
+
+        if stored is None:
+            rows[row_key] = values
+            position = self._sorted_rows.get(partition_key)
+            if position is not None:
+                bisect.insort(position, row_key)
+        else:
+            rows[row_key] = values
+        return {"etag": values['_etag']}
+
+    def _delete(self, partition_key: str, row_key: str) -> None:
+        rows = self._partitions.get(partition_key)
+        if rows and rows.pop(row_key, None) is not None:
+            self._sorted_rows.pop(partition_key, None)
+
+    async def _delay(self) -> None:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+def _entity(stored: dict, select: Optional[List[str]] = None) -> TableEntity:
+    if select:
+        entity = TableEntity((key, stored[key]) for key in select if key in stored)
+    else:
+        entity = TableEntity((key, value) for key, value in stored.items() if not key.startswith('_'))
+    entity._metadata = {"etag": stored['_etag'], "timestamp": stored['_timestamp']}
+    return entity
+
+def _keys(args: tuple, kwargs: dict) -> Tuple[str, str]:
+    # delete_entity accepts an entity or the partition and row keys
+    if args and isinstance(args[0], Mapping):
+        return args[0]['PartitionKey'], args[0]['RowKey']
+    if 'entity' in kwargs:
+        return kwargs['entity']['PartitionKey'], kwargs['entity']['RowKey']
+    if len(args) == 2:
+        return args
+    return kwargs['partition_key'], kwargs['row_key']
+
+def _transaction_error(index: int, error_code: TableErrorCode, message: str) -> TableTransactionError:
+    error = TableTransactionError(message=f"{index}:{message}")
+    error.error_code = error_code
+    return error
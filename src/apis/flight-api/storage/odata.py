@@ -0,0 +1,216 @@
+from functools import lru_cache
+from typing import Any, Callable, FrozenSet, List, Mapping, Optional, Set, Tuple
+import operator
+import re
+
+# Subset of the OData filter syntax accepted by Table Storage:
+# comparisons (eq, ne, gt, ge, lt, le) combined with and, or, not and parentheses,
+# string, number and boolean literals and @parameters
+_TOKEN = re.compile(r"\s*(?:(?P<open>\()|(?P<close>\))|'(?P<string>(?:[^']|'')*)'|@(?P<parameter>\w+)"
+                    r"|(?P<number>-?\d+(?:\.\d+)?)|(?P<name>[A-Za-z_]\w*))")
+
+_OPERATORS = {"eq": operator.eq, "ne": operator.ne,
+              "gt": operator.gt, "ge": operator.ge,
+              "lt": operator.lt, "le": operator.le}
+
+_CONSTANTS = {"true": True, "false": False, "null": None}
+
+Predicate = Callable[[Mapping[str, Any]], bool]
+# (PartitionKey, RowKey) an entity must match, None is any value
+Candidate = Tuple[Optional[str], Optional[str]]
+
+class Filter:
+    """Compiled filter, the predicate plus the keys that bound the entities to scan"""
+
+    def __init__(self, predicate: Predicate, candidates: Optional[Set[Candidate]]):
+        self.predicate = predicate
+        # None when the whole table has to be scanned
+        self.candidates = candidates
+
+def compile_filter(query_filter: str, parameters: Optional[Mapping[str, Any]] = None) -> Filter:
+    return _compile(query_filter or "", frozenset((parameters or {}).items()))
+
+@lru_cache(maxsize=256)
+def _compile(query_filter: str, parameters: FrozenSet[Tuple[str, Any]]) -> Filter:
+    if not query_filter.strip():
+        return Filter(lambda entity: True, None)
+
+    parser = _Parser(_tokenize(query_filter), dict(parameters))
+    tree = parser.parse()
+    candidates = _candidates(tree)
+    if candidates is not None and any(partition_key is None for partition_key, _ in candidates):
+        candidates = None
+    return Filter(_predicate(tree), candidates)
+
+def _tokenize(query_filter: str) -> List[Tuple[str, Any]]:
+    tokens = []
+    position = 0
+    while position < len(query_filter):
+        if query_filter[position:].isspace():
+            break
+        match = _TOKEN.match(query_filter, position)
+        if match is None:
+            raise ValueError(f"Invalid filter near '{query_filter[position:]}'")
+        kind = match.lastgroup
+        value = match.group(kind)
+        if kind == "string":
+            value = value.replace("''", "'")
+        elif kind == "number":
+            value = float(value) if "." in value else int(value)
+        tokens.append((kind, value))
+        position = match.end()
+    return tokens
+
+class _Parser:
+
+    def __init__(self, tokens: List[Tuple[str, Any]], parameters: Mapping[str, Any]):
+        self.tokens = tokens
+        self.parameters = parameters
+        self.position = 0
+
+    def parse(self) -> tuple:
+        tree = self._or()
+        if self.position != len(self.tokens):
+            raise ValueError(f"Unexpected token '{self.tokens[self.position][1]}' in filter")
+        return tree
+
+    def _or(self) -> tuple:
+        tree = self._and()
+        while self._keyword("or"):
+            tree = ("or", tree, self._and())
+        return tree
+
+    def _and(self) -> tuple:
+        tree = self._not()
+        while self._keyword("and"):
+            tree = ("and", tree, self._not())
+        return tree
+
+    def _not(self) -> tuple:
+        if self._keyword("not"):
+            return ("not", self._not())
+        return self._primary()
+
+    def _primary(self) -> tuple:
+        if self._peek()[0] == "open":
+            self.position += 1
+            tree = self._or()
+            if self._next()[0] != "close":
+                raise ValueError("Missing closing parenthesis in filter")
+            return tree
+
+        left = self._operand()
+        kind, op = self._next()
+        if kind != "name" or op not in _OPERATORS:
+            raise ValueError(f"Expected a comparison operator, got '{op}'")
+        return ("cmp", op, left, self._operand())
+
+    def _operand(self) -> tuple:
+        kind, value = self._next()
+        if kind in ("string", "number"):
+            return ("const", value)
+        if kind == "parameter":
+            if value not in self.parameters:
+                raise ValueError(f"Missing value for filter parameter @{value}")
+            return ("const", self.parameters[value])
+        if kind == "name":
+            if value in _CONSTANTS:
+                return ("const", _CONSTANTS[value])
+            return ("property", value)
+        raise ValueError(f"Unexpected token '{value}' in filter")
+
+    def _keyword(self, keyword: str) -> bool:
+        kind, value = self._peek()
+        if kind == "name" and value == keyword:
+            self.position += 1
+            return True
+        return False
+
+    def _peek(self) -> Tuple[str, Any]:
+        return self.tokens[self.position] if self.position < len(self.tokens) else ("end", None)
+
+    def _next(self) -> Tuple[str, Any]:
+        token = self._peek()
+        if token[0] == "end":
+            raise ValueError("Unexpected end of filter")
+        self.position += 1
+        return token
+
+def _predicate(tree: tuple) -> Predicate:
+    kind = tree[0]
+    if kind == "or":
+        left, right = _predicate(tree[1]), _predicate(tree[2])
+        return lambda entity: left(entity) or right(entity)
+    if kind == "and":
+        left, right = _predicate(tree[1]), _predicate(tree[2])
+        return lambda entity: left(entity) and right(entity)
+    if kind == "not":
+        inner = _predicate(tree[1])
+        return lambda entity: not inner(entity)
+
+    compare = _OPERATORS[tree[1]]
+    left, right = _value(tree[2]), _value(tree[3])
+
+    def matches(entity: Mapping[str, Any]) -> bool:
+        a, b = left(entity), right(entity)
+        # A missing property or values that cannot be compared never match
+        if a is _MISSING or b is _MISSING or (a is None) != (b is None):
+            return False
+        try:
+            return compare(a, b)
+        except TypeError:
+            return False
+    return matches
+
+_MISSING = object()
+
+def _value(operand: tuple) -> Callable[[Mapping[str, Any]], Any]:
+    if operand[0] == "const":
+        value = operand[1]
+        return lambda entity: value
+    name = operand[1]
+    return lambda entity: entity.get(name, _MISSING)
+
+def _candidates(tree: tuple) -> Optional[Set[Candidate]]:
+    kind = tree[0]
+    if kind == "cmp":
+        _, op, left, right = tree
+        if op == "eq":
+            if left[0] == "const":
+                left, right = right, left
+            if left[0] == "property" and right[0] == "const":
+                if left[1] == "PartitionKey":
+                    return {(right[1], None)}
+                if left[1] == "RowKey":
+                    return {(None, right[1])}
+        return None
+
+    if kind == "or":
+        left, right = _candidates(tree[1]), _candidates(tree[2])
+        if left is None or right is None:
+            return None
+        return left | right
+
+    if kind == "and":
+        left, right = _candidates(tree[1]), _candidates(tree[2])
+        if left is None or right is None:
+            return left if right is None else right
+        merged = set()
+        for a in left:
+            for b in right:
+                partition_key = _merge(a[0], b[0])
+                row_key = _merge(a[1], b[1])
+                if partition_key is not _CONFLICT and row_key is not _CONFLICT:
+                    merged.add((partition_key, row_key))
+        return merged
+
+    return None
+
+_CONFLICT = object()
+
+def _merge(a: Optional[str], b: Optional[str]) -> Any:
+    if a is None:
+        return b
+    if b is None or a == b:
+        return a
+    return _CONFLICT
@@ -0,0 +1,53 @@
+from typing import Any, AsyncIterator, Callable, List, Optional
+
+class MemoryPaged:
+    """Stand-in for AsyncItemPaged over results computed when the iteration starts.
+
+    The continuation token is the offset of the next page, like the SDK pagers it is
+    only meaningful for the same query.
+    """
+
+    def __init__(self, fetch: Callable[[], List[Any]], page_size: Optional[int]):
+        self._fetch = fetch
+        self._page_size = page_size
+
+    def __aiter__(self) -> AsyncIterator:
+        return self._items()
+
+    async def _items(self) -> AsyncIterator:
+        async for page in self.by_page():
+            async for item in page:
+                yield item
+
+    def by_page(self, continuation_token: Optional[str] = None) -> "MemoryPageIterator":
+        return MemoryPageIterator(self._fetch, self._page_size, int(continuation_token or 0))
+
+class MemoryPageIterator:
+
+    def __init__(self, fetch: Callable[[], List[Any]], page_size: Optional[int], offset: int):
+        self._fetch = fetch
+        self._page_size = page_size
+        self._offset = offset
+        self._results: Optional[List[Any]] = None
+        self._done = False
+        self.continuation_token: Optional[str] = str(offset) if offset else None
+
+    def __aiter__(self) -> "MemoryPageIterator":
+        return self
+
+    async def __anext__(self) -> AsyncIterator:
+        if self._done:
+            raise StopAsyncIteration
+        if self._results is None:
+            self._results = self._fetch()
+
+        end = len(self._results) if not self._page_size else self._offset + self._page_size
+        page = self._results[self._offset:end]
+        self._offset = end
+        self.continuation_token = str(end) if end < len(self._results) else None
+        self._done = self.continuation_token is None
+        return _page(page)
+
+async def _page(items: List[Any]) -> AsyncIterator:
+    for item in items:
+        yield item
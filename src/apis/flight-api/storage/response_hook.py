@@ -0,0 +1,12 @@
+from azure.core.async_paging import AsyncItemPaged
+from typing import Any
+
+def is_pager(result: Any) -> bool:
+    """True for the call azure-cosmos 4.9 makes to the response_hook of query_items and
+    query_items_change_feed when the pager is created.
+
+    That call passes the pager with the last_response_headers of the client, which
+    belong to whatever request ran last. The calls made for each page fetched pass the
+    body of the page with the headers of its own response.
+    """
+    return isinstance(result, AsyncItemPaged)
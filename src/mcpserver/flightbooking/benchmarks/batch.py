@@ -0,0 +1,74 @@
+# One batched tool call against the same lookups made one tool call at a time.
+#
+#   python -m benchmarks.batch --flights 10000 --latency 0.05 --rounds 20
+#
+# For every round the countries, then (country, airport) pairs, are looked up with
+# sequential get_flight_by_country / get_flights_by_airport calls, the way an agent
+# calls them one turn after the other, and with one get_flights_by_countries /
+# get_flights_by_airports call. The response cache is disabled so every lookup
+# reaches the fake API. The payload is the text returned to the model.
+
+from benchmarks.upstream import AIRPORTS, generate_flights, start, bound_url
+from typing import Dict, List
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import time
+
+def _text(result) -> int:
+    content = result[0] if isinstance(result, tuple) else result
+    return sum(len(block.text.encode()) for block in content)
+
+async def _measure(calls: List[tuple], mcp) -> Dict[str, float]:
+    started = time.perf_counter()
+    size = 0
+    for tool, arguments in calls:
+        size += _text(await mcp.call_tool(tool, arguments))
+    return {"seconds": time.perf_counter() - started, "bytes": size}
+
+def _report(name: str, results: List[Dict[str, float]]) -> None:
+    print(f"  {name:<34} mean={statistics.fmean(r['seconds'] for r in results) * 1e3:9.1f}ms "
+          f"payload={statistics.fmean(r['bytes'] for r in results) / 1024:9.1f}KB")
+
+async def run(args) -> None:
+    runner = await start(generate_flights(args.flights, args.seed), args.latency)
+    try:
+        os.environ["FLIGHT_BOOKING_URL"] = bound_url(runner)
+        os.environ["RESPONSE_CACHE_TTL_SECONDS"] = "0"
+        # Imported late, the services read the upstream url from the environment
+        from main import mcp, http_client
+
+        rng = random.Random(args.seed)
+        fields = ["flightCode", "fromAirport", "toAirport", "price", "departureTime"]
+        scenarios = {}
+        for _ in range(args.rounds):
+            countries = rng.sample(list(AIRPORTS), args.countries)
+            airports = [{"country": country, "airport_code": rng.choice(AIRPORTS[country])[0]}
+                        for country in rng.sample(list(AIRPORTS), args.countries)]
+            plans = {
+                f"{args.countries} x get_flight_by_country": [("get_flight_by_country", {"country": country}) for country in countries],
+                "get_flights_by_countries": [("get_flights_by_countries", {"countries": countries, "fields": fields, "limit": args.limit})],
+                f"{args.countries} x get_flights_by_airport": [("get_flights_by_airport", airport) for airport in airports],
+                "get_flights_by_airports": [("get_flights_by_airports", {"airports": airports, "fields": fields, "limit": args.limit})]
+            }
+            for name, calls in plans.items():
+                scenarios.setdefault(name, []).append(await _measure(calls, mcp))
+
+        print(f"flights={args.flights} latency={args.latency * 1e3:.0f}ms rounds={args.rounds} limit={args.limit}")
+        for name, results in scenarios.items():
+            _report(name, results)
+        await http_client.close()
+    finally:
+        await runner.cleanup()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Batched against sequential flight lookups through the MCP tools")
+    parser.add_argument("--flights", type=int, default=10000)
+    parser.add_argument("--countries", type=int, default=4, help="Keys per batch, at most the 5 countries of the fake API")
+    parser.add_argument("--latency", type=float, default=0.05, help="Delay added by the fake API to every response, in seconds")
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--limit", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=42)
+    asyncio.run(run(parser.parse_args()))
@@ -0,0 +1,113 @@
+# Tool calls against a fake flight API injecting errors and slow answers, with and without
+# the retries, hedged requests and circuit breaker of the HttpClient.
+#
+#   python -m benchmarks.resilience --calls 400 --concurrency 8 --latency 0.01
+#
+# Every scenario sets the faults of the fake API and the settings of the shared
+# HttpClient, then calls get_flights_by_airport through FastMCP.call_tool with the
+# response cache disabled. The report gives the share of successful calls, the
+# latency percentiles and what the client did: upstream requests, retries, hedges
+# and calls refused by the open circuit.
+
+from benchmarks.upstream import AIRPORTS, Faults, generate_flights, start, bound_url
+from benchmarks.report import summarize
+from typing import List
+import argparse
+import asyncio
+import os
+import random
+import time
+
+# name: faults of the fake API, settings of the client
+SCENARIOS = {
+    "healthy": ({}, {}),
+    "20% errors, no retry": ({"error_rate": 0.2}, {"retries": 0}),
+    "20% errors, 2 retries": ({"error_rate": 0.2}, {"retries": 2}),
+    "5% slow 1s, no hedge": ({"slow_rate": 0.05, "slow_latency": 1.0}, {"hedge_delay": 0}),
+    "5% slow 1s, hedge after 50ms": ({"slow_rate": 0.05, "slow_latency": 1.0}, {"hedge_delay": 0.05}),
+    "slow 3s, timeout 0.5s deadline 1s": ({"slow_rate": 1.0, "slow_latency": 3.0}, {"timeout": 0.5, "deadline": 1.0}),
+    "outage, no circuit breaker": ({"error_rate": 1.0}, {"failure_threshold": 0}),
+    "outage, circuit breaker": ({"error_rate": 1.0}, {"failure_threshold": 5})
+}
+
+DEFAULTS = {"retries": 2, "hedge_delay": 0, "timeout": 10, "deadline": 30, "failure_threshold": 5}
+
+async def run_scenario(mcp, http_client, faults: Faults, fault_settings: dict, client_settings: dict,
+                       calls: int, concurrency: int, seed: int) -> dict:
+    from services import CircuitBreaker
+
+    for name, value in {"error_rate": 0.0, "slow_rate": 0.0, "slow_latency": 0.0, **fault_settings}.items():
+        setattr(faults, name, value)
+    settings = {**DEFAULTS, **client_settings}
+    http_client.retries = settings["retries"]
+    http_client.hedge_delay = settings["hedge_delay"]
+    http_client.deadline = settings["deadline"]
+    if http_client.timeout != settings["timeout"]:
+        # The timeout belongs to the session
+        http_client.timeout = settings["timeout"]
+        await http_client.close()
+    http_client.circuit = CircuitBreaker(settings["failure_threshold"], 30)
+    before = dict(http_client.stats["resilience"], requests=http_client.requests)
+
+    rng = random.Random(seed)
+    plan = []
+    for _ in range(calls):
+        country = rng.choice(list(AIRPORTS))
+        plan.append({"country": country, "airport_code": rng.choice(AIRPORTS[country])[0], "max_tokens": 500})
+    queue = iter(plan)
+    samples: List[float] = []
+    errors = 0
+
+    async def worker() -> None:
+        nonlocal errors
+        for arguments in queue:
+            started = time.perf_counter()
+            try:
+                await mcp.call_tool("get_flights_by_airport", arguments)
+            except Exception:
+                errors += 1
+            samples.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    elapsed = time.perf_counter() - started
+
+    after = http_client.stats["resilience"]
+    return {
+        "success": round(100 * (calls - errors) / calls, 1),
+        "latency": summarize(samples, elapsed),
+        "requests": http_client.requests - before["requests"],
+        "retried": after["retried"] - before["retried"],
+        "hedges": after["hedges"] - before["hedges"],
+        "rejected": after["circuit"]["rejected"]
+    }
+
+async def run(args) -> None:
+    faults = Faults(seed=args.seed)
+    runner = await start(generate_flights(args.flights, args.seed), args.latency, faults=faults)
+    try:
+        os.environ["FLIGHT_BOOKING_URL"] = bound_url(runner)
+        os.environ["RESPONSE_CACHE_TTL_SECONDS"] = "0"
+        # Imported late, the services read the upstream url from the environment
+        from main import mcp, http_client
+
+        print(f"flights={args.flights} calls={args.calls} concurrency={args.concurrency} latency={args.latency * 1e3:.0f}ms")
+        print(f"  {'scenario':<36}{'success%':>9}{'p50 ms':>9}{'p99 ms':>9}{'max ms':>9}{'requests':>10}{'retried':>9}{'hedges':>8}{'refused':>9}")
+        for name, (fault_settings, client_settings) in SCENARIOS.items():
+            result = await run_scenario(mcp, http_client, faults, fault_settings, client_settings,
+                                        args.calls, args.concurrency, args.seed)
+            latency = result["latency"]
+            print(f"  {name:<36}{result['success']:>9}{latency['p50_ms']:>9.1f}{latency['p99_ms']:>9.1f}{latency['max_ms']:>9.1f}"
+                  f"{result['requests']:>10}{result['retried']:>9}{result['hedges']:>8}{result['rejected']:>9}")
+        await http_client.close()
+    finally:
+        await runner.cleanup()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="MCP tools against a fake flight API injecting errors and latency")
+    parser.add_argument("--flights", type=int, default=10000)
+    parser.add_argument("--calls", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=0.01, help="Delay added by the fake API to every response, in seconds")
+    parser.add_argument("--seed", type=int, default=42)
+    asyncio.run(run(parser.parse_args()))
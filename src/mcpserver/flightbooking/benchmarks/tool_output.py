@@ -0,0 +1,73 @@
+# Size of the flight lists returned to the model, full Flight models against paged compact pages.
+#
+#   python -m benchmarks.tool_output --flights 10000 100000 --max-tokens 4000
+#
+# For each schedule size the flights of every country are read once with
+# get_flight_by_country. The full output is the text FastMCP writes for the list
+# of Flight models the tool returned before the pages, one JSON document with an
+# indent of 2 per flight. The pages are measured in the table and json formats,
+# first page only and every page through next_cursor. Tokens are estimated at
+# 4 characters per token.
+
+from benchmarks.upstream import AIRPORTS, generate_flights, start, bound_url
+from typing import Dict, List
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+def _text(result) -> str:
+    content = result[0] if isinstance(result, tuple) else result
+    return "".join(block.text for block in content)
+
+async def _pages(mcp, arguments: dict) -> List[dict]:
+    pages = []
+    cursor = None
+    while True:
+        result = await mcp.call_tool("get_flight_by_country", dict(arguments, cursor=cursor) if cursor else arguments)
+        pages.append({"text": _text(result), "page": result[1]})
+        cursor = result[1].get("next_cursor")
+        if cursor is None:
+            return pages
+
+async def run(flights: int, max_tokens: int, seed: int) -> None:
+    runner = await start(generate_flights(flights, seed))
+    try:
+        os.environ["FLIGHT_BOOKING_URL"] = bound_url(runner)
+        os.environ["TOOL_OUTPUT_MAX_TOKENS"] = str(max_tokens)
+        # Imported late, the services read the upstream url and the budget from the environment
+        from main import mcp, http_client, flight_service
+        from services.response_shaper import estimate_tokens
+        import pydantic_core
+
+        rows: Dict[str, List[float]] = {}
+        for country in AIRPORTS:
+            models = await flight_service.get_flight_by_country(country)
+            full = "".join(pydantic_core.to_json(flight, indent=2).decode() for flight in models)
+            rows.setdefault("full List[Flight]", []).append(estimate_tokens(full))
+            for format in ("table", "json"):
+                started = time.perf_counter()
+                pages = await _pages(mcp, {"country": country, "format": format})
+                elapsed = time.perf_counter() - started
+                rows.setdefault(f"{format} first page", []).append(estimate_tokens(pages[0]["text"]))
+                rows.setdefault(f"{format} all pages", []).append(sum(estimate_tokens(page["text"]) for page in pages))
+                rows.setdefault(f"{format} pages", []).append(len(pages))
+                rows.setdefault(f"{format} rows per page", []).append(statistics.fmean(page["page"]["count"] for page in pages))
+                rows.setdefault(f"{format} ms for all pages", []).append(elapsed * 1e3)
+
+        print(f"flights={flights} max_tokens={max_tokens}, mean over {len(AIRPORTS)} countries")
+        for name, values in rows.items():
+            print(f"  {name:<40}{statistics.fmean(values):>12.0f}")
+        await http_client.close()
+    finally:
+        await runner.cleanup()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Tokens returned by get_flight_by_country, full models against compact pages")
+    parser.add_argument("--flights", type=int, nargs="+", default=[10000])
+    parser.add_argument("--max-tokens", type=int, default=4000)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    for flights in args.flights:
+        asyncio.run(run(flights, args.max_tokens, args.seed))
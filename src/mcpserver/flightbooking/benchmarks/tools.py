@@ -0,0 +1,147 @@
+# Calls the MCP tools concurrently against the fake flight API and reports their latency.
+#
+#   python -m benchmarks.tools --flights 1000 10000 100000 --calls 2000 --concurrency 16
+#   python -m benchmarks.tools --flights 1000 10000 --save-baseline benchmarks/baseline.json
+#   python -m benchmarks.tools --flights 1000 10000 --baseline benchmarks/baseline.json
+#
+# Every schedule size runs twice, with the response cache enabled and disabled, each
+# in its own process. The tools are invoked through FastMCP.call_tool, so the numbers
+# include argument validation, the upstream call and the serialization of the result.
+
+from benchmarks.upstream import AIRPORTS, generate_flights, start, bound_url
+from benchmarks.report import summarize, peak_rss_mb, print_table, load_baseline, save_baseline, compare
+from collections import defaultdict
+from typing import Dict, List
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+# Share of each tool in the workload
+WORKLOAD = {
+    "get_airports": 15,
+    "get_flight_by_country": 15,
+    "get_flights_by_airport": 70
+}
+
+def _arguments(tool: str, rng: random.Random) -> dict:
+    country = rng.choice(list(AIRPORTS))
+    if tool == "get_flight_by_country":
+        return {"country": country}
+    if tool == "get_flights_by_airport":
+        return {"country": country, "airport_code": rng.choice(AIRPORTS[country])[0]}
+    return {}
+
+async def run_scenario(flights: int, calls: int, concurrency: int, latency: float, seed: int) -> dict:
+    runner = await start(generate_flights(flights, seed), latency)
+    try:
+        # Imported late, the services read the upstream url from the environment
+        os.environ["FLIGHT_BOOKING_URL"] = bound_url(runner)
+        from main import mcp, http_client
+
+        rng = random.Random(seed)
+        plan = [(tool, _arguments(tool, rng)) for tool in rng.choices(list(WORKLOAD), weights=list(WORKLOAD.values()), k=calls)]
+        queue = iter(plan)
+        samples: Dict[str, List[float]] = defaultdict(list)
+        errors: Dict[str, int] = defaultdict(int)
+
+        async def worker() -> None:
+            for tool, arguments in queue:
+                started = time.perf_counter()
+                try:
+                    await mcp.call_tool(tool, arguments)
+                except Exception:
+                    errors[tool] += 1
+                samples[tool].append(time.perf_counter() - started)
+
+        start_time = time.perf_counter()
+        await asyncio.gather(*[worker() for _ in range(concurrency)])
+        elapsed = time.perf_counter() - start_time
+        stats = http_client.stats
+        await http_client.close()
+    finally:
+        await runner.cleanup()
+
+    all_samples = [sample for values in samples.values() for sample in values]
+    return {
+        "flights": flights,
+        "calls": calls,
+        "concurrency": concurrency,
+        "cache_ttl": http_client.cache.ttl,
+        "elapsed_s": round(elapsed, 2),
+        "errors": sum(errors.values()),
+        "upstream_requests": stats["requests"],
+        "cache_hits": stats["cache"]["hits"],
+        "peak_rss_mb": peak_rss_mb(),
+        "total": summarize(all_samples, elapsed),
+        "operations": {tool: summarize(samples[tool], elapsed) for tool in WORKLOAD}
+    }
+
+def _run_isolated(args, flights: int, cache: bool) -> dict:
+    with tempfile.NamedTemporaryFile(suffix=".json", delete=False) as f:
+        output = f.name
+    try:
+        environment = dict(os.environ)
+        if not cache:
+            environment["RESPONSE_CACHE_TTL_SECONDS"] = "0"
+        subprocess.run([sys.executable, "-m", "benchmarks.tools",
+                        "--flights", str(flights),
+                        "--calls", str(args.calls),
+                        "--concurrency", str(args.concurrency),
+                        "--latency", str(args.latency),
+                        "--seed", str(args.seed),
+                        "--output", output], check=True, env=environment, stdout=subprocess.DEVNULL)
+        with open(output, "r", encoding="utf-8") as f:
+            return json.load(f)
+    finally:
+        os.remove(output)
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark of the MCP tools against a fake flight API")
+    parser.add_argument("--flights", type=int, nargs="+", default=[1000, 10000], help="Schedule sizes, e.g. 1000 100000 1000000")
+    parser.add_argument("--calls", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--latency", type=float, default=0.0, help="Delay added by the fake API to every response, in seconds")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--baseline", help="Compare with a baseline JSON file, exits with 1 on regression")
+    parser.add_argument("--save-baseline", help="Write the results to this baseline JSON file")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed regression ratio against the baseline")
+    parser.add_argument("--output", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.output:
+        # Child process of a scenario
+        save_baseline(args.output, asyncio.run(run_scenario(args.flights[0], args.calls, args.concurrency, args.latency, args.seed)))
+        return
+
+    results = {}
+    for flights in args.flights:
+        for cache in (True, False):
+            result = _run_isolated(args, flights, cache)
+            scenario = f"flights_{flights}_{'cache' if cache else 'no_cache'}"
+            results[scenario] = result
+
+            print(f"{scenario} calls={result['calls']} concurrency={result['concurrency']} elapsed={result['elapsed_s']}s "
+                  f"errors={result['errors']} upstream_requests={result['upstream_requests']} peak_rss={result['peak_rss_mb']}MB")
+            print_table(f"  throughput={result['total']['throughput']} calls/s p50={result['total']['p50_ms']}ms "
+                        f"p95={result['total']['p95_ms']}ms p99={result['total']['p99_ms']}ms", result["operations"])
+
+    if args.save_baseline:
+        save_baseline(args.save_baseline, results)
+        print(f"Baseline saved to {args.save_baseline}")
+
+    if args.baseline:
+        regressions = compare(load_baseline(args.baseline), results, args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+        print("No regression against the baseline")
+
+if __name__ == "__main__":
+    main()
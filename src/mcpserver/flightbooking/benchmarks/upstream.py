@@ -0,0 +1,148 @@
+# Fake flight API serving a synthetic schedule, the local stand-in of the upstream for the benchmarks.
+#
+#   python -m benchmarks.upstream --flights 100000 --port 8001 --latency 0.005
+#   python -m benchmarks.upstream --error-rate 0.1 --slow-rate 0.05 --slow-latency 2
+#
+# Then start the MCP server with FLIGHT_BOOKING_URL=http://localhost:8001 to try the
+# tools without the real API. The responses use the JSON shape of the flight API.
+# --error-rate answers that share of the reads with a 503 and --slow-rate delays
+# that share by --slow-latency, to exercise the timeouts, retries and circuit breaker.
+
+from aiohttp import web
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+import argparse
+import asyncio
+import json
+import random
+
+AIRPORTS = {
+    "Canada": [("YUL", "Montreal-Trudeau"), ("YYZ", "Toronto Pearson"), ("YVR", "Vancouver"), ("YYC", "Calgary")],
+    "USA": [("JFK", "John F. Kennedy"), ("LAX", "Los Angeles"), ("ORD", "Chicago O'Hare"), ("MIA", "Miami")],
+    "Mexico": [("MEX", "Mexico City"), ("CUN", "Cancun"), ("GDL", "Guadalajara"), ("MTY", "Monterrey")],
+    "France": [("CDG", "Paris Charles de Gaulle"), ("NCE", "Nice Cote d'Azur"), ("LYS", "Lyon"), ("MRS", "Marseille")],
+    "Italy": [("FCO", "Rome Fiumicino"), ("MXP", "Milan Malpensa"), ("VCE", "Venice"), ("NAP", "Naples")]
+}
+
+AIRLINES = ["Air Canada", "WestJet", "Delta", "United", "Aeromexico", "Air France", "ITA Airways", "Contoso Air"]
+
+def generate_flights(count: int, seed: int = 42) -> List[Dict]:
+    """`count` flights as returned by the flight API, deterministic for a given seed"""
+    rng = random.Random(seed)
+    codes = [code for airports in AIRPORTS.values() for code, _ in airports]
+    start = datetime(2024, 7, 1, tzinfo=timezone.utc)
+
+    flights = []
+    for i in range(count):
+        country = rng.choice(list(AIRPORTS))
+        from_airport = rng.choice(codes)
+        to_airport = rng.choice(AIRPORTS[country])[0]
+        minutes = rng.randrange(60, 14 * 60, 5)
+        departure = start + timedelta(minutes=rng.randrange(0, 60 * 24 * 60, 5))
+        airline = rng.choice(AIRLINES)
+        flights.append({
+            "country": country,
+            "flight_code": f"{airline.split()[0]}{i:07d}",
+            "airline": airline,
+            "from_airport": from_airport,
+            "to_airport": to_airport,
+            "price": rng.randrange(80, 2500),
+            "seats_available": rng.randrange(0, 300),
+            "duration": f"{minutes // 60}h {minutes % 60}m",
+            "direct_flight": rng.random() < 0.7,
+            "departure_time": departure.strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "arrival_time": (departure + timedelta(minutes=minutes)).strftime("%Y-%m-%dT%H:%M:%SZ")
+        })
+    return flights
+
+class Faults:
+    """Failures injected in the reads, changed while the server runs by the benchmarks"""
+
+    def __init__(self, error_rate: float = 0.0, slow_rate: float = 0.0, slow_latency: float = 0.0, seed: int = 42):
+        self.error_rate = error_rate
+        self.slow_rate = slow_rate
+        self.slow_latency = slow_latency
+        self.rng = random.Random(seed)
+
+def create_app(flights: List[Dict], latency: float = 0.0, faults: Optional[Faults] = None) -> web.Application:
+    # Responses are serialized once, the fake must stay cheap next to the code measured
+    by_country = defaultdict(list)
+    by_destination = defaultdict(list)
+    for flight in flights:
+        by_country[flight["country"]].append(flight)
+        by_destination[(flight["country"], flight["to_airport"])].append(flight)
+
+    airports = json.dumps([{"country": country, "airport_code": code, "airport_name": name}
+                           for country, codes in AIRPORTS.items() for code, name in codes]).encode()
+    countries = {country: json.dumps(values).encode() for country, values in by_country.items()}
+    destinations = {key: json.dumps(values).encode() for key, values in by_destination.items()}
+
+    faults = faults or Faults()
+
+    async def respond(body: bytes) -> web.Response:
+        delay = latency
+        if faults.slow_rate and faults.rng.random() < faults.slow_rate:
+            delay += faults.slow_latency
+        if delay:
+            await asyncio.sleep(delay)
+        if faults.error_rate and faults.rng.random() < faults.error_rate:
+            return web.json_response({"detail": "Service Unavailable"}, status=503)
+        return web.Response(body=body, content_type="application/json")
+
+    async def get_airports(request: web.Request) -> web.Response:
+        return await respond(airports)
+
+    async def get_country(request: web.Request) -> web.Response:
+        return await respond(countries.get(request.match_info["country"], b"[]"))
+
+    async def get_destination(request: web.Request) -> web.Response:
+        return await respond(destinations.get((request.match_info["country"], request.match_info["airport_code"]), b"[]"))
+
+    async def book(request: web.Request) -> web.Response:
+        if latency:
+            await asyncio.sleep(latency)
+        return web.json_response({"message": "Flight booked"}, status=202)
+
+    async def cancel(request: web.Request) -> web.Response:
+        if latency:
+            await asyncio.sleep(latency)
+        return web.Response(status=204)
+
+    app = web.Application()
+    app.router.add_get("/api/airport/", get_airports)
+    app.router.add_get("/api/flight/country/{country}/", get_country)
+    app.router.add_get("/api/flight/country/{country}", get_country)
+    app.router.add_get("/api/flight/{country}/{airport_code}", get_destination)
+    app.router.add_post("/api/flight/", book)
+    app.router.add_delete("/api/flight/", cancel)
+    return app
+
+async def start(flights: List[Dict], latency: float = 0.0, host: str = "127.0.0.1", port: int = 0,
+                faults: Optional[Faults] = None) -> web.AppRunner:
+    """Serve the fake API in the running event loop, port 0 picks a free port"""
+    runner = web.AppRunner(create_app(flights, latency, faults), access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    return runner
+
+def bound_url(runner: web.AppRunner) -> str:
+    host, port = runner.addresses[0][:2]
+    return f"http://{host}:{port}"
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Fake flight API serving a synthetic schedule")
+    parser.add_argument("--flights", type=int, default=1000)
+    parser.add_argument("--latency", type=float, default=0.0, help="Delay added to every response, in seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of the reads answered with a 503")
+    parser.add_argument("--slow-rate", type=float, default=0.0, help="Share of the reads delayed by --slow-latency")
+    parser.add_argument("--slow-latency", type=float, default=0.0, help="Extra delay of the slow reads, in seconds")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    args = parser.parse_args()
+
+    faults = Faults(args.error_rate, args.slow_rate, args.slow_latency)
+    web.run_app(create_app(generate_flights(args.flights), args.latency, faults), host=args.host, port=args.port)
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,5 @@
 from dotenv import load_dotenv
+from typing import List
 import os
 
 class Config:
@@ -13,4 +14,77 @@ class Config:
     @property
     def is_development(self) -> bool:
         value = os.getenv('IS_DEVELOPMENT', 'false').lower()
-        return value in ['true', '1', 'yes']        
\ No newline at end of file
+        return value in ['true', '1', 'yes']
+
+    @property
+    def http_pool_limit(self) -> int:
+        return int(os.getenv('HTTP_POOL_LIMIT', '100'))
+
+    @property
+    def http_pool_limit_per_host(self) -> int:
+        return int(os.getenv('HTTP_POOL_LIMIT_PER_HOST', '20'))
+
+    @property
+    def http_keepalive_timeout(self) -> float:
+        return float(os.getenv('HTTP_KEEPALIVE_TIMEOUT_SECONDS', '30'))
+
+    @property
+    def response_cache_ttl(self) -> float:
+        return float(os.getenv('RESPONSE_CACHE_TTL_SECONDS', '30'))
+
+    @property
+    def response_cache_max_entries(self) -> int:
+        return int(os.getenv('RESPONSE_CACHE_MAX_ENTRIES', '256'))
+
+    @property
+    def batch_concurrency(self) -> int:
+        return int(os.getenv('BATCH_CONCURRENCY', '8'))
+
+    @property
+    def batch_max_keys(self) -> int:
+        return int(os.getenv('BATCH_MAX_KEYS', '20'))
+
+    @property
+    def tool_output_max_tokens(self) -> int:
+        return int(os.getenv('TOOL_OUTPUT_MAX_TOKENS', '4000'))
+
+    @property
+    def tool_output_page_size(self) -> int:
+        return int(os.getenv('TOOL_OUTPUT_PAGE_SIZE', '100'))
+
+    @property
+    def tool_output_format(self) -> str:
+        return os.getenv('TOOL_OUTPUT_FORMAT', 'table')
+
+    @property
+    def tool_output_fields(self) -> List[str]:
+        fields = os.getenv('TOOL_OUTPUT_FIELDS', 'country,flightCode,airline,fromAirport,toAirport,departureTime,duration,price,seatsAvailable')
+        return [field.strip() for field in fields.split(',') if field.strip()]
+
+    @property
+    def http_timeout(self) -> float:
+        return float(os.getenv('HTTP_TIMEOUT_SECONDS', '10'))
+
+    @property
+    def http_deadline(self) -> float:
+        return float(os.getenv('HTTP_DEADLINE_SECONDS', '30'))
+
+    @property
+    def http_retries(self) -> int:
+        return int(os.getenv('HTTP_RETRIES', '2'))
+
+    @property
+    def http_retry_backoff(self) -> float:
+        return float(os.getenv('HTTP_RETRY_BACKOFF_SECONDS', '0.1'))
+
+    @property
+    def http_hedge_delay(self) -> float:
+        return float(os.getenv('HTTP_HEDGE_DELAY_SECONDS', '0'))
+
+    @property
+    def circuit_failure_threshold(self) -> int:
+        return int(os.getenv('CIRCUIT_FAILURE_THRESHOLD', '5'))
+
+    @property
+    def circuit_reset_timeout(self) -> float:
+        return float(os.getenv('CIRCUIT_RESET_SECONDS', '30'))
\ No newline at end of file
@@ -1,43 +1,127 @@
 from mcp.server.fastmcp import FastMCP
-from services import AirportService, FlightService
+from services import AirportService, FlightService, ResponseShaper, get_http_client
+from contextlib import asynccontextmanager
+from starlette.applications import Starlette
 from config import Config
-from typing import List
-from models import Airport, Flight
+from typing import List, Optional
+from models import Airport, AirportKey, FlightPage, Itinerary
 from tools import register_all_tools
+import uvicorn
+import json
 
 # Create an MCP server
 mcp = FastMCP("Flight Booking")
 
 config = Config()
 
-# Declare services
+# Declare services, they all share the same pooled http client
+http_client = get_http_client()
 #airport_service = AirportService()
-flight_service = FlightService()
+flight_service = FlightService(http_client)
+
+# Flight lists are paged and encoded to fit in the context of the model
+response_shaper = ResponseShaper(config.tool_output_max_tokens, config.tool_output_page_size,
+                                 config.tool_output_format, config.tool_output_fields)
 
 register_all_tools(mcp)
 
-@mcp.tool(description="Get the list of flights for a specific country")
-async def get_flight_by_country(country:str) -> List[Flight]:
+@mcp.tool(description="Get the list of flights for a specific country, one page at a time")
+async def get_flight_by_country(country:str, fields:Optional[List[str]] = None, format:Optional[str] = None,
+                                cursor:Optional[str] = None, max_tokens:Optional[int] = None) -> FlightPage:
     """Get the list of flights for a specific country
        Args:
         country: country, can be Canada, USA, Mexico and France only.
-    """
-    return await flight_service.get_flight_by_country(country)
+        fields: flight fields to return like flightCode, price, departureTime, a compact default set when empty
+        format: table (default) for a CSV text with a header line, json for a list of objects
+        cursor: next_cursor of the previous page, with the same other arguments
+        max_tokens: size limit of the answer, a longer page is cut with a summary and a next_cursor"""
+    flights = await flight_service.get_flight_by_country(country)
+    return response_shaper.page("get_flight_by_country", flights, {"country": country, "fields": fields, "format": format},
+                                fields, format, cursor, max_tokens)
 
 # @mcp.tool(description="Get the list of flights for airports, origin and destination")
 # async def get_airports() -> List[Airport]:
 #     """Get the list of airports flight available"""
 #     return await airport_service.get_airports()
 
-@mcp.tool(description="Get the list of flights for a specific airport")
-async def get_flights_by_airport(country:str, airport_code:str) -> List[Flight]:    
+@mcp.tool(description="Get the list of flights for a specific airport, one page at a time")
+async def get_flights_by_airport(country:str, airport_code:str, fields:Optional[List[str]] = None, format:Optional[str] = None,
+                                 cursor:Optional[str] = None, max_tokens:Optional[int] = None) -> FlightPage:
     """
     Get the list of flights available in a country for a specific airport (airport_code) available"
     Args:
         country: country, can be Canada, USA, Mexico and France only.
         airport_code: the airport code of one of those country like YUL, NCE, FCO etc.
-    """    
-    return await flight_service.get_flight(country,airport_code)
+        fields: flight fields to return like flightCode, price, departureTime, a compact default set when empty
+        format: table (default) for a CSV text with a header line, json for a list of objects
+        cursor: next_cursor of the previous page, with the same other arguments
+        max_tokens: size limit of the answer, a longer page is cut with a summary and a next_cursor"""
+    flights = await flight_service.get_flight(country,airport_code)
+    return response_shaper.page("get_flights_by_airport", flights,
+                                {"country": country, "airport_code": airport_code, "fields": fields, "format": format},
+                                fields, format, cursor, max_tokens)
+
+@mcp.tool(description="Get the flights of many countries in one call, merged, sorted and paged")
+async def get_flights_by_countries(countries:List[str], sort:str = "price", descending:bool = False, limit:int = 50,
+                                   fields:Optional[List[str]] = None, format:Optional[str] = None,
+                                   cursor:Optional[str] = None, max_tokens:Optional[int] = None) -> FlightPage:
+    """
+    Get the flights of several countries at once instead of calling get_flight_by_country for each one
+    Args:
+        countries: countries to look up, can be Canada, USA, Mexico and France only.
+        sort: price, duration, departureTime, arrivalTime or seatsAvailable
+        descending: sort from the highest value
+        limit: maximum number of flights over all the pages, total gives the number of flights found
+        fields: flight fields to return like flightCode, price, departureTime, a compact default set when empty
+        format: table (default) for a CSV text with a header line, json for a list of objects
+        cursor: next_cursor of the previous page, with the same other arguments
+        max_tokens: size limit of the answer, a longer page is cut with a summary and a next_cursor
+    A country that could not be looked up is listed in errors, the flights of the others are still returned."""
+    if limit < 1:
+        raise ValueError("limit must be at least 1")
+    batch = await flight_service.get_flights_by_countries(countries, sort, descending)
+    return response_shaper.page("get_flights_by_countries", batch.flights[:limit],
+                                {"countries": countries, "sort": sort, "descending": descending, "limit": limit,
+                                 "fields": fields, "format": format},
+                                fields, format, cursor, max_tokens, total=len(batch.flights), errors=batch.errors)
+
+@mcp.tool(description="Get the flights of many airports in one call, merged, sorted and paged")
+async def get_flights_by_airports(airports:List[AirportKey], sort:str = "price", descending:bool = False, limit:int = 50,
+                                  fields:Optional[List[str]] = None, format:Optional[str] = None,
+                                  cursor:Optional[str] = None, max_tokens:Optional[int] = None) -> FlightPage:
+    """
+    Get the flights of several airports at once instead of calling get_flights_by_airport for each one
+    Args:
+        airports: pairs of country and airport_code like {"country": "France", "airport_code": "NCE"}
+        sort: price, duration, departureTime, arrivalTime or seatsAvailable
+        descending: sort from the highest value
+        limit: maximum number of flights over all the pages, total gives the number of flights found
+        fields: flight fields to return like flightCode, price, departureTime, a compact default set when empty
+        format: table (default) for a CSV text with a header line, json for a list of objects
+        cursor: next_cursor of the previous page, with the same other arguments
+        max_tokens: size limit of the answer, a longer page is cut with a summary and a next_cursor
+    An airport that could not be looked up is listed in errors, the flights of the others are still returned."""
+    if limit < 1:
+        raise ValueError("limit must be at least 1")
+    keys = [(airport.country, airport.airport_code) for airport in airports]
+    batch = await flight_service.get_flights_by_airports(keys, sort, descending)
+    return response_shaper.page("get_flights_by_airports", batch.flights[:limit],
+                                {"airports": keys, "sort": sort, "descending": descending, "limit": limit,
+                                 "fields": fields, "format": format},
+                                fields, format, cursor, max_tokens, total=len(batch.flights), errors=batch.errors)
+
+@mcp.tool(description="Search the itineraries between two airports on a date, direct flights and connections")
+async def search_flights(from_airport:str, to_airport:str, date:str, max_stops:int = 1, sort:str = "duration") -> List[Itinerary]:
+    """
+    Search the best itineraries from one airport to another leaving on a date, with the connections already checked
+    Args:
+        from_airport: the airport code of the origin like YUL, JFK, CDG etc.
+        to_airport: the airport code of the destination like NCE, FCO, CUN etc.
+        date: departure date of the first flight, in the format YYYY-MM-DD (UTC)
+        max_stops: maximum number of connections, 0 for direct flights only, up to 2
+        sort: ranking of the itineraries, duration, price or departure
+    """
+    return await flight_service.search_flights(from_airport, to_airport, date, max_stops, sort)
 
 # @mcp.tool(description="Book a flight to a specific country using the flight_code")
 # async def book_flight(country:str, flight_code:str) -> None:    
@@ -59,5 +143,30 @@ async def get_flights_by_airport(country:str, airport_code:str) -> List[Flight]:
 #     """    
 #     return await flight_service.cancel_flight(country,flight_code)
 
+@mcp.resource("stats://tool-output", description="Rows, bytes and estimated tokens returned by the flight list tools")
+def get_tool_output_stats() -> str:
+    return json.dumps(response_shaper.stats)
+
+@mcp.resource("stats://http-client", description="Connection pool and response cache statistics of the flight API client")
+def get_http_client_stats() -> str:
+    return json.dumps(http_client.stats)
+
+def create_app() -> Starlette:
+    """Streamable HTTP app closing the shared http client on shutdown"""
+    app = mcp.streamable_http_app()
+    session_manager_lifespan = app.router.lifespan_context
+
+    @asynccontextmanager
+    async def lifespan(app: Starlette):
+        async with session_manager_lifespan(app):
+            yield
+        await http_client.close()
+
+    app.router.lifespan_context = lifespan
+    return app
+
+# Served by gunicorn in the container (main:app), or by uvicorn when run directly
+app = create_app()
+
 if __name__ == '__main__':
-   mcp.run(transport='streamable-http')
\ No newline at end of file
+   uvicorn.run(app, host=mcp.settings.host, port=mcp.settings.port)
\ No newline at end of file
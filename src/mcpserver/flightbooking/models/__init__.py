@@ -1,2 +1,5 @@
 from .airport import Airport
-from .flight import Flight
\ No newline at end of file
+from .flight import Flight
+from .itinerary import Itinerary
+from .flight_batch import AirportKey, BatchError, FlightBatch
+from .flight_page import FlightPage
\ No newline at end of file
@@ -0,0 +1,15 @@
+from pydantic import BaseModel
+from typing import List
+from .flight import Flight
+
+class AirportKey(BaseModel):
+    country: str
+    airport_code: str
+
+class BatchError(BaseModel):
+    key: str
+    error: str
+
+class FlightBatch(BaseModel):
+    flights: List[Flight]
+    errors: List[BatchError] = []
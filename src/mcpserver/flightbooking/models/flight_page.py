@@ -0,0 +1,18 @@
+from pydantic import BaseModel, model_serializer
+from typing import Any, Dict, List, Optional
+from .flight_batch import BatchError
+
+class FlightPage(BaseModel):
+    total: int
+    offset: int
+    count: int
+    table: Optional[str] = None
+    flights: Optional[List[Dict[str, Any]]] = None
+    next_cursor: Optional[str] = None
+    summary: Optional[str] = None
+    errors: List[BatchError] = []
+
+    @model_serializer(mode="wrap")
+    def _drop_empty(self, handler) -> Dict[str, Any]:
+        # Every character goes to the context of the model, empty fields are left out
+        return {key: value for key, value in handler(self).items() if value is not None and value != []}
@@ -0,0 +1,19 @@
+from pydantic import BaseModel
+from datetime import datetime
+from typing import List
+from .flight import Flight
+
+class Connection(BaseModel):
+    airport: str
+    duration: str
+
+class Itinerary(BaseModel):
+    fromAirport: str
+    toAirport: str
+    departureTime: datetime
+    arrivalTime: datetime
+    duration: str
+    stops: int
+    price: float
+    connections: List[Connection] = []
+    flights: List[Flight]
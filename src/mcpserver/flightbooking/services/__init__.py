@@ -1,2 +1,6 @@
+from .response_cache import ResponseCache
+from .circuit_breaker import CircuitBreaker, CircuitOpenError
+from .http_client import HttpClient, get_http_client
 from .airport_service import AirportService
-from .flight_service import FlightService
\ No newline at end of file
+from .flight_service import FlightService
+from .response_shaper import ResponseShaper
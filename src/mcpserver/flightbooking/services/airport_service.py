@@ -1,16 +1,14 @@
 from typing import List
 from models import Airport
 from config import Config
-import aiohttp
-import asyncio
+from .http_client import HttpClient, get_http_client
 
 class AirportService:
 
-    def __init__(self):
+    def __init__(self, http_client: HttpClient = None):
         self.config = Config()
+        self.http_client = http_client or get_http_client()
 
     async def get_airports(self) -> List[Airport]:
-        async with aiohttp.ClientSession() as session:
-            async with session.get(f"{self.config.booking_api_url}/api/airport/") as response:
-                json_data = await response.json()
-                return [Airport(**airport_data) for airport_data in json_data]            
\ No newline at end of file
+        json_data = await self.http_client.get_json(f"{self.config.booking_api_url}/api/airport/")
+        return [Airport(**airport_data) for airport_data in json_data]
@@ -0,0 +1,62 @@
+from typing import Any, Dict
+import time
+
+class CircuitOpenError(Exception):
+    """The upstream failed too often, the call is refused without sending it"""
+
+class CircuitBreaker:
+    """Fails fast while the flight API is unhealthy instead of waiting for every timeout.
+
+    `failure_threshold` failures in a row open the circuit: calls are refused for
+    `reset_timeout` seconds. The first call after that goes through as a probe, the
+    others are still refused. A successful probe closes the circuit, a failed one
+    opens it again. A lost probe (cancelled call) only delays the next one by
+    `reset_timeout`. A threshold of 0 disables the breaker.
+    """
+
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.failures = 0
+        self.opened = 0
+        self.rejected = 0
+        self._retry_at = 0.0
+
+    def check(self) -> None:
+        """Raise CircuitOpenError when the call must not be sent"""
+        if self.state == "closed":
+            return
+        now = time.monotonic()
+        if now < self._retry_at:
+            self.rejected += 1
+            raise CircuitOpenError(f"Flight API unavailable after {self.failures} failures, "
+                                   f"next attempt in {self._retry_at - now:.0f}s")
+        # This call is the probe
+        self.state = "half_open"
+        self._retry_at = now + self.reset_timeout
+
+    def record_success(self) -> None:
+        self.state = "closed"
+        self.failures = 0
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self.failure_threshold <= 0:
+            return
+        if self.state == "half_open" or self.failures >= self.failure_threshold:
+            if self.state == "closed":
+                self.opened += 1
+            self.state = "open"
+            self._retry_at = time.monotonic() + self.reset_timeout
+
+    @property
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.failures,
+            "failure_threshold": self.failure_threshold,
+            "reset_timeout_seconds": self.reset_timeout,
+            "opened": self.opened,
+            "rejected": self.rejected
+        }
@@ -0,0 +1,30 @@
+from typing import Awaitable, Callable, Dict, Hashable, Iterable, Tuple, TypeVar
+import asyncio
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+async def fan_out(keys: Iterable[K], fetch: Callable[[K], Awaitable[V]], concurrency: int) -> Tuple[Dict[K, V], Dict[K, Exception]]:
+    """Run `fetch` for every distinct key, at most `concurrency` at a time.
+
+    A failing key does not cancel the others: the results and the errors are
+    returned side by side, each keyed like the input, in the order of the keys.
+    """
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    keys = list(dict.fromkeys(keys))
+
+    async def run(key: K) -> V:
+        async with semaphore:
+            return await fetch(key)
+
+    outcomes = await asyncio.gather(*[run(key) for key in keys], return_exceptions=True)
+    results: Dict[K, V] = {}
+    errors: Dict[K, Exception] = {}
+    for key, outcome in zip(keys, outcomes):
+        if isinstance(outcome, asyncio.CancelledError):
+            raise outcome
+        if isinstance(outcome, Exception):
+            errors[key] = outcome
+        else:
+            results[key] = outcome
+    return results, errors
@@ -1,40 +1,101 @@
-from typing import List
-from models import Flight
+from typing import Any, Awaitable, Callable, Dict, Hashable, Iterable, List, Tuple
+from models import BatchError, Flight, FlightBatch, Itinerary
 from config import Config
+from pydantic import TypeAdapter
+from urllib.parse import urlencode
+from .fan_out import fan_out
+from .http_client import HttpClient, get_http_client
 import aiohttp
-import asyncio
+import re
+
+_FLIGHTS = TypeAdapter(List[Flight])
+
+_DURATION = re.compile(r"(?:(\d+)h)?\s*(?:(\d+)m)?")
+
+# Sort keys of the batched lookups, the duration ("5h 30m") is compared in minutes
+BATCH_SORT_KEYS = {
+    "price": lambda flight: flight.price,
+    "duration": lambda flight: _minutes(flight.duration),
+    "departureTime": lambda flight: flight.departureTime,
+    "arrivalTime": lambda flight: flight.arrivalTime,
+    "seatsAvailable": lambda flight: flight.seatsAvailable
+}
 
 class FlightService:
 
-    def __init__(self):
+    def __init__(self, http_client: HttpClient = None):
         self.config = Config()
+        self.http_client = http_client or get_http_client()
 
     async def get_flight_by_country(self,country:str)  -> List[Flight]:
-        async with aiohttp.ClientSession() as session:
-            async with session.get(f"{self.config.booking_api_url}/api/flight/country/{country}/") as response:
-                json_data = await response.json()
-                return [Flight(**flight_data) for flight_data in json_data]          
+        # The cache keeps the validated models, the pages of a list are read from it
+        return await self.http_client.get_json(f"{self.config.booking_api_url}/api/flight/country/{country}/", parse=_FLIGHTS.validate_python)
 
     async def get_flight(self,country:str,airport_code:str) -> List[Flight]:
-        async with aiohttp.ClientSession() as session:
-            async with session.get(f"{self.config.booking_api_url}/api/flight/{country}/{airport_code}") as response:
-                json_data = await response.json()
-                return [Flight(**flight_data) for flight_data in json_data]            
+        return await self.http_client.get_json(f"{self.config.booking_api_url}/api/flight/{country}/{airport_code}", parse=_FLIGHTS.validate_python)
+
+    async def get_flights_by_countries(self, countries: List[str], sort: str = "price", descending: bool = False) -> FlightBatch:
+        return await self._batch(countries, self.get_flight_by_country, lambda country: country, sort, descending)
+
+    async def get_flights_by_airports(self, airports: List[Tuple[str, str]], sort: str = "price", descending: bool = False) -> FlightBatch:
+        return await self._batch(airports, lambda airport: self.get_flight(*airport), lambda airport: "/".join(airport),
+                                 sort, descending)
+
+    async def search_flights(self, from_airport: str, to_airport: str, date: str, max_stops: int = 1,
+                             sort: str = "duration", limit: int = 10) -> List[Itinerary]:
+        query = urlencode({"from": from_airport, "to": to_airport, "date": date, "max_stops": max_stops, "sort": sort, "limit": limit})
+        json_data = await self.http_client.get_json(f"{self.config.booking_api_url}/api/flight/search?{query}")
+        return [Itinerary(**itinerary) for itinerary in json_data]
 
     async def book_flight(self,country:str, flight_code:str) -> None:
-        async with aiohttp.ClientSession() as session:
-            async with session.post(f"{self.config.booking_api_url}/api/flight/",json={
-                'country': country,
-                'flightCode': flight_code
-            }) as response:
-                if response.status != 202:
-                    raise Exception(f"Failed to book flight: {response.status} - {await response.text()}")
+        status, text = await self.http_client.send("POST", f"{self.config.booking_api_url}/api/flight/",json={
+            'country': country,
+            'flightCode': flight_code
+        })
+        if status != 202:
+            raise Exception(f"Failed to book flight: {status} - {text}")
+        self._invalidate_flights()
 
     async def cancel_flight(self,country:str, flight_code:str) -> None:
-        async with aiohttp.ClientSession() as session:
-            async with session.delete(f"{self.config.booking_api_url}/api/flight/",json={
-                'country': country,
-                'flightCode': flight_code
-            }) as response:
-                if response.status != 204:
-                    raise Exception(f"Failed to cancel flight: {response.status} - {await response.text()}")                     
\ No newline at end of file
+        status, text = await self.http_client.send("DELETE", f"{self.config.booking_api_url}/api/flight/",json={
+            'country': country,
+            'flightCode': flight_code
+        })
+        if status != 204:
+            raise Exception(f"Failed to cancel flight: {status} - {text}")
+        self._invalidate_flights()
+
+    def _invalidate_flights(self) -> None:
+        # Seat counts changed, drop the cached flight listings
+        self.http_client.cache.invalidate(f"{self.config.booking_api_url}/api/flight/")
+
+    async def _batch(self, keys: Iterable[Hashable], fetch: Callable[[Any], Awaitable[List[Flight]]], name: Callable[[Any], str],
+                     sort: str, descending: bool) -> FlightBatch:
+        """Fetch the flights of every key concurrently and merge them into one sorted list"""
+        keys = list(keys)
+        if len(keys) > self.config.batch_max_keys:
+            raise ValueError(f"At most {self.config.batch_max_keys} keys per call, got {len(keys)}")
+        if sort not in BATCH_SORT_KEYS:
+            raise ValueError(f"sort must be one of {', '.join(BATCH_SORT_KEYS)}")
+
+        results, errors = await fan_out(keys, fetch, self.config.batch_concurrency)
+
+        # A flight listed by two keys (two airports of its country) is kept once
+        flights: Dict[Tuple[str, str], Flight] = {}
+        for values in results.values():
+            for flight in values:
+                flights.setdefault((flight.country, flight.flightCode), flight)
+
+        return FlightBatch(flights=sorted(flights.values(), key=BATCH_SORT_KEYS[sort], reverse=descending),
+                           errors=[BatchError(key=name(key), error=_describe(error)) for key, error in errors.items()])
+
+def _minutes(duration: str) -> int:
+    match = _DURATION.fullmatch(duration.strip())
+    if match is None:
+        return 0
+    return int(match.group(1) or 0) * 60 + int(match.group(2) or 0)
+
+def _describe(error: Exception) -> str:
+    if isinstance(error, aiohttp.ClientResponseError):
+        return f"{error.status} {error.message}"
+    return str(error) or type(error).__name__
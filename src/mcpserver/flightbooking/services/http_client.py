@@ -0,0 +1,223 @@
+from typing import Any, Callable, Dict, Optional, Tuple
+from config import Config
+from .circuit_breaker import CircuitBreaker
+from .response_cache import ResponseCache
+import aiohttp
+import asyncio
+import random
+
+# Statuses of a GET worth sending again, the other 4xx would fail the same way
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+class HttpClient:
+    """Process wide aiohttp session shared by the services.
+
+    One connection pool with keep-alive is reused by every tool call instead of
+    opening a new session (DNS lookup, TCP and TLS handshakes) per call. The session
+    is created lazily inside the running event loop and closed on server shutdown.
+
+    Every request is bounded by `timeout`, and a read with its retries by `deadline`,
+    so a slow flight API cannot stall a tool call. Reads are idempotent: connection
+    errors, timeouts and the statuses of RETRY_STATUSES are retried `retries` times
+    after a random wait of up to `backoff` * 2^attempt seconds (full jitter). With a
+    `hedge_delay` a read still running after that delay is sent a second time and
+    the first answer wins, which cuts the tail latency of a slow instance. Bookings
+    and cancellations are sent once. The circuit breaker counts the failures of all
+    the requests and refuses calls while the API is down.
+    """
+
+    def __init__(self, limit: int, limit_per_host: int, keepalive_timeout: float, cache: ResponseCache,
+                 circuit: CircuitBreaker, timeout: float = 10, deadline: float = 30, retries: int = 2,
+                 backoff: float = 0.1, hedge_delay: float = 0):
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.keepalive_timeout = keepalive_timeout
+        self.cache = cache
+        self.circuit = circuit
+        self.timeout = timeout
+        self.deadline = deadline
+        self.retries = retries
+        self.backoff = backoff
+        self.hedge_delay = hedge_delay
+        self.requests = 0
+        self.sessions_created = 0
+        self.failures = 0
+        self.timeouts = 0
+        self.retried = 0
+        self.deadlines_exceeded = 0
+        self.hedges = 0
+        self.hedges_won = 0
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=self.limit,
+                                             limit_per_host=self.limit_per_host,
+                                             keepalive_timeout=self.keepalive_timeout,
+                                             ttl_dns_cache=300)
+            self._session = aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=self.timeout))
+            self.sessions_created += 1
+        return self._session
+
+    async def get_json(self, url: str, cache: bool = True, parse: Optional[Callable[[Any], Any]] = None) -> Any:
+        """GET a JSON document, served from the response cache when possible.
+
+        `parse` converts the document before it is cached, so cache hits return the
+        converted value without validating it again.
+        """
+        if cache:
+            cached = self.cache.get(url)
+            if cached is not None:
+                return cached
+
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        try:
+            json_data = await asyncio.wait_for(self._get_with_retries(url), self.deadline)
+        except asyncio.TimeoutError:
+            if loop.time() - started < self.deadline:
+                # Timeout of the last attempt
+                raise
+            self.deadlines_exceeded += 1
+            raise asyncio.TimeoutError(f"No answer from the flight API within {self.deadline:g}s")
+
+        if parse is not None:
+            json_data = parse(json_data)
+        if cache:
+            self.cache.set(url, json_data)
+        return json_data
+
+    async def send(self, method: str, url: str, json: Any = None) -> Tuple[int, str]:
+        """Send a request once, it may not be idempotent"""
+        self.circuit.check()
+        self.requests += 1
+        try:
+            async with self.session.request(method, url, json=json) as response:
+                status, text = response.status, await response.text()
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            self._failed(e)
+            raise
+        if status >= 500:
+            self.failures += 1
+            self.circuit.record_failure()
+        else:
+            self.circuit.record_success()
+        return status, text
+
+    async def close(self) -> None:
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    @property
+    def stats(self) -> Dict[str, Any]:
+        connector = self._session.connector if self._session is not None and not self._session.closed else None
+        return {
+            "requests": self.requests,
+            "sessions_created": self.sessions_created,
+            "pool": {
+                "limit": self.limit,
+                "limit_per_host": self.limit_per_host,
+                "keepalive_timeout": self.keepalive_timeout,
+                "open": connector is not None
+            },
+            "resilience": {
+                "timeout_seconds": self.timeout,
+                "deadline_seconds": self.deadline,
+                "max_retries": self.retries,
+                "hedge_delay_seconds": self.hedge_delay,
+                "failures": self.failures,
+                "timeouts": self.timeouts,
+                "retried": self.retried,
+                "deadlines_exceeded": self.deadlines_exceeded,
+                "hedges": self.hedges,
+                "hedges_won": self.hedges_won,
+                "circuit": self.circuit.stats
+            },
+            "cache": self.cache.stats
+        }
+
+    async def _get_with_retries(self, url: str) -> Any:
+        attempt = 0
+        while True:
+            self.circuit.check()
+            try:
+                json_data = await self._hedged_get(url)
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                if not _retryable(e):
+                    # The API answered, it is up
+                    self.circuit.record_success()
+                    raise
+                self.circuit.record_failure()
+                if attempt >= self.retries:
+                    raise
+                await asyncio.sleep(random.uniform(0, self.backoff * 2 ** attempt))
+                attempt += 1
+                self.retried += 1
+                continue
+            self.circuit.record_success()
+            return json_data
+
+    async def _hedged_get(self, url: str) -> Any:
+        if self.hedge_delay <= 0:
+            return await self._get(url)
+
+        first = asyncio.ensure_future(self._get(url))
+        tasks = [first]
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=self.hedge_delay)
+            if not done:
+                self.hedges += 1
+                tasks.append(asyncio.ensure_future(self._get(url)))
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        self.hedges_won += task is not first
+                        return task.result()
+            # Both requests failed, the error of the first one is reported
+            raise first.exception()
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def _get(self, url: str) -> Any:
+        self.requests += 1
+        try:
+            async with self.session.get(url) as response:
+                response.raise_for_status()
+                return await response.json()
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            self._failed(e)
+            raise
+
+    def _failed(self, error: Exception) -> None:
+        self.failures += 1
+        if isinstance(error, asyncio.TimeoutError):
+            self.timeouts += 1
+
+def _retryable(error: Exception) -> bool:
+    if isinstance(error, aiohttp.ClientResponseError):
+        return error.status in RETRY_STATUSES
+    return True
+
+_http_client: Optional[HttpClient] = None
+
+def get_http_client() -> HttpClient:
+    """Return the HttpClient shared by the whole process"""
+    global _http_client
+    if _http_client is None:
+        config = Config()
+        _http_client = HttpClient(limit=config.http_pool_limit,
+                                  limit_per_host=config.http_pool_limit_per_host,
+                                  keepalive_timeout=config.http_keepalive_timeout,
+                                  cache=ResponseCache(config.response_cache_max_entries, config.response_cache_ttl),
+                                  circuit=CircuitBreaker(config.circuit_failure_threshold, config.circuit_reset_timeout),
+                                  timeout=config.http_timeout,
+                                  deadline=config.http_deadline,
+                                  retries=config.http_retries,
+                                  backoff=config.http_retry_backoff,
+                                  hedge_delay=config.http_hedge_delay)
+    return _http_client
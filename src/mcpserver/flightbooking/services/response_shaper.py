@@ -0,0 +1,186 @@
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from models import BatchError, Flight, FlightPage
+import base64
+import csv
+import hashlib
+import io
+import json
+import pydantic_core
+
+# Rough size of a token in characters for JSON and CSV text, there is no tokenizer
+# on the server and the budget only needs to be in the right range
+CHARS_PER_TOKEN = 4
+
+# Room left in the budget for the page fields around the rows (summary, cursor...)
+ENVELOPE_CHARS = 400
+
+FORMATS = ("table", "json")
+
+# Fields whose range over all the flights is given in the summary of a truncated page
+SUMMARY_FIELDS = ("price", "departureTime", "seatsAvailable")
+SUMMARY_CACHE_SIZE = 16
+
+def estimate_tokens(text: str) -> int:
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+class _ToolStats:
+    __slots__ = ("calls", "rows", "bytes", "tokens", "truncated")
+
+    def __init__(self):
+        self.calls = 0
+        self.rows = 0
+        self.bytes = 0
+        self.tokens = 0
+        self.truncated = 0
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "rows": self.rows,
+            "bytes": self.bytes,
+            "estimated_tokens": self.tokens,
+            "mean_estimated_tokens": round(self.tokens / self.calls, 1) if self.calls else 0.0,
+            "truncated": self.truncated
+        }
+
+class ResponseShaper:
+    """Cuts the flight lists returned by the tools to what the model needs to read.
+
+    Only the selected fields are kept, and the rows are written as one CSV table
+    (`table`) or as JSON objects (`json`). A page holds at most `page_size` rows and
+    stops before its estimated size goes over `max_tokens`. A truncated page carries
+    a short summary of all the rows and a cursor. The cursor is the offset of the
+    next page bound to a fingerprint of the tool arguments, so it cannot be replayed
+    against another query. The next page is read from the upstream response cache.
+    """
+
+    def __init__(self, max_tokens: int, page_size: int, default_format: str, default_fields: List[str]):
+        self.max_tokens = max_tokens
+        self.page_size = page_size
+        self.default_format = default_format
+        self.default_fields = default_fields
+        self._stats: Dict[str, _ToolStats] = {}
+        # Ranges of the summary of the last lists paged, the lists come from the
+        # response cache so every page of one list is the same object
+        self._ranges: "OrderedDict[int, Tuple[Sequence[Flight], str]]" = OrderedDict()
+
+    def page(self, tool: str, items: Sequence[Flight], arguments: Dict[str, Any], fields: Optional[List[str]] = None,
+             format: Optional[str] = None, cursor: Optional[str] = None, max_tokens: Optional[int] = None,
+             total: Optional[int] = None, errors: Optional[List[BatchError]] = None) -> FlightPage:
+        """One page of `items` for the call of `tool` with `arguments`, the arguments of the tool without the paging ones"""
+        format = format or self.default_format
+        if format not in FORMATS:
+            raise ValueError(f"format must be one of {', '.join(FORMATS)}")
+        columns = self._columns(fields or self.default_fields)
+        budget = max(1, max_tokens or self.max_tokens) * CHARS_PER_TOKEN - ENVELOPE_CHARS
+        fingerprint = _fingerprint(tool, arguments)
+        offset = _offset(cursor, fingerprint) if cursor else 0
+
+        rows = [item.model_dump(mode="json", include=set(columns)) for item in items[offset:offset + self.page_size]]
+        if format == "table":
+            text, count = _table(columns, rows, budget)
+            page = FlightPage(total=len(items) if total is None else total, offset=offset, count=count, table=text)
+        else:
+            count = _fit(rows, budget)
+            page = FlightPage(total=len(items) if total is None else total, offset=offset, count=count, flights=rows[:count])
+
+        page.errors = errors or []
+        if offset + count < len(items):
+            page.next_cursor = _cursor(offset + count, fingerprint)
+            page.summary = (f"Rows {offset + 1} to {offset + count} of {len(items)}. All rows: {self._summary(items)}. "
+                            "Call again with next_cursor for the next page, or narrow the query.")
+
+        self._record(tool, page)
+        return page
+
+    @property
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "max_tokens": self.max_tokens,
+            "page_size": self.page_size,
+            "default_format": self.default_format,
+            "chars_per_token": CHARS_PER_TOKEN,
+            "tools": {tool: stats.as_dict() for tool, stats in self._stats.items()}
+        }
+
+    def _columns(self, fields: List[str]) -> List[str]:
+        known = Flight.model_fields
+        unknown = [field for field in fields if field not in known]
+        if unknown:
+            raise ValueError(f"Unknown fields {', '.join(unknown)}, fields are {', '.join(known)}")
+        return [field for field in known if field in fields]
+
+    def _summary(self, items: Sequence[Flight]) -> str:
+        entry = self._ranges.get(id(items))
+        if entry is not None and entry[0] is items:
+            self._ranges.move_to_end(id(items))
+            return entry[1]
+
+        ranges = []
+        for field in SUMMARY_FIELDS:
+            values = [getattr(item, field) for item in items]
+            ranges.append(f"{field} {_text(min(values))} to {_text(max(values))}")
+        summary = ", ".join(ranges)
+        self._ranges[id(items)] = (items, summary)
+        if len(self._ranges) > SUMMARY_CACHE_SIZE:
+            self._ranges.popitem(last=False)
+        return summary
+
+    def _record(self, tool: str, page: FlightPage) -> None:
+        # Same text as the one FastMCP sends back to the model
+        text = pydantic_core.to_json(page, indent=2).decode()
+        stats = self._stats.setdefault(tool, _ToolStats())
+        stats.calls += 1
+        stats.rows += page.count
+        stats.bytes += len(text.encode())
+        stats.tokens += estimate_tokens(text)
+        stats.truncated += page.next_cursor is not None
+
+def _table(columns: List[str], rows: List[Dict[str, Any]], budget: int) -> Tuple[str, int]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    writer.writerow(columns)
+    size = buffer.tell()
+    count = 0
+    for row in rows:
+        writer.writerow([row.get(column) for column in columns])
+        # The first row is always kept so every page moves forward
+        if buffer.tell() > budget and count > 0:
+            break
+        size = buffer.tell()
+        count += 1
+    # Drops the row that went over the budget
+    buffer.truncate(size)
+    return buffer.getvalue(), count
+
+def _fit(rows: List[Dict[str, Any]], budget: int) -> int:
+    size = 0
+    for count, row in enumerate(rows):
+        # Written with an indent of 2 by FastMCP, inside the page: about 8 characters
+        # of layout per field and 12 per row
+        size += len(pydantic_core.to_json(row)) + 8 * len(row) + 12
+        if size > budget and count > 0:
+            return count
+    return len(rows)
+
+def _text(value: Any) -> str:
+    # Written like in the rows, e.g. 2024-07-01T08:00:00Z
+    return str(pydantic_core.to_jsonable_python(value))
+
+def _fingerprint(tool: str, arguments: Dict[str, Any]) -> str:
+    document = json.dumps([tool, arguments], sort_keys=True, default=str)
+    return hashlib.sha1(document.encode()).hexdigest()[:12]
+
+def _cursor(offset: int, fingerprint: str) -> str:
+    return base64.urlsafe_b64encode(f"{offset}:{fingerprint}".encode()).decode().rstrip("=")
+
+def _offset(cursor: str, fingerprint: str) -> int:
+    try:
+        offset, _, owner = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode().partition(":")
+        offset = int(offset)
+    except ValueError:
+        raise ValueError("Invalid cursor")
+    if owner != fingerprint or offset < 0:
+        raise ValueError("The cursor belongs to another query, call the tool again without cursor")
+    return offset